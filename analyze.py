@@ -1,8 +1,15 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+import argparse
+import re
 import sqlite3
+from difflib import get_close_matches
 from functools import reduce
-import questionary
-from db import create_connection as get_connection
+from lazy import lazy_import
+from cache import QueryCache
+from db import DB_PATH, create_connection as get_connection, ensure_schema
+from snapshot import MODES as SNAPSHOT_MODES, ReadSnapshot
+
+questionary = lazy_import('questionary')
 
 # ---------------------------
 # Helper functions (functional style)
@@ -13,58 +20,158 @@ def fetch_all_users(cursor) -> List[Tuple[int, str]]:
     return cursor.fetchall()
 
 
-def fetch_all_habits(cursor) -> List[Tuple[str, str]]:
-    cursor.execute("""
+def _owned_by(user_id: Optional[int]) -> Tuple[str, tuple]:
+    """A condition on h.user_id (and its parameters) limiting a report to one user, or to nobody in particular."""
+    return ("h.user_id = ?", (user_id,)) if user_id is not None else ("1", ())
+
+
+def fetch_all_habits(cursor, user_id: Optional[int] = None) -> List[Tuple[str, str]]:
+    owned, params = _owned_by(user_id)
+    cursor.execute(f"""
         SELECT u.username, h.name
-        FROM habit h
+        FROM habit_detail h
         JOIN user_info u ON h.user_id = u.user_id
-    """)
+        WHERE {owned}
+    """, params)
     return cursor.fetchall()
 
 
-def fetch_habits_by_periodicity(cursor, periodicity: str) -> List[Tuple[str, str]]:
+def fetch_habits_by_periodicity(cursor, periodicity: str, user_id: Optional[int] = None) -> List[Tuple[str, str]]:
+    owned, params = _owned_by(user_id)
     try:
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT u.username, h.name
-            FROM habit h
+            FROM habit_detail h
             JOIN user_info u ON h.user_id = u.user_id
-            WHERE h.periodicity = ?
-        """, (periodicity,))
+            WHERE h.periodicity = ? AND {owned}
+        """, (periodicity, *params))
         return cursor.fetchall()
     except sqlite3.OperationalError as e:
         questionary.print(f"⚠️ Cannot filter by periodicity: Error: {e}")
         return []
 
 
-def fetch_all_completions(cursor) -> List[Tuple[str, str, int]]:
-    cursor.execute("""
+def fetch_all_completions(cursor, user_id: Optional[int] = None) -> List[Tuple[str, str, int]]:
+    owned, params = _owned_by(user_id)
+    cursor.execute(f"""
         SELECT u.username, h.name, c.count
-        FROM habit h
+        FROM habit_detail h
         JOIN user_info u ON h.user_id = u.user_id
         JOIN completion c ON h.habit_id = c.habit_id
-    """)
+        WHERE {owned}
+    """, params)
     return cursor.fetchall()
 
 
-def fetch_completions_for_habit(cursor, habit_name: str) -> List[Tuple[str, int]]:
+def fetch_completions_for_habit(cursor, habit_name: str, user_id: Optional[int] = None) -> List[Tuple[str, int]]:
+    owned, params = _owned_by(user_id)
+    # Resolve the name to its template ids once; the rest joins on integer keys
+    cursor.execute(f"""
+        SELECT u.username, c.count
+        FROM habit_template t
+        JOIN habit h ON h.template_id = t.template_id
+        JOIN user_info u ON h.user_id = u.user_id
+        JOIN completion c ON h.habit_id = c.habit_id
+        WHERE t.name = ? AND {owned}
+    """, (habit_name, *params))
+    return cursor.fetchall()
+
+
+def fetch_completions_by_template(cursor, template_id: int) -> List[Tuple[str, int]]:
     cursor.execute("""
         SELECT u.username, c.count
         FROM habit h
         JOIN user_info u ON h.user_id = u.user_id
         JOIN completion c ON h.habit_id = c.habit_id
-        WHERE h.name = ?
-    """, (habit_name,))
+        WHERE h.template_id = ?
+    """, (template_id,))
+    return cursor.fetchall()
+
+
+# ---------------------------
+# Habit name search (FTS5)
+# ---------------------------
+
+def _search_terms(query: str) -> List[str]:
+    return re.findall(r"\w+", (query or "").lower())
+
+
+def _match_expression(terms: List[str]) -> str:
+    # Quote every term so user input can't inject FTS5 operators; '*' makes it a prefix match
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def correct_search_term(cursor, term: str) -> str:
+    """Return the closest indexed word to `term`, or `term` itself if nothing is close."""
+    cursor.execute("""
+        SELECT term
+        FROM habit_fts_vocab
+        WHERE length(term) BETWEEN ? AND ?
+    """, (len(term) - 2, len(term) + 2))
+    vocabulary = [row[0] for row in cursor.fetchall()]
+    matches = get_close_matches(term, vocabulary, n=1, cutoff=0.7)
+    return matches[0] if matches else term
+
+
+def search_habit_names(cursor, query: str, limit: int = 10) -> List[Tuple[str, float]]:
+    """
+    Find habit names matching `query` using prefix matching over names and
+    descriptions. If nothing matches, misspelled words are corrected against
+    the index vocabulary and the search is retried.
+    Returns (name, score) pairs, best match first.
+    """
+    terms = _search_terms(query)
+    if not terms:
+        return []
+
+    sql = """
+        SELECT name, MIN(rank) AS score
+        FROM (
+            SELECT name, rank
+            FROM habit_fts
+            WHERE habit_fts MATCH ? AND rank MATCH 'bm25(10.0, 1.0)'
+            ORDER BY rank
+            LIMIT ?
+        )
+        GROUP BY name
+        ORDER BY score
+        LIMIT ?
+    """
+    # The index holds one row per template; a name can still have several descriptions
+    pool = limit * 5
+    cursor.execute(sql, (_match_expression(terms), pool, limit))
+    results = cursor.fetchall()
+    if results:
+        return results
+
+    corrected = [correct_search_term(cursor, term) for term in terms]
+    if corrected == terms:
+        return []
+    cursor.execute(sql, (_match_expression(corrected), pool, limit))
     return cursor.fetchall()
 
 # ---------------------------
 # Analytics Interface
 # ---------------------------
 
-def run_analytics():
+def run_analytics(snapshot_mode: Optional[str] = None, refresh_interval: Optional[float] = None):
+    """
+    Interactive analytics menu. With `snapshot_mode` ('memory' or 'wal') reports
+    read from a ReadSnapshot that is refreshed when the data changes (at most
+    every `refresh_interval` seconds) instead of the live database.
+    """
+    snapshot = None
     try:
-        with get_connection() as conn:
-            cursor = conn.cursor()
+        ensure_schema(DB_PATH)
+        if snapshot_mode:
+            snapshot = ReadSnapshot(DB_PATH, snapshot_mode, refresh_interval)
+        with (snapshot.conn if snapshot else get_connection()) as conn:
+            # Each query runs on its own short-lived cursor; repeated views are served from the cache
+            cache = QueryCache(conn)
             while True:
+                if snapshot and snapshot.refresh_if_stale():
+                    cache.revalidate()
+
                 choice = questionary.select(
                     "📊 Analytics Menu - Choose an analysis option:",
                     choices=[
@@ -77,7 +184,7 @@ def run_analytics():
                 ).ask()
 
                 if choice == "List all currently tracked habits (all users)":
-                    habits = fetch_all_habits(cursor)
+                    habits = cache.fetch(fetch_all_habits)
                     if habits:
                         questionary.print("📋 Tracked Habits (by user):")
                         for user, habit in habits:
@@ -87,7 +194,7 @@ def run_analytics():
 
                 elif choice == "List habits by periodicity (all users)":
                     period = questionary.select("Select periodicity:", choices=["daily", "weekly"]).ask()
-                    habits = fetch_habits_by_periodicity(cursor, period)
+                    habits = cache.fetch(fetch_habits_by_periodicity, period)
                     if habits:
                         questionary.print(f"📅 {period.capitalize()} Habits (by user):")
                         for user, habit in habits:
@@ -96,7 +203,7 @@ def run_analytics():
                         questionary.print(f"⚠️ No {period} habits found.")
 
                 elif choice == "Longest streak across all habits (all users)":
-                    completions = fetch_all_completions(cursor)
+                    completions = cache.fetch(fetch_all_completions)
                     if completions:
                         longest = reduce(lambda a, b: a if a[2] > b[2] else b, completions)
                         questionary.print(f"🏆 Longest Streak: {longest[1]} by {longest[0]} with {longest[2]} completions")
@@ -104,8 +211,18 @@ def run_analytics():
                         questionary.print("⚠️ No completion data available.")
 
                 elif choice == "Longest streak for a specific habit (all users)":
-                    habit_name = questionary.text("Enter the habit name:").ask()
-                    completions = fetch_completions_for_habit(cursor, habit_name)
+                    query = questionary.text("Enter the habit name:").ask()
+                    candidates = cache.fetch(search_habit_names, query)
+                    if not candidates:
+                        questionary.print(f"⚠️ No habits match '{query}'.")
+                        continue
+                    habit_name = questionary.select(
+                        "Select the habit:",
+                        choices=[name for name, _score in candidates]
+                    ).ask()
+                    if habit_name is None:  # selection cancelled (Ctrl-C)
+                        continue
+                    completions = cache.fetch(fetch_completions_for_habit, habit_name)
                     if completions:
                         for user, count in completions:
                             questionary.print(f"🔥 '{habit_name}' by {user} has a streak of {count} completions.")
@@ -116,7 +233,16 @@ def run_analytics():
                     break
     except Exception as e:
         questionary.print(f"⚠️ An error occurred while connecting to the database: {e}")
+    finally:
+        if snapshot:
+            snapshot.close()
 
 
 if __name__ == '__main__':
-    run_analytics()
+    parser = argparse.ArgumentParser(description="Habit analytics for all users.")
+    parser.add_argument('--snapshot', choices=SNAPSHOT_MODES,
+                        help="read from an in-memory copy or a pinned WAL read transaction")
+    parser.add_argument('--refresh-interval', type=float,
+                        help="refresh the snapshot at most every N seconds")
+    args = parser.parse_args()
+    run_analytics(args.snapshot, args.refresh_interval)
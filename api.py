@@ -0,0 +1,542 @@
+import argparse
+import asyncio
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import reduce
+from http import HTTPStatus
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+from analyze import fetch_all_completions, fetch_all_habits, fetch_completions_for_habit, \
+    fetch_habits_by_periodicity, search_habit_names
+from db import DB_PATH, create_connection as get_connection, ensure_schema
+from main import insert_account, insert_habit, record_completion, remove_account, remove_habit
+from passwords import ITERATIONS, check_password, hash_password
+from prefetch import fetch_user_analytics, fetch_user_habits, fetch_user_profile
+
+# ---------------------------
+# HTTP/JSON API
+# ---------------------------
+#
+# The operations of the main.py menu and the analyze.py reports over HTTP, for
+# clients that can't drive the questionary TTY. One asyncio event loop owns
+# every socket, so thousands of idle keep-alive clients cost a coroutine each,
+# not a thread. The HTTP/1.1 handling is deliberately small: JSON bodies with
+# a Content-Length, no chunked encoding, no pipelining beyond reading the next
+# request once the previous response is written.
+#
+# SQLite calls block, so they run on two thread pools (see Database):
+#   - one writer thread with one connection; every write goes through it, so
+#     writes never wait on each other's locks, only on the queue
+#   - a few reader threads with a connection each; in WAL mode they read
+#     alongside the writer
+# Password hashing and verification (PBKDF2, ~0.1 s each) run on a third pool
+# without connections, so a burst of logins can't hold up database reads.
+# At most `max_pending` database calls, and as many hashing jobs, are queued
+# or running at once; further requests wait on the event loop, which keeps the
+# executor queues (and latency) bounded.
+#
+# Clients log in with POST /sessions and send the returned token as
+# "Authorization: Bearer <token>". Sessions are kept in memory; they expire
+# `session_ttl` seconds after the last request that used them, and all end when
+# the server stops. The reports only cover the logged-in user's own habits.
+
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 64 * 1024
+PERIODICITIES = ('daily', 'weekly')
+
+
+class HTTPError(Exception):
+    """An error answered with `status` and {"error": message}."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    headers: Dict[str, str]     # lower-case names
+    body: bytes
+    keep_alive: bool
+
+    def json(self) -> dict:
+        if not self.body:
+            return {}
+        try:
+            payload = json.loads(self.body)
+        except (UnicodeDecodeError, ValueError):
+            raise HTTPError(400, "body is not valid JSON") from None
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return payload
+
+    def param(self, name: str) -> Optional[str]:
+        values = self.query.get(name)
+        return values[0] if values else None
+
+
+def _field(payload: dict, name: str, required: bool = True) -> Optional[str]:
+    value = payload.get(name)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value:
+        raise HTTPError(400, f"'{name}' must be a non-empty string")
+    return value
+
+
+# ---------------------------
+# Database executors
+# ---------------------------
+
+class Database:
+    """
+    Runs blocking SQLite calls for the event loop.
+
+    Attributes:
+        db_path (str): The database every connection opens.
+        readers (int): The number of reader threads (and connections).
+        max_pending (int): Database calls (and, separately, hashing jobs) allowed to be queued or running at once.
+        hashers (int): The number of password hashing threads.
+    """
+
+    def __init__(self, db_path=DB_PATH, readers: int = 4, max_pending: int = 256, hashers: int = 2):
+        self.db_path = db_path
+        self.readers = readers
+        self.max_pending = max_pending
+        self.hashers = hashers
+        # Each thread opens its connection on start; it is closed when the thread exits
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='api-writer', initializer=self._connect)
+        self._readers = ThreadPoolExecutor(readers, thread_name_prefix='api-reader', initializer=self._connect)
+        self._hashers = ThreadPoolExecutor(hashers, thread_name_prefix='api-hasher')
+        self._db_slots = asyncio.Semaphore(max_pending)
+        self._hash_slots = asyncio.Semaphore(max_pending)
+
+    def _connect(self) -> None:
+        conn = get_connection(self.db_path)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        self._local.conn = conn
+
+    def _call(self, fn: Callable, args: tuple):
+        conn = self._local.conn
+        try:
+            return fn(conn, *args)
+        except BaseException:
+            # Never leave a failed transaction open on a shared connection
+            conn.rollback()
+            raise
+
+    async def _submit(self, pool: ThreadPoolExecutor, fn: Callable, *args):
+        # The writer and the readers share one budget; hashing has its own
+        async with self._hash_slots if pool is self._hashers else self._db_slots:
+            return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+    async def read(self, fn: Callable, *args):
+        """fn(conn, *args) on a reader connection."""
+        return await self._submit(self._readers, self._call, fn, args)
+
+    async def write(self, fn: Callable, *args):
+        """fn(conn, *args) on the writer connection."""
+        return await self._submit(self._writer, self._call, fn, args)
+
+    async def compute(self, fn: Callable, *args):
+        """fn(*args) on a hashing thread, for CPU work such as password hashing."""
+        return await self._submit(self._hashers, fn, *args)
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+        self._hashers.shutdown(wait=True)
+
+
+# ---------------------------
+# Handlers
+# ---------------------------
+#
+# Each handler takes the server, the request, the authenticated user_id (None
+# on public routes) and the path parameters, and returns (status, payload).
+# A None payload sends no body.
+
+def _cursor_call(fetch: Callable) -> Callable:
+    """Adapt a fetch(cursor, *args) helper to the fn(conn, *args) form Database expects."""
+    return lambda conn, *args: fetch(conn.cursor(), *args)
+
+
+async def health(server, request, user_id):
+    return 200, {'status': 'ok'}
+
+
+async def create_account(server, request, user_id):
+    payload = request.json()
+    username, password = _field(payload, 'username'), _field(payload, 'password')
+    stored = await server.db.compute(hash_password, password, server.password_iterations)
+    try:
+        new_id = await server.db.write(insert_account, username, stored)
+    except sqlite3.IntegrityError:
+        raise HTTPError(409, f"the username '{username}' is already taken") from None
+    return 201, {'user_id': new_id, 'username': username}
+
+
+def _stored_password(conn, username: str) -> Optional[Tuple[int, str]]:
+    return conn.execute("SELECT user_id, password FROM user_info WHERE username = ?", (username,)).fetchone()
+
+
+async def create_session(server, request, user_id):
+    payload = request.json()
+    username, password = _field(payload, 'username'), _field(payload, 'password')
+    row = await server.db.read(_stored_password, username)
+    # Unknown usernames pay for a verification too, so response times don't reveal which names exist
+    stored = row[1] if row else server.dummy_password
+    valid = await server.db.compute(check_password, password, stored)
+    if row is None or not valid:
+        raise HTTPError(401, "invalid credentials")
+    user_id = row[0]
+    return 201, {'token': server.start_session(user_id), 'user_id': user_id}
+
+
+async def end_session(server, request, user_id):
+    server.sessions.pop(_bearer_token(request), None)
+    return 204, None
+
+
+async def delete_account(server, request, user_id):
+    await server.db.write(remove_account, user_id)
+    server.end_sessions(user_id)
+    return 204, None
+
+
+async def list_habits(server, request, user_id):
+    habits = await server.db.read(_cursor_call(fetch_user_habits), user_id)
+    return 200, {'habits': [{'habit_id': habit_id, 'name': name} for habit_id, name in habits]}
+
+
+async def add_habit(server, request, user_id):
+    payload = request.json()
+    name = _field(payload, 'name')
+    description = _field(payload, 'description', required=False)
+    periodicity = payload.get('periodicity')
+    if periodicity not in PERIODICITIES:
+        raise HTTPError(400, f"'periodicity' must be one of {', '.join(PERIODICITIES)}")
+    habit_id = await server.db.write(insert_habit, user_id, name, description, periodicity)
+    if habit_id is None:
+        raise HTTPError(409, f"you already have the habit '{name}'")
+    return 201, {'habit_id': habit_id, 'name': name}
+
+
+async def delete_habit(server, request, user_id, habit_id):
+    if not await server.db.write(remove_habit, user_id, int(habit_id)):
+        raise HTTPError(404, "no such habit")
+    return 204, None
+
+
+async def log_completion(server, request, user_id, habit_id):
+    count = await server.db.write(record_completion, user_id, int(habit_id), datetime.now())
+    if count is None:
+        raise HTTPError(404, "no such habit")
+    return 201, {'habit_id': int(habit_id), 'count': count}
+
+
+async def view_profile(server, request, user_id):
+    profile = await server.db.read(_cursor_call(fetch_user_profile), user_id)
+    if profile is None:
+        raise HTTPError(404, "profile not found")
+    return 200, {
+        'username': profile.username,
+        'created_at': profile.created_at,
+        'completions': [{'habit': name, 'count': count} for name, count in profile.completions],
+    }
+
+
+async def view_analytics(server, request, user_id):
+    summary = await server.db.read(_cursor_call(fetch_user_analytics), user_id)
+    return 200, {
+        'total_habits': summary.total_habits,
+        'total_completions': summary.total_completions,
+        'today_completions': summary.today_completions,
+    }
+
+
+async def report_habits(server, request, user_id):
+    periodicity = request.param('periodicity')
+    if periodicity is None:
+        habits = await server.db.read(_cursor_call(fetch_all_habits), user_id)
+    elif periodicity in PERIODICITIES:
+        habits = await server.db.read(_cursor_call(fetch_habits_by_periodicity), periodicity, user_id)
+    else:
+        raise HTTPError(400, f"'periodicity' must be one of {', '.join(PERIODICITIES)}")
+    return 200, {'habits': [{'user': user, 'habit': habit} for user, habit in habits]}
+
+
+async def report_longest_streak(server, request, user_id):
+    completions = await server.db.read(_cursor_call(fetch_all_completions), user_id)
+    if not completions:
+        raise HTTPError(404, "no completion data available")
+    user, habit, count = reduce(lambda a, b: a if a[2] > b[2] else b, completions)
+    return 200, {'user': user, 'habit': habit, 'count': count}
+
+
+async def report_habit_streaks(server, request, user_id):
+    habit = request.param('habit')
+    if not habit:
+        raise HTTPError(400, "the 'habit' query parameter is required")
+    completions = await server.db.read(_cursor_call(fetch_completions_for_habit), habit, user_id)
+    return 200, {'habit': habit, 'streaks': [{'user': user, 'count': count} for user, count in completions]}
+
+
+async def search_habits(server, request, user_id):
+    query = request.param('q') or ''
+    try:
+        limit = int(request.param('limit') or 10)
+    except ValueError:
+        raise HTTPError(400, "'limit' must be a number") from None
+    results = await server.db.read(_cursor_call(search_habit_names), query, max(1, min(limit, 100)))
+    return 200, {'results': [{'name': name, 'score': score} for name, score in results]}
+
+
+# (method, path pattern, handler, requires a session)
+ROUTES: List[Tuple[str, re.Pattern, Callable, bool]] = [
+    (method, re.compile(f"^{pattern}$"), handler, private)
+    for method, pattern, handler, private in [
+        ('GET', r'/health', health, False),
+        ('POST', r'/accounts', create_account, False),
+        ('POST', r'/sessions', create_session, False),
+        ('DELETE', r'/sessions', end_session, True),
+        ('DELETE', r'/account', delete_account, True),
+        ('GET', r'/habits', list_habits, True),
+        ('POST', r'/habits', add_habit, True),
+        ('DELETE', r'/habits/(\d+)', delete_habit, True),
+        ('POST', r'/habits/(\d+)/completions', log_completion, True),
+        ('GET', r'/profile', view_profile, True),
+        ('GET', r'/analytics', view_analytics, True),
+        ('GET', r'/reports/habits', report_habits, True),
+        ('GET', r'/reports/streaks/longest', report_longest_streak, True),
+        ('GET', r'/reports/streaks', report_habit_streaks, True),
+        ('GET', r'/reports/search', search_habits, True),
+    ]
+]
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+
+# ---------------------------
+# Server
+# ---------------------------
+
+class ApiServer:
+    """
+    An asyncio HTTP/1.1 server answering the habit tracker's JSON API.
+
+    Attributes:
+        host (str): The interface to listen on.
+        port (int): The port to listen on; the bound port once started (pass 0 for any free one).
+        db (Database): The executors running the SQLite calls.
+        sessions (dict): Session token -> (user_id, time.monotonic() at which it expires).
+        session_ttl (float): Seconds a session stays valid after the last request that used it.
+        idle_timeout (float): Seconds a keep-alive connection may wait for its next request.
+        password_iterations (int): PBKDF2 iterations for the passwords of new accounts.
+        dummy_password (str): A hash checked against when logging in to an unknown username.
+    """
+
+    def __init__(self, db_path=DB_PATH, host: str = '127.0.0.1', port: int = 8080, readers: int = 4,
+                 max_pending: int = 256, idle_timeout: float = 60.0, password_iterations: int = ITERATIONS,
+                 hashers: int = 2, session_ttl: float = 3600.0):
+        self.host = host
+        self.port = port
+        self.db = Database(db_path, readers, max_pending, hashers)
+        self.sessions: Dict[str, Tuple[int, float]] = {}
+        self.session_ttl = session_ttl
+        self.idle_timeout = idle_timeout
+        self.password_iterations = password_iterations
+        self.dummy_password = hash_password(secrets.token_urlsafe(16), password_iterations)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients = set()
+
+    async def start(self) -> 'ApiServer':
+        await asyncio.get_running_loop().run_in_executor(None, ensure_schema, self.db.db_path)
+        self._server = await asyncio.start_server(self._serve_client, self.host, self.port,
+                                                  limit=MAX_HEADER_SIZE, backlog=4096)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting, drop open connections, then wait for running SQLite calls."""
+        self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        await self._server.wait_closed()
+        await asyncio.get_running_loop().run_in_executor(None, self.db.close)
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def start_session(self, user_id: int) -> str:
+        """Return a new session token for `user_id`, dropping sessions that have expired."""
+        now = time.monotonic()
+        for token in [token for token, (_, expires) in self.sessions.items() if expires <= now]:
+            del self.sessions[token]
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = (user_id, now + self.session_ttl)
+        return token
+
+    def session_user(self, token: Optional[str]) -> Optional[int]:
+        """The user_id of a live session, extending it; None for unknown or expired tokens."""
+        session = self.sessions.get(token)
+        if session is None:
+            return None
+        user_id, expires = session
+        now = time.monotonic()
+        if expires <= now:
+            del self.sessions[token]
+            return None
+        self.sessions[token] = (user_id, now + self.session_ttl)
+        return user_id
+
+    def end_sessions(self, user_id: int) -> None:
+        for token in [token for token, (owner, _) in self.sessions.items() if owner == user_id]:
+            del self.sessions[token]
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients.add(writer)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.idle_timeout)
+                except HTTPError as e:
+                    # The stream is out of step after a malformed request; answer and hang up
+                    writer.write(_response(e.status, {'error': e.message}, keep_alive=False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                status, payload = await self._dispatch(request)
+                writer.write(_response(status, payload, request.keep_alive))
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """The next request on the connection, or None once the client has closed it."""
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+        except asyncio.IncompleteReadError as e:
+            if e.partial.strip():
+                raise
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "request headers too large") from None
+
+        request_line, *header_lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = request_line.split(' ')
+        except ValueError:
+            raise HTTPError(400, "malformed request line") from None
+        if version not in ('HTTP/1.0', 'HTTP/1.1'):
+            raise HTTPError(505, "only HTTP/1.0 and HTTP/1.1 are supported")
+
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        if 'transfer-encoding' in headers:
+            raise HTTPError(501, "send the body with a Content-Length instead")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length") from None
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, f"request body over {MAX_BODY_SIZE} bytes")
+        body = await reader.readexactly(length) if length else b''
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+        url = urlsplit(target)
+        return Request(method.upper(), unquote(url.path), parse_qs(url.query), headers, body, keep_alive)
+
+    async def _dispatch(self, request: Request) -> Tuple[int, Optional[dict]]:
+        allowed = []
+        for method, pattern, handler, private in ROUTES:
+            match = pattern.match(request.path)
+            if not match:
+                continue
+            if method != request.method:
+                allowed.append(method)
+                continue
+            try:
+                user_id = None
+                if private:
+                    user_id = self.session_user(_bearer_token(request))
+                    if user_id is None:
+                        raise HTTPError(401, "log in with POST /sessions and send the token as a Bearer token")
+                return await handler(self, request, user_id, *match.groups())
+            except HTTPError as e:
+                return e.status, {'error': e.message}
+            except Exception:
+                traceback.print_exc()
+                return 500, {'error': "internal server error"}
+        if allowed:
+            return 405, {'error': f"use {' or '.join(allowed)}"}
+        return 404, {'error': f"no route for {request.path}"}
+
+
+def _response(status: int, payload: Optional[dict], keep_alive: bool) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    body = b''
+    if payload is not None:
+        body = json.dumps(payload, default=str).encode('utf-8')
+        lines.append("Content-Type: application/json")
+    if status != 204:
+        lines.append(f"Content-Length: {len(body)}")
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def serve(db_path=DB_PATH, host: str = '127.0.0.1', port: int = 8080, readers: int = 4,
+                max_pending: int = 256, idle_timeout: float = 60.0, hashers: int = 2,
+                session_ttl: float = 3600.0) -> None:
+    async with ApiServer(db_path, host, port, readers, max_pending, idle_timeout, hashers=hashers,
+                         session_ttl=session_ttl) as server:
+        print(f"🌐 Serving the habit tracker API on http://{server.host}:{server.port} (Ctrl+C to stop)...")
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the habit tracker as an HTTP/JSON API.")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on")
+    parser.add_argument('--port', type=int, default=8080, help="port to listen on")
+    parser.add_argument('--readers', type=int, default=4, help="reader threads (one connection each)")
+    parser.add_argument('--hashers', type=int, default=2, help="password hashing threads")
+    parser.add_argument('--max-pending', type=int, default=256, help="database calls queued or running at once")
+    parser.add_argument('--idle-timeout', type=float, default=60.0, help="seconds before an idle connection is closed")
+    parser.add_argument('--session-ttl', type=float, default=3600.0, help="seconds before an unused session expires")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(DB_PATH, args.host, args.port, args.readers, args.max_pending, args.idle_timeout,
+                          args.hashers, args.session_ttl))
+    except KeyboardInterrupt:
+        print("👋 Server stopped.")
@@ -0,0 +1,186 @@
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+from db import DB_PATH, create_connection as get_connection
+
+# ---------------------------
+# Online backups
+# ---------------------------
+#
+# Snapshots are copied with the SQLite online backup API a few pages at a time,
+# sleeping between steps (in the progress callback; the backup API itself only
+# sleeps when a step is busy) so the database stays available to writers.
+# A writer that commits mid-backup makes SQLite restart the copy, so the
+# result is always a consistent snapshot. Under steady writes a paced copy
+# might never finish, so after `max_restarts` restarts the backup falls back to
+# a single VACUUM INTO, which reads one snapshot without restarting. Every
+# snapshot is written to a temporary file, switched out of WAL mode so it is
+# one self-contained file, checked with PRAGMA integrity_check, and only then
+# renamed into place.
+
+SNAPSHOT_PREFIX = 'habit_tracker-'
+SNAPSHOT_SUFFIX = '.db'
+
+
+class _TooManyRestarts(Exception):
+    """Raised from the progress callback to abandon a paced copy."""
+
+
+class BackupResult(NamedTuple):
+    path: str
+    pages: int
+    size_bytes: int
+    seconds: float
+    restarts: int = 0       # times a concurrent write restarted the paced copy
+    vacuumed: bool = False  # True if the copy was finished with VACUUM INTO instead
+
+    @property
+    def throughput(self) -> float:
+        """Bytes copied per second."""
+        return self.size_bytes / self.seconds if self.seconds else float(self.size_bytes)
+
+
+def verify_snapshot(path) -> List[str]:
+    """Run PRAGMA integrity_check on `path`; returns [] when the snapshot is sound."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        messages = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        # Damage severe enough that SQLite can't even read the schema
+        messages = [str(e)]
+    finally:
+        conn.close()
+    return [] if messages == ['ok'] else messages
+
+
+def backup_database(dest_path, source_path=DB_PATH, pages: int = 64, sleep: float = 0.05,
+                    progress: Optional[Callable[[int, int], None]] = None,
+                    max_restarts: int = 3) -> BackupResult:
+    """
+    Copy `source_path` to `dest_path` while it stays in use, `pages` pages per step
+    with `sleep` seconds between steps. `progress(copied, total)` is called after
+    each step. After `max_restarts` restarts caused by concurrent writes the copy
+    is finished with VACUUM INTO. Raises RuntimeError if the snapshot fails its
+    integrity check.
+    """
+    partial_path = f"{dest_path}.partial"
+    source = get_connection(source_path)
+    target = sqlite3.connect(partial_path)
+    started = time.perf_counter()
+    restarts = 0
+    vacuumed = False
+    try:
+        last_copied = 0
+
+        def report(_status, remaining, total):
+            nonlocal last_copied, restarts
+            copied = total - remaining
+            if remaining and copied <= last_copied:
+                # The copy started over after another connection committed
+                restarts += 1
+                if restarts > max_restarts:
+                    raise _TooManyRestarts
+            last_copied = copied
+            if progress:
+                progress(copied, total)
+            if remaining and sleep > 0:
+                time.sleep(sleep)
+
+        try:
+            source.backup(target, pages=pages, progress=report, sleep=sleep)
+        except _TooManyRestarts:
+            target.close()
+            os.remove(partial_path)
+            source.execute("VACUUM INTO ?", (partial_path,))
+            target = sqlite3.connect(partial_path)
+            vacuumed = True
+        # The copy inherits WAL mode from the source; a snapshot is a single file
+        target.execute("PRAGMA journal_mode = DELETE")
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        page_size = target.execute("PRAGMA page_size").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    elapsed = time.perf_counter() - started
+
+    problems = verify_snapshot(partial_path)
+    if problems:
+        os.remove(partial_path)
+        raise RuntimeError(f"Snapshot failed integrity check: {'; '.join(problems[:5])}")
+
+    os.replace(partial_path, dest_path)
+    return BackupResult(str(dest_path), page_count, page_count * page_size, elapsed, restarts, vacuumed)
+
+
+def list_snapshots(backup_dir) -> List[str]:
+    """Snapshot paths in `backup_dir`, oldest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    names = sorted(
+        name for name in os.listdir(backup_dir)
+        if name.startswith(SNAPSHOT_PREFIX) and name.endswith(SNAPSHOT_SUFFIX)
+    )
+    return [os.path.join(backup_dir, name) for name in names]
+
+
+def rotate_snapshots(backup_dir, keep: int) -> List[str]:
+    """Delete all but the `keep` newest snapshots; returns the deleted paths."""
+    snapshots = list_snapshots(backup_dir)
+    expired = snapshots[:-keep] if keep > 0 else snapshots
+    for path in expired:
+        os.remove(path)
+    return expired
+
+
+def take_snapshot(backup_dir, source_path=DB_PATH, keep: int = 7, pages: int = 64, sleep: float = 0.05,
+                  progress: Optional[Callable[[int, int], None]] = None, max_restarts: int = 3) -> BackupResult:
+    """Write a timestamped, verified snapshot to `backup_dir` and rotate old ones."""
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    dest_path = os.path.join(backup_dir, f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}")
+    result = backup_database(dest_path, source_path, pages=pages, sleep=sleep, progress=progress,
+                             max_restarts=max_restarts)
+    rotate_snapshots(backup_dir, keep)
+    return result
+
+
+def run_schedule(backup_dir, every: float, source_path=DB_PATH, keep: int = 7, pages: int = 64,
+                 sleep: float = 0.05, runs: Optional[int] = None, max_restarts: int = 3) -> None:
+    """Take a snapshot every `every` seconds (forever, or `runs` times)."""
+    done = 0
+    while runs is None or done < runs:
+        started = time.monotonic()
+        try:
+            result = take_snapshot(backup_dir, source_path, keep=keep, pages=pages, sleep=sleep,
+                                   progress=_print_progress, max_restarts=max_restarts)
+            print(f"\n✅ Snapshot {result.path}: {result.size_bytes / 1024:.0f} KiB "
+                  f"in {result.seconds:.2f}s ({result.throughput / 1024:.0f} KiB/s)")
+            if result.vacuumed:
+                print(f"ℹ️ Restarted {result.restarts} times by concurrent writes; finished with VACUUM INTO.")
+        except (sqlite3.Error, OSError, RuntimeError) as e:
+            print(f"\n❌ Backup failed: {e}")
+        done += 1
+        if runs is None or done < runs:
+            time.sleep(max(0.0, every - (time.monotonic() - started)))
+
+
+def _print_progress(copied, total):
+    print(f"\r💾 Backing up: {copied}/{total} pages", end='', flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Back up habit_tracker.db while it is in use.")
+    parser.add_argument('--dir', default='backups', help="directory for snapshots")
+    parser.add_argument('--pages', type=int, default=64, help="pages copied per step")
+    parser.add_argument('--sleep', type=float, default=0.05, help="seconds to pause between steps")
+    parser.add_argument('--max-restarts', type=int, default=3,
+                        help="restarts by concurrent writes before finishing with VACUUM INTO")
+    parser.add_argument('--keep', type=int, default=7, help="number of snapshots to keep")
+    parser.add_argument('--every', type=float, help="repeat every N seconds instead of running once")
+    args = parser.parse_args()
+
+    run_schedule(args.dir, args.every or 0, keep=args.keep, pages=args.pages, sleep=args.sleep,
+                 runs=None if args.every else 1, max_restarts=args.max_restarts)
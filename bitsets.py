@@ -0,0 +1,147 @@
+import argparse
+from datetime import date, timedelta
+from typing import Dict, List, NamedTuple, Optional
+from db import DB_PATH, create_connection as get_connection
+
+# ---------------------------
+# Completion bitsets
+# ---------------------------
+#
+# completion_bitset holds one BLOB per habit in which bit i (byte i // 8, bit
+# i % 8) is set if the habit was completed in the i-th period after `origin`.
+# A period is a day for daily habits and an ISO week (origin is a Monday) for
+# weekly ones, so a year of history is 46 bytes, or 7 for a weekly habit. A
+# trigger on completion_history sets bits in place (see
+# db.create_completion_bitsets).
+#
+# The BLOB is read as one little-endian integer, so window counts are a shift,
+# a mask and a population count, and streaks are found by scanning for the
+# highest clear bit instead of walking history rows.
+
+
+class Bitset(NamedTuple):
+    habit_id: int
+    unit: int          # days per bit: 1 (daily) or 7 (weekly)
+    origin: date       # first day of period 0
+    bits: int
+
+    def index(self, day: date) -> int:
+        """Index of the period containing `day` (negative before `origin`)."""
+        return (day - self.origin).days // self.unit
+
+    def period_start(self, index: int) -> date:
+        return self.origin + timedelta(days=index * self.unit)
+
+    def completed(self, day: date) -> bool:
+        i = self.index(day)
+        return i >= 0 and bool(self.bits >> i & 1)
+
+
+def _from_row(row) -> Bitset:
+    habit_id, unit, origin, bits = row
+    return Bitset(habit_id, unit, date.fromisoformat(origin), int.from_bytes(bits, 'little'))
+
+
+def load_bitset(cursor, habit_id: int) -> Optional[Bitset]:
+    """The habit's bitset, or None if it has never been completed."""
+    cursor.execute("SELECT habit_id, unit, origin, bits FROM completion_bitset WHERE habit_id = ?", (habit_id,))
+    row = cursor.fetchone()
+    return _from_row(row) if row else None
+
+
+def load_user_bitsets(cursor, user_id: int) -> Dict[int, Bitset]:
+    """Bitsets of all of a user's completed habits, keyed by habit_id."""
+    cursor.execute("""
+        SELECT b.habit_id, b.unit, b.origin, b.bits
+        FROM habit h
+        JOIN completion_bitset b ON b.habit_id = h.habit_id
+        WHERE h.user_id = ?
+    """, (user_id,))
+    return {row[0]: _from_row(row) for row in cursor.fetchall()}
+
+
+# ---------------------------
+# Queries
+# ---------------------------
+
+def _window(bitset: Bitset, first: int, last: int) -> int:
+    """Bits `first`..`last` (inclusive, clipped at 0) shifted down to bit 0."""
+    first = max(first, 0)
+    if last < first:
+        return 0
+    return bitset.bits >> first & ((1 << (last - first + 1)) - 1)
+
+
+def _popcount(bits: int) -> int:
+    """Number of set bits; int.bit_count() only exists from Python 3.10."""
+    return bin(bits).count('1')
+
+
+def count_between(bitset: Bitset, start: date, end: date) -> int:
+    """Number of periods completed from the one containing `start` to the one containing `end`."""
+    return _popcount(_window(bitset, bitset.index(start), bitset.index(end)))
+
+
+def count_last(bitset: Bitset, periods: int, today: Optional[date] = None) -> int:
+    """Number of the last `periods` periods (up to and including today's) that were completed."""
+    current = bitset.index(today or date.today())
+    return _popcount(_window(bitset, current - periods + 1, current))
+
+
+def last_periods(bitset: Bitset, periods: int, today: Optional[date] = None) -> List[bool]:
+    """Completion of each of the last `periods` periods, oldest first."""
+    current = bitset.index(today or date.today())
+    return [i >= 0 and bool(bitset.bits >> i & 1) for i in range(current - periods + 1, current + 1)]
+
+
+def _run_ending_at(bits: int, last: int) -> int:
+    """Length of the run of set bits ending at bit `last`."""
+    if last < 0:
+        return 0
+    clear = ~bits & ((1 << (last + 1)) - 1)
+    return last + 1 if clear == 0 else last - (clear.bit_length() - 1)
+
+
+def current_streak(bitset: Bitset, today: Optional[date] = None) -> int:
+    """
+    Consecutive completed periods up to now. The current period counts if it
+    is completed, and doesn't break the streak if it isn't (yet).
+    """
+    current = bitset.index(today or date.today())
+    if current >= 0 and bitset.bits >> current & 1:
+        return _run_ending_at(bitset.bits, current)
+    return _run_ending_at(bitset.bits, current - 1)
+
+
+def longest_streak(bitset: Bitset) -> int:
+    """Length of the longest run of consecutive completed periods."""
+    bits, length = bitset.bits, 0
+    # Each step clears the last bit of every run; runs of length n survive n steps
+    while bits:
+        bits &= bits >> 1
+        length += 1
+    return length
+
+
+def last_completed_period(bitset: Bitset) -> Optional[date]:
+    """Start of the most recent completed period."""
+    return bitset.period_start(bitset.bits.bit_length() - 1) if bitset.bits else None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show completion streaks from the habit bitsets.")
+    parser.add_argument('user_id', type=int)
+    parser.add_argument('--days', type=int, default=365, help="window for the completed-days count")
+    args = parser.parse_args()
+
+    conn = get_connection(DB_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT habit_id, name FROM habit_detail WHERE user_id = ? ORDER BY habit_id", (args.user_id,))
+        names = dict(cursor.fetchall())
+        for habit_id, bitset in load_user_bitsets(cursor, args.user_id).items():
+            window = -(-args.days // bitset.unit)
+            print(f"🔥 {names[habit_id]}: streak {current_streak(bitset)}, longest {longest_streak(bitset)}, "
+                  f"{count_last(bitset, window)}/{window} periods in the last {args.days} days")
+    finally:
+        conn.close()
@@ -0,0 +1,123 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple
+
+# ---------------------------
+# Analytics result cache
+# ---------------------------
+#
+# Results of the analyze.fetch_* helpers are memoized per connection, keyed by
+# function and parameters. Validation is two-level:
+#   1. `PRAGMA data_version` (bumped by commits from other connections) and the
+#      connection's own `total_changes`. If neither moved, every entry is valid.
+#   2. Otherwise the per-table counters in table_version (see
+#      db.create_change_counters) are read once, and only entries that depend
+#      on a changed table are dropped.
+
+# Tables each cached analyze.py function reads
+DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    'fetch_all_users': ('user_info',),
+    'fetch_all_habits': ('user_info', 'habit'),
+    'fetch_habits_by_periodicity': ('user_info', 'habit'),
+    'fetch_all_completions': ('user_info', 'habit', 'completion'),
+    'fetch_completions_for_habit': ('user_info', 'habit', 'completion'),
+    'search_habit_names': ('habit',),
+}
+
+
+def estimate_size(rows) -> int:
+    """Approximate memory used by a list of result rows, in bytes."""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row)
+        if isinstance(row, tuple):
+            size += sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    """
+    An LRU cache of fetch_* results for one database connection.
+
+    Attributes:
+        conn (sqlite3.Connection): The connection the cached queries run on.
+        max_entries (int): The maximum number of cached results.
+        max_bytes (int): The approximate memory cap for all cached results.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that ran the query.
+
+    Cached results are shared between callers and must not be modified.
+    """
+
+    def __init__(self, conn, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.conn = conn
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, Tuple[Any, Dict[str, int], int]]" = OrderedDict()
+        self._size = 0
+        self._data_version = None
+        self._total_changes = None
+        self._table_versions: Dict[str, int] = {}
+
+    def fetch(self, func: Callable, *args):
+        """Return func(cursor, *args), from the cache when its tables haven't changed."""
+        name = func.__name__
+        if name not in DEPENDENCIES:
+            raise ValueError(f"{name} is not a cacheable query")
+        self._validate()
+
+        key = (name, args)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        result = func(self.conn.cursor(), *args)
+        versions = {table: self._table_versions.get(table, 0) for table in DEPENDENCIES[name]}
+        self._store(key, result, versions)
+        return result
+
+    def revalidate(self):
+        """Force the next lookup to re-check the table counters, e.g. after the data under `conn` was replaced."""
+        self._data_version = None
+        self._total_changes = None
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def _validate(self):
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA data_version")
+        data_version = cursor.fetchone()[0]
+        total_changes = self.conn.total_changes
+        if (data_version, total_changes) == (self._data_version, self._total_changes):
+            return
+
+        cursor.execute("SELECT table_name, version FROM table_version")
+        self._table_versions = dict(cursor.fetchall())
+        self._data_version, self._total_changes = data_version, total_changes
+
+        stale = [
+            key for key, (_result, versions, _size) in self._entries.items()
+            if any(self._table_versions.get(table, 0) != version for table, version in versions.items())
+        ]
+        for key in stale:
+            self._evict(key)
+
+    def _store(self, key, result, versions):
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (result, versions, size)
+        self._size += size
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key):
+        _result, _versions, size = self._entries.pop(key)
+        self._size -= size
@@ -0,0 +1,142 @@
+import argparse
+import json
+from typing import Callable, Iterator, List, NamedTuple, Optional
+from db import DB_PATH, create_connection as get_connection
+
+# ---------------------------
+# Change feed consumers
+# ---------------------------
+#
+# Triggers in db.create_change_log append a change_log row for every insert,
+# update and delete on user_info, habit and completion. Sequence numbers only
+# ever grow (AUTOINCREMENT never reuses one, even after pruning).
+#
+# A consumer is a name with a saved position. It reads the changes after that
+# position in batches, applies them to whatever it maintains (a cache, an
+# aggregate, an export), then acknowledges the last sequence number it handled.
+# Changes every consumer has acknowledged can be pruned. A consumer that fails
+# before acknowledging sees the same batch again, so handlers must tolerate
+# replays.
+
+
+class Change(NamedTuple):
+    seq: int
+    table: str
+    operation: str        # 'insert', 'update' or 'delete'
+    row_id: int
+    data: dict            # the row after the change (before it, for deletes)
+    changed_at: str
+
+
+def register_consumer(conn, name: str, from_start: bool = False) -> int:
+    """
+    Create consumer `name` if it doesn't exist and return its position. A new
+    consumer starts at the end of the log, or at the oldest change kept if `from_start`.
+    """
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO change_consumer (name, last_seq)
+            SELECT ?, CASE WHEN ? THEN 0 ELSE COALESCE(MAX(seq), 0) END FROM change_log
+        """, (name, from_start))
+        return consumer_position(cursor, name)
+
+
+def unregister_consumer(conn, name: str) -> None:
+    """Forget consumer `name`, so it no longer holds back pruning."""
+    with conn:
+        conn.execute("DELETE FROM change_consumer WHERE name = ?", (name,))
+
+
+def consumer_position(cursor, name: str) -> int:
+    cursor.execute("SELECT last_seq FROM change_consumer WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    if row is None:
+        raise KeyError(f"Unknown change consumer: {name}")
+    return row[0]
+
+
+def read_changes(cursor, name: str, limit: int = 500) -> List[Change]:
+    """The next `limit` changes after consumer `name`'s position, oldest first."""
+    position = consumer_position(cursor, name)
+    cursor.execute("""
+        SELECT seq, table_name, operation, row_id, data, changed_at
+        FROM change_log
+        WHERE seq > ?
+        ORDER BY seq
+        LIMIT ?
+    """, (position, limit))
+    return [Change(seq, table, operation, row_id, json.loads(data), changed_at)
+            for seq, table, operation, row_id, data, changed_at in cursor.fetchall()]
+
+
+def acknowledge(conn, name: str, seq: int) -> None:
+    """Record that consumer `name` has handled every change up to `seq`."""
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE change_consumer SET last_seq = MAX(last_seq, ?) WHERE name = ?", (seq, name))
+        if cursor.rowcount != 1:
+            raise KeyError(f"Unknown change consumer: {name}")
+
+
+def prune(conn) -> int:
+    """Delete changes every consumer has acknowledged (all of them if there are no consumers)."""
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM change_log
+            WHERE seq <= COALESCE((SELECT MIN(last_seq) FROM change_consumer),
+                                  (SELECT MAX(seq) FROM change_log))
+        """)
+        return cursor.rowcount
+
+
+def iter_batches(conn, name: str, batch_size: int = 500) -> Iterator[List[Change]]:
+    """
+    Yield batches of changes for consumer `name` until it has caught up. Each
+    batch is acknowledged when the caller asks for the next one.
+    """
+    cursor = conn.cursor()
+    while True:
+        batch = read_changes(cursor, name, batch_size)
+        if not batch:
+            return
+        yield batch
+        acknowledge(conn, name, batch[-1].seq)
+
+
+def consume(conn, name: str, handler: Callable[[List[Change]], None], batch_size: int = 500,
+            max_batches: Optional[int] = None) -> int:
+    """Pass pending changes to `handler` batch by batch, acknowledging each; returns the number handled."""
+    handled = 0
+    for number, batch in enumerate(iter_batches(conn, name, batch_size)):
+        handler(batch)
+        handled += len(batch)
+        if max_batches is not None and number + 1 >= max_batches:
+            acknowledge(conn, name, batch[-1].seq)
+            break
+    return handled
+
+
+def _print_batch(batch: List[Change]) -> None:
+    for change in batch:
+        print(f"{change.seq}\t{change.table}\t{change.operation}\t{change.row_id}\t{json.dumps(change.data)}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Print pending changes for a change feed consumer.")
+    parser.add_argument('consumer', help="consumer name (registered on first use)")
+    parser.add_argument('--from-start', action='store_true', help="start a new consumer at the oldest change")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--prune', action='store_true', help="delete changes all consumers have acknowledged")
+    args = parser.parse_args()
+
+    conn = get_connection(DB_PATH)
+    try:
+        register_consumer(conn, args.consumer, args.from_start)
+        handled = consume(conn, args.consumer, _print_batch, args.batch_size)
+        print(f"📬 {handled} changes consumed by '{args.consumer}'.")
+        if args.prune:
+            print(f"🧹 Pruned {prune(conn)} acknowledged changes.")
+    finally:
+        conn.close()
@@ -0,0 +1,19 @@
+import pytest
+
+import db
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Fixture to create a fresh database with every table; returns its path."""
+    path = tmp_path / "habit_tracker.db"
+    db.create_tables(path)
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    """Fixture to open a connection to the fresh database at `db_path`."""
+    conn = db.create_connection(db_path)
+    yield conn
+    conn.close()
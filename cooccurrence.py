@@ -0,0 +1,233 @@
+import argparse
+import heapq
+import math
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from db import DB_PATH, create_connection as get_connection
+from reports import iter_user_chunks
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional: the pure-Python CSR below gives the same results
+    np = sparse = None
+
+# ---------------------------
+# Habit co-occurrence
+# ---------------------------
+#
+# Rows of the matrix are users, columns are habit templates (shared
+# name/description, see db.create_habit_templates) and each entry is the
+# user's adherence to that habit: completions divided by the periods since
+# the habit was created, capped at 1.
+#
+# Users are read in chunks. Each chunk becomes a CSR matrix A (SciPy when it
+# is installed, otherwise arrays from the standard library) and is folded
+# into running sums, so memory depends on the chunk size and the number of
+# habit pairs, not on the number of users:
+#   - together[i, j]: users tracking both templates  (B^T B, B = A != 0)
+#   - sxy[i, j]:      sum of adherence products      (A^T A)
+#   - sx[i], sxx[i]:  column sums of A and A squared
+# which is everything the Pearson correlation of two columns needs. The top-K
+# related templates per template are written to habit_related.
+
+
+class RelatedHabit(NamedTuple):
+    template_id: int
+    name: str
+    together: int
+    correlation: float
+
+
+class CSRChunk(NamedTuple):
+    """A chunk of users in compressed sparse row form, backed by arrays."""
+    indptr: array      # row r spans indices[indptr[r]:indptr[r + 1]]
+    indices: array     # column (template index) of each entry
+    data: array        # adherence of each entry
+
+    @property
+    def rows(self) -> int:
+        return len(self.indptr) - 1
+
+
+def load_chunk(cursor, columns: Dict[int, int], first: int, last: int, now: datetime) -> CSRChunk:
+    """Adherence rows for users `first`..`last`; `columns` maps template_id to column index."""
+    cursor.execute("""
+        SELECT h.user_id, h.template_id,
+               MAX(MIN(1.0, COALESCE(c.count, 0) / MAX(1.0,
+                   (julianday(?) - julianday(h.created_at)) / CASE h.periodicity WHEN 'weekly' THEN 7 ELSE 1 END)))
+        FROM habit h
+        LEFT JOIN completion c ON c.habit_id = h.habit_id
+        WHERE h.user_id BETWEEN ? AND ?
+        GROUP BY h.user_id, h.template_id
+        ORDER BY h.user_id, h.template_id
+    """, (now, first, last))
+
+    indptr, indices, data = array('q', [0]), array('q'), array('d')
+    current = None
+    for user_id, template_id, adherence in cursor.fetchall():
+        if user_id != current:
+            if current is not None:
+                indptr.append(len(indices))
+            current = user_id
+        indices.append(columns[template_id])
+        data.append(adherence)
+    if current is not None:
+        indptr.append(len(indices))
+    return CSRChunk(indptr, indices, data)
+
+
+class _ArrayAccumulator:
+    """Running column and pair sums over CSRChunks, in plain Python."""
+
+    def __init__(self, size: int):
+        self.sx = array('d', bytes(8 * size))
+        self.sxx = array('d', bytes(8 * size))
+        self._pairs: Dict[Tuple[int, int], List[float]] = {}
+
+    def add(self, chunk: CSRChunk) -> None:
+        indices, data = chunk.indices, chunk.data
+        for row in range(chunk.rows):
+            start, end = chunk.indptr[row], chunk.indptr[row + 1]
+            for a in range(start, end):
+                i, x = indices[a], data[a]
+                self.sx[i] += x
+                self.sxx[i] += x * x
+                for b in range(a + 1, end):
+                    j = indices[b]
+                    key = (i, j) if i < j else (j, i)
+                    stats = self._pairs.get(key)
+                    if stats is None:
+                        self._pairs[key] = [1, x * data[b]]
+                    else:
+                        stats[0] += 1
+                        stats[1] += x * data[b]
+
+    def pairs(self) -> Iterator[Tuple[int, int, int, float]]:
+        """(i, j, together, sxy) for every pair i < j tracked by at least one user."""
+        for (i, j), (together, sxy) in self._pairs.items():
+            yield i, j, together, sxy
+
+
+class _SparseAccumulator:
+    """The same sums with SciPy sparse matrices."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.sx = np.zeros(size)
+        self.sxx = np.zeros(size)
+        self._together = sparse.csr_matrix((size, size), dtype=np.int64)
+        self._sxy = sparse.csr_matrix((size, size))
+
+    def add(self, chunk: CSRChunk) -> None:
+        a = sparse.csr_matrix(
+            (np.frombuffer(chunk.data, dtype=np.float64), np.frombuffer(chunk.indices, dtype=np.int64),
+             np.frombuffer(chunk.indptr, dtype=np.int64)),
+            shape=(chunk.rows, self.size)
+        )
+        b = a.copy()
+        b.data = np.ones_like(b.data, dtype=np.int64)
+        self._together = self._together + sparse.triu(b.T @ b, k=1, format='csr')
+        self._sxy = self._sxy + sparse.triu(a.T @ a, k=1, format='csr')
+        self.sx += np.asarray(a.sum(axis=0)).ravel()
+        self.sxx += np.asarray(a.multiply(a).sum(axis=0)).ravel()
+
+    def pairs(self) -> Iterator[Tuple[int, int, int, float]]:
+        together = self._together.tocoo()
+        sxy = self._sxy.todok()
+        for i, j, count in zip(together.row, together.col, together.data):
+            yield int(i), int(j), int(count), float(sxy[i, j])
+
+
+def correlation(n: int, sx_i: float, sxx_i: float, sx_j: float, sxx_j: float, sxy: float) -> float:
+    """Pearson correlation of two adherence columns over `n` users, from their sums."""
+    denominator = (n * sxx_i - sx_i * sx_i) * (n * sxx_j - sx_j * sx_j)
+    if denominator <= 0:
+        return 0.0
+    return (n * sxy - sx_i * sx_j) / math.sqrt(denominator)
+
+
+def compute_related(conn, top_k: int = 10, min_together: int = 2, chunk_size: int = 5000,
+                    now: Optional[datetime] = None, use_scipy: Optional[bool] = None) -> int:
+    """
+    Rebuild habit_related with the `top_k` templates most often tracked together
+    with each template (ties broken by adherence correlation). Pairs tracked by
+    fewer than `min_together` users are ignored. Returns the rows written.
+    """
+    now = now or datetime.now()
+    use_scipy = sparse is not None if use_scipy is None else use_scipy
+    if use_scipy and sparse is None:
+        raise RuntimeError("use_scipy requires numpy and scipy")
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT template_id FROM habit ORDER BY template_id")
+    template_ids = [row[0] for row in cursor.fetchall()]
+    columns = {template_id: index for index, template_id in enumerate(template_ids)}
+    users = cursor.execute("SELECT COUNT(*) FROM user_info").fetchone()[0]
+
+    totals = (_SparseAccumulator if use_scipy else _ArrayAccumulator)(len(template_ids))
+    for first, last in iter_user_chunks(conn.cursor(), chunk_size):
+        totals.add(load_chunk(cursor, columns, first, last, now))
+
+    # Keep only the best top_k per template while scanning the pairs
+    best: Dict[int, list] = {}
+    for i, j, together, sxy in totals.pairs():
+        if together < min_together:
+            continue
+        r = correlation(users, totals.sx[i], totals.sxx[i], totals.sx[j], totals.sxx[j], sxy)
+        for a, b in ((i, j), (j, i)):
+            heap = best.setdefault(a, [])
+            entry = (together, r, -template_ids[b])
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    rows = [
+        (template_ids[i], rank, -negative_id, together, r)
+        for i, heap in best.items()
+        for rank, (together, r, negative_id) in enumerate(sorted(heap, reverse=True), start=1)
+    ]
+    with conn:
+        conn.execute("DELETE FROM habit_related")
+        conn.executemany(
+            "INSERT INTO habit_related (template_id, rank, related_id, together, correlation) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+    return len(rows)
+
+
+def related_habits(cursor, habit_name: str, limit: int = 5) -> List[RelatedHabit]:
+    """Habits most often kept together with `habit_name`, from the last compute_related run."""
+    cursor.execute("""
+        SELECT r.related_id, t.name, MAX(r.together), MAX(r.correlation)
+        FROM habit_template s
+        JOIN habit_related r ON r.template_id = s.template_id
+        JOIN habit_template t ON t.template_id = r.related_id
+        WHERE s.name = ? AND t.name != s.name
+        GROUP BY t.name
+        ORDER BY MAX(r.together) DESC, MAX(r.correlation) DESC
+        LIMIT ?
+    """, (habit_name, limit))
+    return [RelatedHabit(*row) for row in cursor.fetchall()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Find habits that users tend to keep together.")
+    parser.add_argument('--top-k', type=int, default=10, help="related habits stored per habit")
+    parser.add_argument('--min-together', type=int, default=2, help="ignore pairs kept by fewer users")
+    parser.add_argument('--chunk-size', type=int, default=5000, help="users per pass")
+    parser.add_argument('--habit', help="show the stored results for this habit instead of recomputing")
+    args = parser.parse_args()
+
+    conn = get_connection(DB_PATH)
+    try:
+        if args.habit:
+            for related in related_habits(conn.cursor(), args.habit, args.top_k):
+                print(f"🤝 {related.name}: kept together by {related.together} users, "
+                      f"adherence correlation {related.correlation:+.2f}")
+        else:
+            written = compute_related(conn, args.top_k, args.min_together, args.chunk_size)
+            print(f"✅ Stored {written} related-habit rows ({'SciPy' if sparse is not None else 'array'} backend).")
+    finally:
+        conn.close()
@@ -0,0 +1,106 @@
+import json
+from datetime import date
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# ---------------------------
+# Multi-user dashboard repository
+# ---------------------------
+#
+# Set-based versions of main.view_profile and main.view_analytics: each summary
+# is computed for a whole list of users in one grouped query. Short ID lists
+# are inlined as a VALUES list; longer ones are passed as a single JSON array
+# and expanded with json_each, so the query text and parameter count stay
+# small and reading never writes (no transaction is left open on the caller's
+# connection).
+
+# Lists longer than this are passed as one JSON parameter
+JSON_LIST_THRESHOLD = 500
+
+
+class ProfileSummary(NamedTuple):
+    user_id: int
+    username: str
+    created_at: str
+    completions: Tuple[Tuple[str, int], ...]  # (habit name, count)
+
+
+class AnalyticsSummary(NamedTuple):
+    user_id: int
+    total_habits: int
+    total_completions: int
+    today_completions: int
+
+
+def _ids_cte(user_ids: List[int]) -> Tuple[str, tuple]:
+    """Return a `WITH ids(user_id) AS (...)` clause and its parameters for `user_ids`."""
+    if len(user_ids) <= JSON_LIST_THRESHOLD:
+        return f"WITH ids(user_id) AS (VALUES {', '.join(['(?)'] * len(user_ids))})", tuple(user_ids)
+    return "WITH ids(user_id) AS (SELECT DISTINCT value FROM json_each(?))", (json.dumps(user_ids),)
+
+
+def fetch_profiles(cursor, user_ids: Iterable[int]) -> Dict[int, ProfileSummary]:
+    """Profile summaries (as shown by view_profile) for every existing user in `user_ids`."""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    ids, params = _ids_cte(user_ids)
+    cursor.execute(f"""
+        {ids}
+        SELECT u.user_id, u.username, u.created_at, h.name, c.count
+        FROM ids
+        JOIN user_info u ON u.user_id = ids.user_id
+        LEFT JOIN (habit_detail h JOIN completion c ON h.habit_id = c.habit_id) ON h.user_id = u.user_id
+        ORDER BY u.user_id, h.habit_id
+    """, params)
+
+    rows: Dict[int, list] = {}
+    for user_id, username, created_at, habit_name, count in cursor.fetchall():
+        entry = rows.setdefault(user_id, [username, created_at, []])
+        if habit_name is not None:
+            entry[2].append((habit_name, count))
+    return {
+        user_id: ProfileSummary(user_id, username, created_at, tuple(completions))
+        for user_id, (username, created_at, completions) in rows.items()
+    }
+
+
+def fetch_analytics(cursor, user_ids: Iterable[int],
+                    today: Optional[date] = None) -> Dict[int, AnalyticsSummary]:
+    """Analytics summaries (as shown by view_analytics) for every id in `user_ids`."""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    today = today or date.today()
+    ids, params = _ids_cte(user_ids)
+    cursor.execute(f"""
+        {ids}
+        SELECT ids.user_id,
+               COALESCE(h.total_habits, 0),
+               COALESCE(c.total_completions, 0),
+               COALESCE(c.today_completions, 0)
+        FROM ids
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS total_habits
+            FROM habit
+            WHERE user_id IN (SELECT user_id FROM ids)
+            GROUP BY user_id
+        ) h ON h.user_id = ids.user_id
+        LEFT JOIN (
+            SELECT user_id,
+                   SUM(count) AS total_completions,
+                   SUM(DATE(last_completed) = ?) AS today_completions
+            FROM completion
+            WHERE user_id IN (SELECT user_id FROM ids)
+            GROUP BY user_id
+        ) c ON c.user_id = ids.user_id
+    """, (*params, today.isoformat()))
+    return {row[0]: AnalyticsSummary(*row) for row in cursor.fetchall()}
+
+
+def fetch_dashboard(cursor, user_ids: Iterable[int], today: Optional[date] = None
+                    ) -> List[Tuple[ProfileSummary, AnalyticsSummary]]:
+    """Profile and analytics summaries side by side for every existing user in `user_ids`."""
+    user_ids = list(dict.fromkeys(user_ids))
+    profiles = fetch_profiles(cursor, user_ids)
+    analytics = fetch_analytics(cursor, [user_id for user_id in user_ids if user_id in profiles], today)
+    return [(profiles[user_id], analytics[user_id]) for user_id in user_ids if user_id in profiles]
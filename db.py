@@ -1,16 +1,32 @@
+import os
 import sqlite3
 
-def create_connection():
+DB_PATH = 'habit_tracker.db'
+
+# Stored in PRAGMA user_version by create_tables; bump it whenever the schema changes
+SCHEMA_VERSION = 5
+
+# Databases already checked by ensure_schema in this process
+_checked_paths = set()
+
+def create_connection(db_path=DB_PATH):
     """Create a database connection and return the connection object."""
-    conn = sqlite3.connect('habit_tracker.db')
+    conn = sqlite3.connect(db_path)
     conn.execute("PRAGMA foreign_keys = ON;")  # Enable foreign key constraint
     return conn
 
-def create_tables():
+def create_tables(db_path=DB_PATH):
     """Create user_info, habit, and completion tables with proper relationships."""
-    conn = create_connection()
+    conn = create_connection(db_path)
     cursor = conn.cursor()
 
+    # Free pages are returned to the OS by scheduled incremental_vacuum steps (see
+    # retention.py). This only takes effect while the database is still empty.
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    # WAL lets readers (analytics snapshots, backups) run alongside writers
+    cursor.execute("PRAGMA journal_mode = WAL")
+
     # Create user_info table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_info (
@@ -22,18 +38,11 @@ def create_tables():
         )
     ''')
 
-    # Create habit table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS habit (
-            habit_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            name TEXT NOT NULL,
-            description TEXT,
-            periodicity TEXT CHECK(periodicity IN ('daily', 'weekly')) NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
-        )
-    ''')
+    # Databases before version 5 kept each habit's name and description in the habit row
+    move_habit_text_to_templates(conn)
+
+    # Create habit table; the name and description live in habit_template
+    cursor.execute(HABIT_TABLE.format(table='habit'))
 
     # Create completion table (one row per habit)
     cursor.execute('''
@@ -48,12 +57,579 @@ def create_tables():
         )
     ''')
 
+    # Index per-user lookups (profiles, analytics and dashboards)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_habit_user ON habit(user_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_completion_user ON completion(user_id, habit_id)')
+
+    create_habit_templates(cursor)
+    create_habit_search_index(cursor)
+    create_completion_history(cursor)
+    create_rollup_tables(cursor)
+    create_habit_schedule(cursor)
+    create_change_counters(cursor)
+    create_retention_tables(cursor)
+    create_change_log(cursor)
+    create_completion_bitsets(cursor)
+    create_related_habits(cursor)
+    create_journal_state(cursor)
+
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
     conn.commit()
     conn.close()
 
-def insert_predefined_habits():
+def ensure_schema(db_path=DB_PATH):
+    """
+    Run create_tables only if the database's stored schema version is older
+    than SCHEMA_VERSION. Each path is checked once per process; returns True
+    if the schema was created or upgraded. A database written by a newer
+    version of the app raises RuntimeError instead of being downgraded.
+    """
+    key = os.path.abspath(db_path)
+    if key in _checked_paths:
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+    finally:
+        conn.close()
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"{db_path} has schema version {version}, but this version of the app "
+                           f"only knows up to {SCHEMA_VERSION}; please upgrade it")
+    if version < SCHEMA_VERSION:
+        create_tables(db_path)
+    _checked_paths.add(key)
+    return version < SCHEMA_VERSION
+
+HABIT_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        habit_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        template_id INTEGER NOT NULL,
+        periodicity TEXT CHECK(periodicity IN ('daily', 'weekly')) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        next_due TIMESTAMP,
+        FOREIGN KEY (user_id)     REFERENCES user_info(user_id) ON DELETE CASCADE,
+        FOREIGN KEY (template_id) REFERENCES habit_template(template_id)
+    )
+'''
+
+# Finds the template of a (name, description) pair; descriptions are optional
+TEMPLATE_MATCH = ("habit_template.name = {name} "
+                  "AND IFNULL(habit_template.description, '') = IFNULL({description}, '')")
+
+def create_habit_template_table(cursor):
+    """Create habit_template, the dictionary of distinct habit names and descriptions."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habit_template (
+            template_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_habit_template_text
+        ON habit_template(name, IFNULL(description, ''))
+    ''')
+
+def intern_habit_template(cursor, name, description):
+    """Return the template_id of `name` and `description`, adding the template if it is new."""
+    cursor.execute('INSERT OR IGNORE INTO habit_template (name, description) VALUES (?, ?)', (name, description))
+    cursor.execute(f"SELECT template_id FROM habit_template WHERE {TEMPLATE_MATCH.format(name='?', description='?')}",
+                   (name, description))
+    return cursor.fetchone()[0]
+
+def move_habit_text_to_templates(conn):
+    """
+    Rebuild a habit table that still has name and description columns (schema
+    version 4 and older) so each habit only keeps its template_id.
+    """
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA table_info(habit)')
+    columns = [row[1] for row in cursor.fetchall()]
+    if 'name' not in columns:
+        return
+
+    # Dropping the old table must not cascade to completions (the pragma only
+    # takes effect outside a transaction), and triggers on other tables that
+    # name habit must not be checked while it is briefly missing
+    conn.commit()
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute('PRAGMA legacy_alter_table = ON')
+    try:
+        create_habit_template_table(cursor)
+        cursor.execute('''
+            INSERT OR IGNORE INTO habit_template (name, description)
+            SELECT name, description FROM habit ORDER BY habit_id
+        ''')
+        cursor.execute(HABIT_TABLE.format(table='habit_v5'))
+        next_due = 'h.next_due' if 'next_due' in columns else 'NULL'
+        cursor.execute(f'''
+            INSERT INTO habit_v5 (habit_id, user_id, template_id, periodicity, created_at, next_due)
+            SELECT h.habit_id, h.user_id, habit_template.template_id, h.periodicity, h.created_at, {next_due}
+            FROM habit h
+            JOIN habit_template ON {TEMPLATE_MATCH.format(name='h.name', description='h.description')}
+        ''')
+        # Keep AUTOINCREMENT from handing out the ids of deleted habits again
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'habit'")
+        row = cursor.fetchone()
+        cursor.execute('DROP TABLE habit')
+        cursor.execute('ALTER TABLE habit_v5 RENAME TO habit')
+        if row:
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'habit'", (row[0],))
+        conn.commit()
+    finally:
+        conn.execute('PRAGMA legacy_alter_table = OFF')
+        conn.execute('PRAGMA foreign_keys = ON')
+
+def create_habit_templates(cursor):
+    """
+    Create habit_template, the dictionary of distinct habit names and descriptions
+    every habit points at by template_id, and habit_detail, a view of habits
+    with their name and description that can be inserted into, updated and
+    deleted from like a table. A template is deleted with its last habit.
+    """
+    create_habit_template_table(cursor)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_habit_template ON habit(template_id)')
+
+    cursor.execute('''
+        CREATE VIEW IF NOT EXISTS habit_detail AS
+        SELECT h.habit_id, h.user_id, h.template_id, t.name, t.description,
+               h.periodicity, h.created_at, h.next_due
+        FROM habit h
+        JOIN habit_template t ON t.template_id = h.template_id
+    ''')
+    template_id = f"(SELECT template_id FROM habit_template WHERE {TEMPLATE_MATCH.format(name='new.name', description='new.description')})"
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS habit_detail_insert INSTEAD OF INSERT ON habit_detail BEGIN
+            INSERT OR IGNORE INTO habit_template (name, description) VALUES (new.name, new.description);
+            INSERT INTO habit (habit_id, user_id, template_id, periodicity, created_at, next_due)
+            VALUES (new.habit_id, new.user_id, {template_id}, new.periodicity,
+                    COALESCE(new.created_at, CURRENT_TIMESTAMP), new.next_due);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS habit_detail_update INSTEAD OF UPDATE ON habit_detail BEGIN
+            INSERT OR IGNORE INTO habit_template (name, description) VALUES (new.name, new.description);
+            UPDATE habit SET user_id = new.user_id, template_id = {template_id}, periodicity = new.periodicity,
+                             created_at = new.created_at, next_due = new.next_due
+            WHERE habit_id = old.habit_id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS habit_detail_delete INSTEAD OF DELETE ON habit_detail BEGIN
+            DELETE FROM habit WHERE habit_id = old.habit_id;
+        END
+    ''')
+
+    # Templates no habit uses any more are removed (and so drop out of habit_fts)
+    release = '''
+            DELETE FROM habit_template
+            WHERE template_id = old.template_id
+              AND NOT EXISTS (SELECT 1 FROM habit WHERE template_id = old.template_id);
+    '''
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS habit_template_release_delete AFTER DELETE ON habit BEGIN
+            {release}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS habit_template_release_update AFTER UPDATE OF template_id ON habit
+        WHEN new.template_id IS NOT old.template_id BEGIN
+            {release}
+        END
+    ''')
+    cursor.execute('''
+        DELETE FROM habit_template
+        WHERE NOT EXISTS (SELECT 1 FROM habit WHERE habit.template_id = habit_template.template_id)
+    ''')
+
+def create_habit_search_index(cursor):
+    """
+    Create the FTS5 index over habit template names and descriptions and the
+    triggers that keep it in sync with the habit_template table.
+    """
+    # Earlier versions indexed every habit row; the index now covers templates only
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'habit_fts'")
+    row = cursor.fetchone()
+    if row and "content='habit'" in row[0]:
+        for trigger in ('habit_fts_insert', 'habit_fts_delete', 'habit_fts_update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        cursor.execute('DROP TABLE IF EXISTS habit_fts_vocab')
+        cursor.execute('DROP TABLE habit_fts')
+        row = None
+    exists = row is not None
+
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS habit_fts USING fts5(
+            name,
+            description,
+            content='habit_template',
+            content_rowid='template_id'
+        )
+    ''')
+
+    # Vocabulary view used to correct misspelled search terms
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS habit_fts_vocab USING fts5vocab(habit_fts, 'row')
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS habit_template_fts_insert AFTER INSERT ON habit_template BEGIN
+            INSERT INTO habit_fts (rowid, name, description)
+            VALUES (new.template_id, new.name, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS habit_template_fts_delete AFTER DELETE ON habit_template BEGIN
+            INSERT INTO habit_fts (habit_fts, rowid, name, description)
+            VALUES ('delete', old.template_id, old.name, old.description);
+        END
+    ''')
+
+    # Index templates that existed before the search table was added
+    if not exists:
+        cursor.execute("INSERT INTO habit_fts (habit_fts) VALUES ('rebuild')")
+
+def create_completion_history(cursor):
+    """
+    Create the completion_history table (one row per logged completion) and the
+    triggers that record every new completion written to the completion table.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'completion_history'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS completion_history (
+            history_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            habit_id INTEGER NOT NULL,
+            completed_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (user_id)   REFERENCES user_info(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (habit_id)  REFERENCES habit(habit_id)   ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_completion_history_habit
+        ON completion_history(habit_id, completed_at)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_completion_history_completed_at
+        ON completion_history(completed_at)
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS completion_history_insert AFTER INSERT ON completion BEGIN
+            INSERT INTO completion_history (user_id, habit_id, completed_at)
+            VALUES (new.user_id, new.habit_id, COALESCE(new.last_completed, CURRENT_TIMESTAMP));
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS completion_history_update AFTER UPDATE OF count ON completion
+        WHEN new.count > old.count BEGIN
+            INSERT INTO completion_history (user_id, habit_id, completed_at)
+            VALUES (new.user_id, new.habit_id, COALESCE(new.last_completed, CURRENT_TIMESTAMP));
+        END
+    ''')
+
+    # Seed history from completions logged before it existed. Only the latest
+    # date of each habit is known, so it is recorded once.
+    if not exists:
+        cursor.execute('''
+            INSERT INTO completion_history (user_id, habit_id, completed_at)
+            SELECT user_id, habit_id, COALESCE(last_completed, CURRENT_TIMESTAMP)
+            FROM completion
+            WHERE count > 0
+            ORDER BY completion_id
+        ''')
+
+def create_rollup_tables(cursor):
+    """Create the tables that cache closed completion-rate buckets (see timeseries.py)."""
+    # Completed periods per habit per closed bucket
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS completion_rollup (
+            habit_id INTEGER NOT NULL,
+            granularity TEXT CHECK(granularity IN ('day', 'week', 'month')) NOT NULL,
+            bucket_start DATE NOT NULL,
+            completed INTEGER NOT NULL,
+            PRIMARY KEY (granularity, bucket_start, habit_id),
+            FOREIGN KEY (habit_id) REFERENCES habit(habit_id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_completion_rollup_habit
+        ON completion_rollup(habit_id, granularity, bucket_start)
+    ''')
+
+    # How far each granularity has been rolled up
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            granularity TEXT PRIMARY KEY,
+            last_history_id INTEGER NOT NULL DEFAULT 0,
+            closed_through DATE
+        )
+    ''')
+
+def add_column_if_missing(cursor, table, column, declaration):
+    """Add `column` to an existing `table` created by an older version of this script."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+def create_habit_schedule(cursor):
+    """
+    Maintain habit.next_due, the deadline by which each habit must be completed
+    again before its streak breaks (see scheduler.py).
+    """
+    add_column_if_missing(cursor, 'habit', 'next_due', 'TIMESTAMP')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_habit_next_due ON habit(periodicity, next_due)')
+
+    # A new habit must be completed before the end of the period it was created in
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS habit_schedule_insert AFTER INSERT ON habit
+        WHEN new.next_due IS NULL BEGIN
+            UPDATE habit SET next_due = CASE new.periodicity
+                WHEN 'weekly' THEN datetime(date(new.created_at, 'weekday 0', '-6 days'), '+7 days')
+                ELSE datetime(date(new.created_at), '+1 day')
+            END
+            WHERE habit_id = new.habit_id;
+        END
+    ''')
+
+    # A completion moves the deadline to the end of the following period
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS habit_schedule_completion AFTER INSERT ON completion_history BEGIN
+            UPDATE habit SET next_due = MAX(COALESCE(next_due, ''), CASE periodicity
+                WHEN 'weekly' THEN datetime(date(new.completed_at, 'weekday 0', '-6 days'), '+14 days')
+                ELSE datetime(date(new.completed_at), '+2 days')
+            END)
+            WHERE habit_id = new.habit_id;
+        END
+    ''')
+
+    # Schedule habits created before next_due existed
+    cursor.execute('''
+        UPDATE habit SET next_due = (
+            SELECT CASE habit.periodicity
+                WHEN 'weekly' THEN datetime(date(t, 'weekday 0', '-6 days'), '+' || (7 * n) || ' days')
+                ELSE datetime(date(t), '+' || n || ' days')
+            END
+            FROM (
+                SELECT COALESCE(MAX(c.last_completed), habit.created_at) AS t,
+                       CASE WHEN MAX(c.last_completed) IS NULL THEN 1 ELSE 2 END AS n
+                FROM completion c
+                WHERE c.habit_id = habit.habit_id
+            )
+        )
+        WHERE next_due IS NULL
+    ''')
+
+def _bitset_statements(habit_id, completed_at):
+    """
+    SQL that sets the bit for the period containing `completed_at` in the habit's
+    completion_bitset, creating or extending the BLOB as needed. The arguments
+    are SQL expressions, e.g. new.habit_id in a trigger or :habit_id in a query.
+    """
+    period_start = f"CASE unit WHEN 7 THEN date({completed_at}, 'weekday 0', '-6 days') ELSE date({completed_at}) END"
+    index = f"(CAST(julianday({period_start}) - julianday(origin) AS INTEGER) / unit)"
+    byte, mask = f"({index} / 8)", f"(1 << ({index} % 8))"
+    return [
+        # Bit 0 is the period of the first completion
+        f'''
+            INSERT OR IGNORE INTO completion_bitset (habit_id, unit, origin, bits)
+            SELECT habit_id,
+                   CASE periodicity WHEN 'weekly' THEN 7 ELSE 1 END,
+                   CASE periodicity WHEN 'weekly' THEN date({completed_at}, 'weekday 0', '-6 days')
+                        ELSE date({completed_at}) END,
+                   x''
+            FROM habit WHERE habit_id = {habit_id}
+        ''',
+        # A completion dated before the origin prepends whole zero bytes
+        f'''
+            UPDATE completion_bitset
+            SET bits = CAST(zeroblob((7 - {index}) / 8) || bits AS BLOB),
+                origin = date(origin, '-' || ((7 - {index}) / 8 * 8 * unit) || ' days')
+            WHERE habit_id = {habit_id} AND {index} < 0
+        ''',
+        f'''
+            UPDATE completion_bitset
+            SET bits = CAST(CASE WHEN length(bits) <= {byte}
+                THEN bits || zeroblob({byte} - length(bits)) || (SELECT byte FROM bitset_byte WHERE value = {mask})
+                ELSE substr(bits, 1, {byte})
+                     || (SELECT byte FROM bitset_byte
+                         WHERE value = {mask} | (SELECT value FROM bitset_byte WHERE byte = substr(bits, {byte} + 1, 1)))
+                     || substr(bits, {byte} + 2)
+            END AS BLOB)
+            WHERE habit_id = {habit_id}
+        ''',
+    ]
+
+def create_completion_bitsets(cursor):
+    """
+    Create completion_bitset, a per-habit BLOB with one bit per day (daily habits)
+    or week (weekly habits) that is set when the habit was completed in that
+    period, and the trigger that updates it in place (see bitsets.py).
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'completion_bitset'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS completion_bitset (
+            habit_id INTEGER PRIMARY KEY,
+            unit INTEGER NOT NULL,
+            origin DATE NOT NULL,
+            bits BLOB NOT NULL,
+            FOREIGN KEY (habit_id) REFERENCES habit(habit_id) ON DELETE CASCADE
+        )
+    ''')
+
+    # SQL has no byte <-> integer conversion for BLOBs, so look bytes up instead
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bitset_byte (
+            value INTEGER PRIMARY KEY,
+            byte BLOB NOT NULL UNIQUE
+        )
+    ''')
+    cursor.executemany('INSERT OR IGNORE INTO bitset_byte (value, byte) VALUES (?, ?)',
+                       [(value, bytes([value])) for value in range(256)])
+
+    body = ';\n'.join(_bitset_statements('new.habit_id', 'new.completed_at'))
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS completion_bitset_history AFTER INSERT ON completion_history BEGIN
+            {body};
+        END
+    ''')
+
+    # Replay history logged before the bitsets existed
+    if not exists:
+        cursor.execute('SELECT habit_id, completed_at FROM completion_history ORDER BY history_id')
+        for habit_id, completed_at in cursor.fetchall():
+            for statement in _bitset_statements(':habit_id', ':completed_at'):
+                cursor.execute(statement, {'habit_id': habit_id, 'completed_at': completed_at})
+
+def create_retention_tables(cursor):
+    """Create completion_monthly, which holds completion history compacted by retention.py."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS completion_monthly (
+            habit_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            month DATE NOT NULL,
+            completions INTEGER NOT NULL,
+            first_completed TIMESTAMP NOT NULL,
+            last_completed TIMESTAMP NOT NULL,
+            PRIMARY KEY (habit_id, month),
+            FOREIGN KEY (user_id)   REFERENCES user_info(user_id) ON DELETE CASCADE,
+            FOREIGN KEY (habit_id)  REFERENCES habit(habit_id)   ON DELETE CASCADE
+        )
+    ''')
+
+def create_related_habits(cursor):
+    """Create habit_related, the top related templates per habit template (see cooccurrence.py)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS habit_related (
+            template_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            related_id INTEGER NOT NULL,
+            together INTEGER NOT NULL,
+            correlation REAL NOT NULL,
+            PRIMARY KEY (template_id, rank),
+            FOREIGN KEY (template_id) REFERENCES habit_template(template_id) ON DELETE CASCADE,
+            FOREIGN KEY (related_id)  REFERENCES habit_template(template_id) ON DELETE CASCADE
+        )
+    ''')
+
+def create_journal_state(cursor):
+    """
+    Create journal_state, the next journal sequence number to apply per completion
+    journal (see journal.py). It is updated in the same transaction as the
+    completions it covers, so replay after a crash applies each record once.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS journal_state (
+            journal TEXT PRIMARY KEY,
+            applied_seq INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+COUNTED_TABLES = ('user_info', 'habit', 'completion')
+
+def create_change_counters(cursor):
+    """
+    Keep a per-table version number that is bumped by every insert, update and
+    delete, so cached query results can tell which tables changed (see cache.py).
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_version (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    for table in COUNTED_TABLES:
+        cursor.execute('INSERT OR IGNORE INTO table_version (table_name) VALUES (?)', (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                    UPDATE table_version SET version = version + 1 WHERE table_name = '{table}';
+                END
+            ''')
+
+# Columns recorded in change_log for each table. Passwords are never copied, and
+# columns maintained by triggers (habit.next_due) are left out so their
+# bookkeeping updates don't show up as changes.
+CHANGE_LOG_COLUMNS = {
+    'user_info': ('user_id', 'username', 'email', 'created_at'),
+    'habit': ('habit_id', 'user_id', 'template_id', 'periodicity', 'created_at'),
+    'completion': ('completion_id', 'user_id', 'habit_id', 'last_completed', 'count'),
+}
+
+def create_change_log(cursor):
+    """
+    Create change_log, an append-only feed of every insert, update and delete on
+    user_info, habit and completion, and change_consumer, the position each
+    downstream consumer has read up to (see changefeed.py).
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            operation TEXT CHECK(operation IN ('insert', 'update', 'delete')) NOT NULL,
+            row_id INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_consumer (
+            name TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+    for table, columns in CHANGE_LOG_COLUMNS.items():
+        for event, row, guard in (
+            ('INSERT', 'new', ''),
+            ('UPDATE', 'new', 'WHEN ' + ' OR '.join(f'old.{c} IS NOT new.{c}' for c in columns)),
+            ('DELETE', 'old', ''),
+        ):
+            data = ', '.join(f"'{c}', {row}.{c}" for c in columns)
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_{event.lower()} AFTER {event} ON {table} {guard} BEGIN
+                    INSERT INTO change_log (table_name, operation, row_id, data)
+                    VALUES ('{table}', '{event.lower()}', {row}.{columns[0]}, json_object({data}));
+                END
+            ''')
+
+# (name, description, periodicity); also the starter habits given to provisioned accounts
+PREDEFINED_HABITS = (
+    ('Drink Water',      'Drink at least 8 glasses of water', 'daily'),
+    ('Morning Jog',      'Go for a 30-minute jog every morning', 'daily'),
+    ('Read a Book',      'Read at least 50 pages of a book',  'weekly'),
+    ('Clean House',      'Deep clean the house',              'weekly'),
+    ('Plan Weekly Goals','Plan goals every Sunday evening',   'weekly'),
+)
+
+def insert_predefined_habits(db_path=DB_PATH):
     """Insert 5 predefined habits into the habit table for a default user."""
-    conn = create_connection()
+    conn = create_connection(db_path)
     cursor = conn.cursor()
 
     # 1) ensure default user
@@ -67,19 +643,11 @@ def insert_predefined_habits():
     user_id = cursor.fetchone()[0]
 
     # 3) your five habits
-    habits = [
-        ('Drink Water',      'Drink at least 8 glasses of water', 'daily'),
-        ('Morning Jog',      'Go for a 30-minute jog every morning', 'daily'),
-        ('Read a Book',      'Read at least 50 pages of a book',  'weekly'),
-        ('Clean House',      'Deep clean the house',              'weekly'),
-        ('Plan Weekly Goals','Plan goals every Sunday evening',   'weekly'),
-    ]
-
-    for name, desc, period in habits:
+    for name, desc, period in PREDEFINED_HABITS:
         cursor.execute('''
-            INSERT OR IGNORE INTO habit (user_id, name, description, periodicity)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, name, desc, period))
+            INSERT INTO habit (user_id, template_id, periodicity)
+            VALUES (?, ?, ?)
+        ''', (user_id, intern_habit_template(cursor, name, desc), period))
 
     conn.commit()
     conn.close()
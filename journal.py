@@ -0,0 +1,296 @@
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+from db import DB_PATH, create_connection as get_connection, ensure_schema
+
+# ---------------------------
+# Completion journal
+# ---------------------------
+#
+# An optional write path for log_completion. Instead of a SQLite transaction,
+# the caller appends a 32-byte record to a preallocated, memory-mapped ring
+# buffer and returns; an ingester thread or process replays the records into
+# the completion table in large batches.
+#
+# File layout (little-endian):
+#   header, 64 bytes: magic, version, record size, capacity (records),
+#                     write_seq (next sequence number to write),
+#                     ack_seq (first sequence number not yet applied)
+#   records:          user_id, habit_id, completion time (µs since the epoch),
+#                     CRC32 of those fields and the sequence number
+# Record `seq` lives in slot seq % capacity. The writer fills the slot before
+# publishing the new write_seq, and never reuses a slot that is not yet
+# acknowledged (JournalFull instead).
+#
+# Replay is exactly-once: the next sequence number to apply is stored in
+# journal_state in the same SQLite transaction as the completions it covers.
+# ack_seq in the header only tells the writer which slots it may reuse.
+#
+# One process writes to a journal (threads are serialised by a lock). Records
+# survive the process crashing; call flush() to also survive the OS crashing.
+#
+# If the ingester stops on an error other than a busy database, the error is
+# kept on the journal: append() and Ingester.stop() raise IngestError from then
+# on, so callers find out instead of filling the journal that nothing drains.
+# The records stay in the journal and are replayed once the cause is fixed.
+
+MAGIC = b'HTJ1'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIQQ')
+HEADER_SIZE = 64
+WRITE_SEQ_OFFSET = 12
+ACK_SEQ_OFFSET = 20
+RECORD = struct.Struct('<qqqI4x')
+FIELDS = struct.Struct('<qqqQ')   # what the CRC covers: the record fields plus its sequence number
+SEQ = struct.Struct('<Q')
+
+
+class JournalFull(Exception):
+    """Raised when every slot holds a record the ingester has not applied yet."""
+
+
+class IngestError(Exception):
+    """Raised once the ingester has stopped on an error; its records are kept in the journal."""
+
+
+class JournalRecord(NamedTuple):
+    seq: int
+    user_id: int
+    habit_id: int
+    completed_at: datetime
+
+
+class IngestResult(NamedTuple):
+    applied: int
+    rejected: int       # records for habits that don't exist (or belong to someone else)
+    next_seq: int
+
+
+class Journal:
+    """
+    A memory-mapped ring buffer of completion records.
+
+    Attributes:
+        path (str): The journal file.
+        capacity (int): The number of record slots.
+        ingest_error (Exception): The error the ingester stopped on, if it did.
+    """
+
+    def __init__(self, path, capacity: int = 1 << 20):
+        self.path = os.path.abspath(path)
+        if not os.path.exists(self.path):
+            with open(self.path, 'wb') as f:
+                f.truncate(HEADER_SIZE + capacity * RECORD.size)
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, 0, 0))
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, record_size, self.capacity, _write, _ack = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{self.path} is not a completion journal")
+        self._lock = threading.Lock()
+        self.ingest_error: Optional[BaseException] = None
+
+    @property
+    def write_seq(self) -> int:
+        return SEQ.unpack_from(self._map, WRITE_SEQ_OFFSET)[0]
+
+    @property
+    def ack_seq(self) -> int:
+        return SEQ.unpack_from(self._map, ACK_SEQ_OFFSET)[0]
+
+    @property
+    def pending(self) -> int:
+        return self.write_seq - self.ack_seq
+
+    def append(self, user_id: int, habit_id: int, when: Optional[float] = None) -> int:
+        """Journal one completion (`when` in seconds since the epoch, default now); returns its sequence number."""
+        if self.ingest_error is not None:
+            raise IngestError(f"the journal is not being ingested: {self.ingest_error}") from self.ingest_error
+        micros = time.time_ns() // 1000 if when is None else int(when * 1_000_000)
+        with self._lock:
+            seq = SEQ.unpack_from(self._map, WRITE_SEQ_OFFSET)[0]
+            if seq - SEQ.unpack_from(self._map, ACK_SEQ_OFFSET)[0] >= self.capacity:
+                raise JournalFull(f"{self.capacity} completions are waiting to be ingested")
+            crc = zlib.crc32(FIELDS.pack(user_id, habit_id, micros, seq))
+            RECORD.pack_into(self._map, HEADER_SIZE + (seq % self.capacity) * RECORD.size,
+                             user_id, habit_id, micros, crc)
+            SEQ.pack_into(self._map, WRITE_SEQ_OFFSET, seq + 1)
+        return seq
+
+    def read(self, start: int, limit: int) -> List[JournalRecord]:
+        """Up to `limit` records from sequence number `start`, stopping at the first incomplete one."""
+        end = min(self.write_seq, start + limit)
+        records = []
+        for seq in range(start, end):
+            user_id, habit_id, micros, crc = RECORD.unpack_from(
+                self._map, HEADER_SIZE + (seq % self.capacity) * RECORD.size)
+            if zlib.crc32(FIELDS.pack(user_id, habit_id, micros, seq)) != crc:
+                break
+            records.append(JournalRecord(seq, user_id, habit_id, datetime.fromtimestamp(micros / 1_000_000)))
+        return records
+
+    def acknowledge(self, seq: int) -> None:
+        """Free the slots of every record before `seq` for reuse."""
+        if seq > self.ack_seq:
+            SEQ.pack_into(self._map, ACK_SEQ_OFFSET, seq)
+
+    def flush(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# ---------------------------
+# Ingestion
+# ---------------------------
+
+def ingest_batch(conn, journal: Journal, batch_size: int = 10_000) -> IngestResult:
+    """Apply up to `batch_size` journaled completions in one transaction."""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("SELECT applied_seq FROM journal_state WHERE journal = ?", (journal.path,))
+        row = cursor.fetchone()
+        start = row[0] if row else journal.ack_seq
+        records = journal.read(start, batch_size)
+        if not records:
+            conn.rollback()
+            journal.acknowledge(start)
+            return IngestResult(0, 0, start)
+
+        cursor.execute("""
+            SELECT habit_id, user_id FROM habit
+            WHERE habit_id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(sorted({record.habit_id for record in records})),))
+        owners = dict(cursor.fetchall())
+
+        applied = rejected = 0
+        for record in records:
+            if owners.get(record.habit_id) != record.user_id:
+                rejected += 1
+                continue
+            # Same effect as main.record_completion, one completion at a time so history keeps every event
+            cursor.execute("UPDATE completion SET count = count + 1, last_completed = ? WHERE habit_id = ? AND user_id = ?",
+                           (record.completed_at, record.habit_id, record.user_id))
+            if cursor.rowcount == 0:
+                cursor.execute(
+                    "INSERT INTO completion (user_id, habit_id, count, last_completed) VALUES (?, ?, 1, ?)",
+                    (record.user_id, record.habit_id, record.completed_at)
+                )
+            applied += 1
+
+        next_seq = records[-1].seq + 1
+        cursor.execute("""
+            INSERT INTO journal_state (journal, applied_seq) VALUES (?, ?)
+            ON CONFLICT (journal) DO UPDATE SET applied_seq = excluded.applied_seq
+        """, (journal.path, next_seq))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    journal.acknowledge(next_seq)
+    return IngestResult(applied, rejected, next_seq)
+
+
+class Ingester:
+    """
+    A background thread that keeps replaying a journal into the database.
+
+    Attributes:
+        journal (Journal): The journal being replayed.
+        db_path (str): The database the completions are written to.
+        applied (int): Completions applied so far.
+        rejected (int): Records skipped because the habit doesn't exist.
+    """
+
+    def __init__(self, journal: Journal, db_path=DB_PATH, batch_size: int = 10_000, interval: float = 0.05):
+        self.journal = journal
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.applied = 0
+        self.rejected = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='journal-ingester', daemon=True)
+
+    def _run(self) -> None:
+        conn = get_connection(self.db_path)
+        conn.execute("PRAGMA busy_timeout = 5000")
+        try:
+            while True:
+                try:
+                    result = ingest_batch(conn, self.journal, self.batch_size)
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    # Another writer held the lock past busy_timeout; nothing was applied, try again
+                    self._stop.wait(self.interval)
+                    continue
+                self.applied += result.applied
+                self.rejected += result.rejected
+                if result.applied + result.rejected == 0:
+                    # Drain everything before honouring a stop request
+                    if self._stop.is_set():
+                        return
+                    self._stop.wait(self.interval)
+        except Exception as e:
+            # Nothing from the failed batch was applied; surface the error to writers
+            self.journal.ingest_error = e
+        finally:
+            conn.close()
+
+    def start(self) -> 'Ingester':
+        self._thread.start()
+        return self
+
+    @property
+    def error(self) -> Optional[BaseException]:
+        return self.journal.ingest_error
+
+    def stop(self) -> None:
+        """Apply what is left in the journal, then stop. Raises IngestError if ingestion failed."""
+        self._stop.set()
+        self._thread.join()
+        if self.error is not None:
+            raise IngestError(f"ingestion stopped with {self.journal.pending} completions pending: "
+                              f"{self.error}") from self.error
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a completion journal into the database.")
+    parser.add_argument('--journal', default='completions.journal', help="journal file")
+    parser.add_argument('--batch-size', type=int, default=10_000, help="completions per transaction")
+    parser.add_argument('--interval', type=float, default=0.05, help="seconds to wait when the journal is empty")
+    args = parser.parse_args()
+
+    ensure_schema(DB_PATH)
+    with Journal(args.journal) as journal:
+        ingester = Ingester(journal, DB_PATH, args.batch_size, args.interval).start()
+        print(f"📥 Ingesting {journal.path} (Ctrl+C to stop)...")
+        try:
+            while ingester.error is None:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        try:
+            ingester.stop()
+        except IngestError as e:
+            print(f"❌ {e}")
+        print(f"✅ Applied {ingester.applied} completions, rejected {ingester.rejected}.")
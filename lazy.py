@@ -0,0 +1,25 @@
+import importlib.util
+import sys
+
+# ---------------------------
+# Deferred imports
+# ---------------------------
+#
+# questionary pulls in prompt_toolkit, which is most of the app's startup time.
+# lazy_import returns the module object straight away but only executes it on
+# first attribute access, i.e. when a prompt is actually shown.
+
+
+def lazy_import(name: str):
+    """Return module `name`, loading it on first attribute access."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,288 @@
+import argparse
+import math
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import db
+from main import insert_account, insert_habit, record_completion, remove_habit
+
+# ---------------------------
+# Concurrent load harness
+# ---------------------------
+#
+# Virtual users are spread over worker processes and, inside each process,
+# over threads with their own connections. Every virtual user creates its
+# account, then runs a random mix of operations through the non-interactive
+# cores of main.py (insert_account, insert_habit, record_completion and
+# remove_habit):
+#   - create_account retries the user's own name and must be rejected,
+#   - add_habit / delete_habit change the user's own habits,
+#   - log_completion logs either one of the user's habits or, with
+#     probability `shared_ratio`, a habit shared by all workers, so the
+#     completion upsert is contended across threads and processes.
+# Each worker tracks the counts it expects; afterwards every user's habits and
+# counts, and the shared habits' totals, are checked against the database.
+
+OPERATIONS = ('create_account', 'add_habit', 'log_completion', 'delete_habit')
+DEFAULT_MIX = {'create_account': 0.02, 'add_habit': 0.15, 'log_completion': 0.78, 'delete_habit': 0.05}
+
+# Returned in place of a result when an operation gave up on a lock
+LOCKED = object()
+
+
+class LoadReport(NamedTuple):
+    operations: int
+    seconds: float
+    latencies: Dict[str, List[float]]     # operation -> sorted latencies in seconds
+    lock_errors: int
+    failures: List[str]                   # wrong results and final-state mismatches
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.operations / self.seconds if self.seconds else 0.0
+
+    @property
+    def lock_error_rate(self) -> float:
+        return self.lock_errors / self.operations if self.operations else 0.0
+
+    def summary(self) -> str:
+        lines = [f"⚡ {self.operations} operations in {self.seconds:.2f}s ({self.ops_per_second:.0f} ops/s), "
+                 f"lock errors: {self.lock_errors} ({self.lock_error_rate:.2%})"]
+        for operation, latencies in self.latencies.items():
+            if latencies:
+                lines.append(f"   {operation:<15} n={len(latencies):<7} "
+                             f"p50={percentile(latencies, 50) * 1000:.2f}ms "
+                             f"p95={percentile(latencies, 95) * 1000:.2f}ms "
+                             f"p99={percentile(latencies, 99) * 1000:.2f}ms "
+                             f"max={latencies[-1] * 1000:.2f}ms")
+        lines.append("✅ All counts verified." if not self.failures
+                     else f"❌ {len(self.failures)} failures, e.g. {self.failures[0]}")
+        return "\n".join(lines)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+def _is_lock_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return 'locked' in message or 'busy' in message
+
+
+def _connect(db_path, busy_timeout_ms):
+    conn = db.create_connection(db_path)
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    return conn
+
+
+def _run_thread(db_path, run_id, user_indexes, shared, options, seed, result, lock):
+    """Drive `user_indexes` virtual users on one connection; merges its findings into `result`."""
+    rng = random.Random(seed)
+    conn = _connect(db_path, options['busy_timeout_ms'])
+    operations = list(options['mix'])
+    weights = [options['mix'][operation] for operation in operations]
+    latencies = {operation: [] for operation in OPERATIONS}
+    lock_errors = 0
+    failures = []
+    expected = {}
+    shared_logged = {hid: 0 for hid in shared['habit_ids']}
+
+    def timed(operation, func, *args):
+        nonlocal lock_errors
+        started = time.perf_counter()
+        try:
+            value = func(conn, *args)
+        except sqlite3.OperationalError as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if not _is_lock_error(e):
+                raise
+            lock_errors += 1
+            return LOCKED
+        finally:
+            latencies[operation].append(time.perf_counter() - started)
+        return value
+
+    users = []
+    for index in user_indexes:
+        username = f"load_{run_id}_{index}"
+        user_id = timed('create_account', insert_account, username, 'pw')
+        if user_id is not LOCKED:
+            users.append({'user_id': user_id, 'username': username, 'habits': {}, 'next_habit': 0})
+            expected[user_id] = {}
+
+    for _step in range(options['ops_per_user']):
+        for user in users:
+            operation = rng.choices(operations, weights)[0]
+            if operation in ('log_completion', 'delete_habit') and not user['habits']:
+                operation = 'add_habit'
+            habits = user['habits']
+
+            if operation == 'create_account':
+                try:
+                    timed('create_account', insert_account, user['username'], 'pw')
+                    failures.append(f"duplicate username {user['username']} was accepted")
+                except sqlite3.IntegrityError:
+                    conn.rollback()
+
+            elif operation == 'add_habit':
+                user['next_habit'] += 1
+                name = f"Habit {user['next_habit']}"
+                hid = timed('add_habit', insert_habit, user['user_id'], name, None, rng.choice(['daily', 'weekly']))
+                if hid is None:
+                    failures.append(f"{name} for {user['username']} reported as duplicate")
+                elif hid is not LOCKED:
+                    habits[hid] = 0
+
+            elif operation == 'log_completion':
+                if shared['habit_ids'] and rng.random() < options['shared_ratio']:
+                    hid = rng.choice(shared['habit_ids'])
+                    if timed('log_completion', record_completion, shared['user_id'], hid, datetime.now()) is not LOCKED:
+                        shared_logged[hid] += 1
+                else:
+                    hid = rng.choice(list(habits))
+                    count = timed('log_completion', record_completion, user['user_id'], hid, datetime.now())
+                    if count is not LOCKED:
+                        habits[hid] += 1
+                        if count != habits[hid]:
+                            failures.append(f"habit {hid} returned count {count}, expected {habits[hid]}")
+
+            else:
+                hid = rng.choice(list(habits))
+                if timed('delete_habit', remove_habit, user['user_id'], hid) is not LOCKED:
+                    del habits[hid]
+
+    for user in users:
+        expected[user['user_id']] = dict(user['habits'])
+    conn.close()
+
+    with lock:
+        for operation, values in latencies.items():
+            result['latencies'][operation].extend(values)
+        result['lock_errors'] += lock_errors
+        result['failures'].extend(failures)
+        result['expected'].update(expected)
+        for hid, logged in shared_logged.items():
+            result['shared_logged'][hid] = result['shared_logged'].get(hid, 0) + logged
+
+
+def _empty_result():
+    return {'latencies': {operation: [] for operation in OPERATIONS}, 'lock_errors': 0,
+            'failures': [], 'expected': {}, 'shared_logged': {}}
+
+
+def _run_process(db_path, run_id, thread_slices, shared, options, seed):
+    """Run one worker process: a thread per slice of virtual users."""
+    result = _empty_result()
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=_run_thread,
+                         args=(db_path, run_id, indexes, shared, options, seed * 1000 + number, result, lock))
+        for number, indexes in enumerate(thread_slices)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return result
+
+
+def verify(conn, expected: Dict[int, Dict[int, int]], shared_expected: Dict[int, int]) -> List[str]:
+    """Compare every user's habits and completion counts with what the workers expect."""
+    failures = []
+    cursor = conn.cursor()
+    for user_id, habits in expected.items():
+        cursor.execute("""
+            SELECT h.habit_id, COALESCE(c.count, 0)
+            FROM habit h
+            LEFT JOIN completion c ON c.habit_id = h.habit_id
+            WHERE h.user_id = ?
+        """, (user_id,))
+        actual = dict(cursor.fetchall())
+        if actual != habits:
+            failures.append(f"user {user_id}: expected {habits}, found {actual}")
+    for hid, total in shared_expected.items():
+        cursor.execute("SELECT COALESCE(MAX(count), 0) FROM completion WHERE habit_id = ?", (hid,))
+        actual = cursor.fetchone()[0]
+        if actual != total:
+            failures.append(f"shared habit {hid}: expected {total} completions, found {actual}")
+    return failures
+
+
+def run_load(db_path, users: int = 20, processes: int = 1, threads: int = 4, ops_per_user: int = 50,
+             mix: Optional[Dict[str, float]] = None, shared_habits: int = 2, shared_ratio: float = 0.2,
+             seed: int = 0, busy_timeout_ms: int = 5000) -> LoadReport:
+    """Run the load against `db_path` (created if needed) and verify the final state."""
+    mix = dict(mix or DEFAULT_MIX)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"Unknown operations in mix: {sorted(unknown)}")
+
+    db.create_tables(db_path)
+    run_id = uuid.uuid4().hex[:8]
+    conn = _connect(db_path, busy_timeout_ms)
+    owner = insert_account(conn, f"load_{run_id}_shared", 'pw')
+    shared = {'user_id': owner,
+              'habit_ids': [insert_habit(conn, owner, f"Shared {i}", None, 'daily') for i in range(shared_habits)]}
+
+    options = {'mix': mix, 'ops_per_user': ops_per_user, 'shared_ratio': shared_ratio,
+               'busy_timeout_ms': busy_timeout_ms}
+    workers = processes * threads
+    slices = [list(range(worker, users, workers)) for worker in range(workers)]
+    per_process = [slices[p * threads:(p + 1) * threads] for p in range(processes)]
+
+    started = time.perf_counter()
+    if processes == 1:
+        results = [_run_process(db_path, run_id, per_process[0], shared, options, seed)]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(_run_process, db_path, run_id, thread_slices, shared, options, seed + p)
+                       for p, thread_slices in enumerate(per_process)]
+            results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    merged = _empty_result()
+    for result in results:
+        for operation, values in result['latencies'].items():
+            merged['latencies'][operation].extend(values)
+        merged['lock_errors'] += result['lock_errors']
+        merged['failures'].extend(result['failures'])
+        merged['expected'].update(result['expected'])
+        for hid, logged in result['shared_logged'].items():
+            merged['shared_logged'][hid] = merged['shared_logged'].get(hid, 0) + logged
+
+    failures = merged['failures'] + verify(conn, merged['expected'], merged['shared_logged'])
+    conn.close()
+
+    latencies = {operation: sorted(values) for operation, values in merged['latencies'].items()}
+    return LoadReport(sum(len(values) for values in latencies.values()), elapsed, latencies,
+                      merged['lock_errors'], failures)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent load test for the habit write paths.")
+    parser.add_argument('--db', default='loadtest.db', help="database file to load (created if missing)")
+    parser.add_argument('--users', type=int, default=100, help="number of virtual users")
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4, help="threads per process")
+    parser.add_argument('--ops', type=int, default=100, help="operations per virtual user")
+    parser.add_argument('--shared-ratio', type=float, default=0.2,
+                        help="share of completions logged against habits every worker updates")
+    parser.add_argument('--mix', help="operation weights, e.g. log_completion=0.8,add_habit=0.2")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mix = None
+    if args.mix:
+        mix = {name: float(weight) for name, weight in (item.split('=') for item in args.mix.split(','))}
+    report = run_load(args.db, users=args.users, processes=args.processes, threads=args.threads,
+                      ops_per_user=args.ops, mix=mix, shared_ratio=args.shared_ratio, seed=args.seed)
+    print(report.summary())
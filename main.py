@@ -1,22 +1,43 @@
 import sqlite3
-import questionary
-from db import create_connection as get_connection
+from lazy import lazy_import
+from db import create_connection as get_connection, ensure_schema, intern_habit_template
+from passwords import check_password
+
+# Loaded on first use, so scripted runs that never prompt don't pay for prompt_toolkit
+questionary = lazy_import('questionary')
+
+# user_id -> UserData of the user logged in at the menu; actions read from it when present
+_prefetched = {}
+
+# Completion journal (see journal.py) when main.py runs with --journal
+_journal = None
+
+def _invalidate(user_id):
+    """Reload the logged-in user's prefetched data after a write."""
+    data = _prefetched.get(user_id)
+    if data:
+        data.invalidate()
 
 # ---------------------------
 # Create a new account
 # ---------------------------
+def insert_account(conn, username, password, email=None):
+    """Non-interactive core of create_account; raises sqlite3.IntegrityError if the username is taken."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO user_info (username, password, email) VALUES (?, ?, ?)",
+        (username, password, email)
+    )
+    conn.commit()
+    return cursor.lastrowid
+
 def create_account():
     username = questionary.text("Choose your desired username:").ask()
     password = questionary.password("Enter your password:").ask()
 
     with get_connection() as conn:
-        cursor = conn.cursor()
         try:
-            cursor.execute(
-                "INSERT INTO user_info (username, password) VALUES (?, ?)",
-                (username, password)
-            )
-            conn.commit()
+            insert_account(conn, username, password)
         except sqlite3.IntegrityError:
             # Catches the UNIQUE constraint on username
             questionary.print(f"❌ The username '{username}' is already taken. Please choose another.")
@@ -28,57 +49,77 @@ def log_in():
     username = questionary.text("Username:").ask()
     password = questionary.password("Password:").ask()
     with get_connection() as conn:
-        c = conn.cursor()
-        c.execute("SELECT user_id FROM user_info WHERE username = ? AND password = ?",
-                  (username, password))
-        row = c.fetchone()
-    if row:
+        user_id = check_credentials(conn, username, password)
+    if user_id:
         questionary.print(f"👋 Welcome back, {username}!")
-        return row[0], username
+        return user_id, username
     else:
         questionary.print("❌ Invalid credentials.")
         return None, None
 
+def check_credentials(conn, username, password):
+    """Non-interactive core of log_in; returns the user_id, or None if the credentials don't match."""
+    c = conn.cursor()
+    c.execute("SELECT user_id, password FROM user_info WHERE username = ?", (username,))
+    row = c.fetchone()
+    if row is None or password is None:
+        return None
+    # Accounts created by provision.py store a password hash, older ones the password as typed
+    user_id, stored = row
+    return user_id if check_password(password, stored) else None
+
 # Habit-management actions (now take current_user_id as first arg)
+def insert_habit(conn, user_id, name, desc, period):
+    """Non-interactive core of add_habit; returns the new habit_id, or None if the user already has that habit."""
+    c = conn.cursor()
+    c.execute("SELECT 1 FROM habit_detail WHERE user_id = ? AND name = ?", (user_id, name))
+    if c.fetchone():
+        return None
+    c.execute(
+        "INSERT INTO habit (user_id, template_id, periodicity, created_at) VALUES (?, ?, ?, ?)",
+        (user_id, intern_habit_template(c, name, desc), period, datetime.now())
+    )
+    conn.commit()
+    return c.lastrowid
+
 def add_habit(user_id, _username):
     name = questionary.text("Enter the habit name:").ask()
     desc = questionary.text("Enter a description (optional):").ask()
     period = questionary.select("Frequency:", choices=["daily", "weekly"]).ask()
     with get_connection() as conn:
-        c = conn.cursor()
-        c.execute("SELECT 1 FROM habit WHERE user_id = ? AND name = ?", (user_id, name))
-        if c.fetchone():
+        if insert_habit(conn, user_id, name, desc, period) is None:
             return questionary.print("❌ You already have that habit.")
-        c.execute(
-            "INSERT INTO habit (user_id, name, description, periodicity, created_at) VALUES (?, ?, ?, ?, ?)",
-            (user_id, name, desc, period, datetime.now())
-        )
-        conn.commit()
+    _invalidate(user_id)
     questionary.print(f"✅ '{name}' added!")
 
 
+def _user_habits(user_id):
+    """(habit_id, name) of the user's habits, from the prefetched data when there is some."""
+    data = _prefetched.get(user_id)
+    if data:
+        return data.habits()
+    with get_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT habit_id, name FROM habit_detail WHERE user_id = ? ORDER BY habit_id", (user_id,))
+        return c.fetchall()
+
+
 def view_habits(user_id):
     try:
-        with get_connection() as conn:
-            c = conn.cursor()
-            c.execute("SELECT habit_id, name FROM habit WHERE user_id = ?", (user_id,))
-            habits = c.fetchall()
+        habits = _user_habits(user_id)
 
-            if not habits:
-                return questionary.print("❌ No habits found.")
+        if not habits:
+            return questionary.print("❌ No habits found.")
 
-            questionary.print("Your habits are:")
-            for habit in habits:
-                questionary.print(f"- {habit[1]} (ID: {habit[0]})")
+        questionary.print("Your habits are:")
+        for habit in habits:
+            questionary.print(f"- {habit[1]} (ID: {habit[0]})")
     except Exception as e:
         questionary.print(f"❌ Error: {str(e)}")
 
 
 def list_user_habits(user_id):
-    with get_connection() as conn:
-        c = conn.cursor()
-        c.execute("SELECT habit_id, name FROM habit WHERE user_id = ?", (user_id,))
-        rows = c.fetchall()
+    rows = _user_habits(user_id)
     if not rows:
         questionary.print("⚠️ [Debug] You have no habits in the DB.")
     else:
@@ -100,31 +141,53 @@ def log_completion(user_id, _username):
     # Debugging: Print the habit_id and user_id values before checking the habit in the database
     print(f"Checking habit_id={hid}, user_id={user_id}")
 
-    now = datetime.now()
-    with get_connection() as conn:
-        c = conn.cursor()
-        # Check if habit exists for the given user_id and habit_id
-        c.execute("SELECT 1 FROM habit WHERE habit_id = ? AND user_id = ?", (hid, user_id))
-        if not c.fetchone():
+    if _journal is not None:
+        if hid not in {habit_id for habit_id, _name in _user_habits(user_id)}:
             return questionary.print("❌ No such habit.")
+        from journal import IngestError, JournalFull
+        try:
+            _journal.append(user_id, hid)
+        except (IngestError, JournalFull) as e:
+            return questionary.print(f"❌ Completion not logged: {e}")
+        _invalidate(user_id)
+        return questionary.print("🔥 Logged! Your streak updates in a moment.")
 
-        # upsert into completion
-        c.execute("SELECT count FROM completion WHERE habit_id = ? AND user_id = ?", (hid, user_id))
-        row = c.fetchone()
-        if row:
-            nc = row[0] + 1
-            c.execute("UPDATE completion SET count = ?, last_completed = ? WHERE habit_id = ? AND user_id = ?",
-                      (nc, now, hid, user_id))
-        else:
-            nc = 1
-            c.execute(
-                "INSERT INTO completion (user_id, habit_id, count, last_completed) VALUES (?, ?, ?, ?)",
-                (user_id, hid, nc, now)
-            )
-        conn.commit()
+    with get_connection() as conn:
+        nc = record_completion(conn, user_id, hid, datetime.now())
+    if nc is None:
+        return questionary.print("❌ No such habit.")
+    _invalidate(user_id)
 
     questionary.print(f"🔥 Logged! New streak: {nc}")
 
+def record_completion(conn, user_id, hid, now):
+    """Non-interactive core of log_completion; returns the new count, or None if the habit doesn't exist."""
+    c = conn.cursor()
+    # Take the write lock before reading the count so concurrent logs can't lose updates
+    c.execute("BEGIN IMMEDIATE")
+
+    # Check if habit exists for the given user_id and habit_id
+    c.execute("SELECT 1 FROM habit WHERE habit_id = ? AND user_id = ?", (hid, user_id))
+    if not c.fetchone():
+        conn.rollback()
+        return None
+
+    # upsert into completion
+    c.execute("SELECT count FROM completion WHERE habit_id = ? AND user_id = ?", (hid, user_id))
+    row = c.fetchone()
+    if row:
+        nc = row[0] + 1
+        c.execute("UPDATE completion SET count = ?, last_completed = ? WHERE habit_id = ? AND user_id = ?",
+                  (nc, now, hid, user_id))
+    else:
+        nc = 1
+        c.execute(
+            "INSERT INTO completion (user_id, habit_id, count, last_completed) VALUES (?, ?, ?, ?)",
+            (user_id, hid, nc, now)
+        )
+    conn.commit()
+    return nc
+
 # Other functions like get_connection, list_user_habits...
 
 def delete_habit(user_id):
@@ -139,54 +202,78 @@ def delete_habit(user_id):
         return
 
     with get_connection() as conn:
-        c = conn.cursor()
-        c.execute("SELECT name FROM habit WHERE habit_id = ? AND user_id = ?", (hid, user_id))
-        row = c.fetchone()
-        if not row:
+        name = habit_name(conn, user_id, hid)
+        if name is None:
             questionary.print("❌ No such habit found.")
             return
 
-        confirm = questionary.confirm(f"Are you sure you want to delete habit '{row[0]}'?").ask()
+        confirm = questionary.confirm(f"Are you sure you want to delete habit '{name}'?").ask()
         if not confirm:
             questionary.print("❎ Deletion canceled.")
             return
 
-        c.execute("DELETE FROM habit WHERE habit_id = ? AND user_id = ?", (hid, user_id))
-        conn.commit()
+        remove_habit(conn, user_id, hid)
 
+    _invalidate(user_id)
     questionary.print("🗑️ Habit deleted successfully.")
 
-def view_profile(user_id):
+def habit_name(conn, user_id, hid):
+    """Name of the user's habit `hid`, or None if the user has no such habit."""
+    c = conn.cursor()
+    c.execute("SELECT name FROM habit_detail WHERE habit_id = ? AND user_id = ?", (hid, user_id))
+    row = c.fetchone()
+    return row[0] if row else None
+
+def remove_habit(conn, user_id, hid):
+    """Non-interactive core of delete_habit; returns True if a habit was deleted."""
+    c = conn.cursor()
+    c.execute("DELETE FROM habit WHERE habit_id = ? AND user_id = ?", (hid, user_id))
+    conn.commit()
+    return c.rowcount == 1
+
+def _load_profile(user_id):
+    """(username, created_at, [(habit name, count)]) of the user, or None if there is no such user."""
+    data = _prefetched.get(user_id)
+    if data:
+        profile = data.profile()
+        return (profile.username, profile.created_at, list(profile.completions)) if profile else None
+
     with get_connection() as conn:
         c = conn.cursor()
 
         # Fetch user info (username and account creation date)
         c.execute("SELECT username, created_at FROM user_info WHERE user_id = ?", (user_id,))
         user = c.fetchone()
+        if not user:
+            return None
 
-        if user:
-            username, created_at = user
-            questionary.print(f"👤 Profile for {username}:")
-            questionary.print(f"   - Username: {username}")
-            questionary.print(f"   - Account created on: {created_at}")
-
-            # Fetch habit completion data for the user
-            c.execute("""
-                SELECT h.name, c.count
-                FROM habit h
-                JOIN completion c ON h.habit_id = c.habit_id
-                WHERE h.user_id = ?
-            """, (user_id,))
-            habits = c.fetchall()
-
-            if habits:
-                questionary.print("🔖 Your habit completions:")
-                for habit_name, count in habits:
-                    questionary.print(f"   - Habit: {habit_name} | Streak: {count} completions")
-            else:
-                questionary.print("❌ No habits completed yet.")
+        # Fetch habit completion data for the user
+        c.execute("""
+            SELECT h.name, c.count
+            FROM habit_detail h
+            JOIN completion c ON h.habit_id = c.habit_id
+            WHERE h.user_id = ?
+        """, (user_id,))
+        return user[0], user[1], c.fetchall()
+
+
+def view_profile(user_id):
+    profile = _load_profile(user_id)
+
+    if profile:
+        username, created_at, habits = profile
+        questionary.print(f"👤 Profile for {username}:")
+        questionary.print(f"   - Username: {username}")
+        questionary.print(f"   - Account created on: {created_at}")
+
+        if habits:
+            questionary.print("🔖 Your habit completions:")
+            for habit_name, count in habits:
+                questionary.print(f"   - Habit: {habit_name} | Streak: {count} completions")
         else:
-            questionary.print("❌ Profile not found.")
+            questionary.print("❌ No habits completed yet.")
+    else:
+        questionary.print("❌ Profile not found.")
 
 
 def delete_account(user_id):
@@ -211,19 +298,33 @@ def delete_account(user_id):
             questionary.print("❎ Account deletion canceled.")
             return
 
-        # Delete the user's habits and completions first to avoid foreign key constraint errors
-        c.execute("DELETE FROM completion WHERE user_id = ?", (user_id,))
-        c.execute("DELETE FROM habit WHERE user_id = ?", (user_id,))
+        remove_account(conn, user_id)
 
-        # Now, delete the user from the user_info table
-        c.execute("DELETE FROM user_info WHERE user_id = ?", (user_id,))
-        conn.commit()
+    _invalidate(user_id)
 
     questionary.print(f"🗑️ Account '{username}' deleted successfully.")
 
+def remove_account(conn, user_id):
+    """Non-interactive core of delete_account; returns True if an account was deleted."""
+    c = conn.cursor()
+    # Delete the user's habits and completions first to avoid foreign key constraint errors
+    c.execute("DELETE FROM completion WHERE user_id = ?", (user_id,))
+    c.execute("DELETE FROM habit WHERE user_id = ?", (user_id,))
+
+    # Now, delete the user from the user_info table
+    c.execute("DELETE FROM user_info WHERE user_id = ?", (user_id,))
+    conn.commit()
+    return c.rowcount == 1
+
 from datetime import datetime, date
 
-def view_analytics(user_id):
+def _load_analytics(user_id):
+    """(total habits, total completions, completions today) of the user."""
+    data = _prefetched.get(user_id)
+    if data:
+        summary = data.analytics()
+        return summary.total_habits, summary.total_completions, summary.today_completions
+
     today = date.today()  # Gets today's date in yyyy-mm-dd format
     with get_connection() as conn:
         c = conn.cursor()
@@ -239,6 +340,10 @@ def view_analytics(user_id):
         # Completions today
         c.execute("SELECT COUNT(*) FROM completion WHERE user_id = ? AND DATE(last_completed) = ?", (user_id, today))
         today_completions = c.fetchone()[0]
+    return total_habits, total_completions, today_completions
+
+def view_analytics(user_id):
+    total_habits, total_completions, today_completions = _load_analytics(user_id)
 
     questionary.print(f"📊 Analytics for today:")
     questionary.print(f"• Total habits: {total_habits}")
@@ -246,6 +351,18 @@ def view_analytics(user_id):
     questionary.print(f"• Completions today: {today_completions}")
 
 def user_menu(user_id, username):
+    # Imported here to keep the thread pool machinery out of scripted startup
+    from prefetch import UserData
+
+    # Start loading what the user is likely to look at while the menu is shown
+    with UserData(user_id) as data:
+        _prefetched[user_id] = data
+        try:
+            _run_user_menu(user_id, username)
+        finally:
+            del _prefetched[user_id]
+
+def _run_user_menu(user_id, username):
     while True:
         choice = questionary.select(
             f"👤 Welcome {username}! What would you like to do?",
@@ -290,6 +407,7 @@ def user_menu(user_id, username):
 # Top-level menu
 # —————————————————————————————
 def main():
+    ensure_schema()
     while True:
         choice = questionary.select(
             "🏠 Main Menu",
@@ -306,5 +424,26 @@ def main():
             break
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Habit tracker.")
+    parser.add_argument('--journal', help="log completions to this journal file and ingest them in the background")
+    args = parser.parse_args()
+
+    if args.journal:
+        from journal import IngestError, Ingester, Journal
+
+        ensure_schema()
+        _journal = Journal(args.journal)
+        ingester = Ingester(_journal).start()
+        try:
+            main()
+        finally:
+            try:
+                ingester.stop()
+            except IngestError as e:
+                print(f"❌ {e}")
+            _journal.close()
+    else:
+        main()
 
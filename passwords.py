@@ -0,0 +1,40 @@
+import hashlib
+import hmac
+import os
+
+# ---------------------------
+# Password hashing
+# ---------------------------
+#
+# Hashes are stored as "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>" in
+# user_info.password. Accounts created interactively still store the password
+# as typed; check_password accepts both.
+
+SCHEME = 'pbkdf2_sha256'
+ITERATIONS = 200_000
+
+
+def hash_password(password: str, iterations: int = ITERATIONS) -> str:
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def is_hashed(stored: str) -> bool:
+    return stored.startswith(f"{SCHEME}$")
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Check `password` against a value made by hash_password."""
+    if not is_hashed(stored):
+        return False
+    _scheme, iterations, salt, expected = stored.split('$')
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(digest.hex(), expected)
+
+
+def check_password(password: str, stored: str) -> bool:
+    """Check `password` against a stored value, hashed or (for older accounts) plaintext."""
+    if is_hashed(stored):
+        return verify_password(password, stored)
+    return hmac.compare_digest(stored.encode('utf-8'), password.encode('utf-8'))
@@ -0,0 +1,100 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+from dashboard import AnalyticsSummary, ProfileSummary, fetch_analytics, fetch_profiles
+from db import DB_PATH, create_connection as get_connection
+
+# ---------------------------
+# Prefetching user data
+# ---------------------------
+#
+# After log_in the user nearly always opens View Habits, View Profile or Log
+# Habit Completion next. A UserData starts loading the user's habits, profile
+# and analytics on a small thread pool as soon as it is created; the menu
+# actions then wait on those futures instead of querying, which by the time a
+# choice has been made is usually already done.
+#
+# Every task opens its own connection (sqlite3 connections stay on the thread
+# that made them). Writes made through the menu call invalidate(), which
+# starts a fresh load in the background straight away.
+
+KINDS = ('habits', 'profile', 'analytics')
+
+
+def fetch_user_habits(cursor, user_id: int) -> List[Tuple[int, str]]:
+    cursor.execute("SELECT habit_id, name FROM habit_detail WHERE user_id = ? ORDER BY habit_id", (user_id,))
+    return cursor.fetchall()
+
+
+def fetch_user_profile(cursor, user_id: int) -> Optional[ProfileSummary]:
+    return fetch_profiles(cursor, [user_id]).get(user_id)
+
+
+def fetch_user_analytics(cursor, user_id: int) -> AnalyticsSummary:
+    return fetch_analytics(cursor, [user_id], date.today())[user_id]
+
+
+LOADERS: Dict[str, Callable] = {
+    'habits': fetch_user_habits,
+    'profile': fetch_user_profile,
+    'analytics': fetch_user_analytics,
+}
+
+
+class UserData:
+    """
+    Background-loaded habits, profile and analytics of one logged-in user.
+
+    Attributes:
+        user_id (int): The user whose data is loaded.
+        db_path (str): The database the worker threads connect to.
+    """
+
+    def __init__(self, user_id: int, db_path=DB_PATH, max_workers: int = 3, prefetch: bool = True):
+        self.user_id = user_id
+        self.db_path = db_path
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"prefetch-{user_id}")
+        self._futures: Dict[str, Future] = {}
+        if prefetch:
+            self.invalidate()
+
+    def _load(self, kind: str):
+        conn = get_connection(self.db_path)
+        try:
+            return LOADERS[kind](conn.cursor(), self.user_id)
+        finally:
+            conn.close()
+
+    def _get(self, kind: str):
+        future = self._futures.get(kind)
+        if future is None:
+            future = self._futures[kind] = self._pool.submit(self._load, kind)
+        return future.result()
+
+    def invalidate(self, *kinds: str) -> None:
+        """Reload `kinds` (all of them by default) in the background."""
+        for kind in kinds or KINDS:
+            self._futures[kind] = self._pool.submit(self._load, kind)
+
+    def habits(self) -> List[Tuple[int, str]]:
+        """(habit_id, name) of each of the user's habits; waits for the load if it is still running."""
+        return self._get('habits')
+
+    def profile(self) -> Optional[ProfileSummary]:
+        return self._get('profile')
+
+    def analytics(self) -> AnalyticsSummary:
+        return self._get('analytics')
+
+    def close(self) -> None:
+        # Loads not yet started are dropped; shutdown(cancel_futures=) needs Python 3.9
+        for future in self._futures.values():
+            future.cancel()
+        self._pool.shutdown(wait=True)
+        self._futures.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
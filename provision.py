@@ -0,0 +1,176 @@
+import argparse
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from db import DB_PATH, PREDEFINED_HABITS, create_connection as get_connection, intern_habit_template
+from passwords import ITERATIONS, hash_password
+
+# ---------------------------
+# Bulk account provisioning
+# ---------------------------
+#
+# Accounts are read from a stream of (username, password, email) rows and
+# handled a chunk at a time:
+#   1. rows with a blank username or password, and usernames repeated in the
+#      input, are rejected without touching the database,
+#   2. the usernames left are checked against user_info with one query,
+#   3. the passwords of new accounts are hashed across a process pool,
+#   4. accounts and their starter habits are inserted in one transaction.
+# Usernames are checked again inside that transaction, so an account created
+# by someone else while the chunk was being hashed is reported, not a crash.
+# Every input row gets a ProvisionResult, in input order.
+
+CREATED, EXISTS, DUPLICATE, INVALID = 'created', 'exists', 'duplicate', 'invalid'
+
+
+class AccountRow(NamedTuple):
+    username: str
+    password: str
+    email: Optional[str] = None
+
+
+class ProvisionResult(NamedTuple):
+    line: int                 # 1-based position in the input
+    username: str
+    status: str               # created, exists, duplicate or invalid
+    user_id: Optional[int]
+    habits: int               # starter habits created
+
+
+def read_accounts_csv(path) -> Iterator[AccountRow]:
+    """Stream AccountRows from a CSV file with username, password and optional email columns."""
+    with open(path, newline='', encoding='utf-8') as f:
+        for record in csv.DictReader(f):
+            yield AccountRow((record.get('username') or '').strip(), record.get('password') or '',
+                             (record.get('email') or '').strip() or None)
+
+
+def _existing_usernames(cursor, usernames: List[str]) -> set:
+    cursor.execute("""
+        SELECT username FROM user_info
+        WHERE username IN (SELECT value FROM json_each(?))
+    """, (json.dumps(usernames),))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def _insert_chunk(conn, accounts: List[Tuple[int, AccountRow, str]],
+                  starter_habits: Sequence[Tuple[str, Optional[str], str]]) -> Dict[str, Tuple[int, int]]:
+    """Insert hashed accounts and their habits in one transaction; returns username -> (user_id, habits)."""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        taken = _existing_usernames(cursor, [row.username for _, row, _ in accounts])
+        accounts = [account for account in accounts if account[1].username not in taken]
+        cursor.executemany(
+            "INSERT INTO user_info (username, password, email) VALUES (?, ?, ?)",
+            [(row.username, hashed, row.email) for _, row, hashed in accounts]
+        )
+        cursor.execute("""
+            SELECT username, user_id FROM user_info
+            WHERE username IN (SELECT value FROM json_each(?))
+        """, (json.dumps([row.username for _, row, _ in accounts]),))
+        user_ids = dict(cursor.fetchall())
+
+        now = datetime.now()
+        templates = [(intern_habit_template(cursor, name, desc), period) for name, desc, period in starter_habits]
+        cursor.executemany(
+            "INSERT INTO habit (user_id, template_id, periodicity, created_at) VALUES (?, ?, ?, ?)",
+            [(user_ids[row.username], template_id, period, now)
+             for _, row, _ in accounts for template_id, period in templates]
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return {username: (user_id, len(starter_habits)) for username, user_id in user_ids.items()}
+
+
+def provision_accounts(conn, rows: Iterable[AccountRow], chunk_size: int = 1000, processes: int = 4,
+                       starter_habits: Sequence[Tuple[str, Optional[str], str]] = PREDEFINED_HABITS,
+                       iterations: int = ITERATIONS) -> Iterator[ProvisionResult]:
+    """
+    Create accounts for `rows`, yielding a ProvisionResult per row as each chunk
+    is committed. Passwords are hashed with `processes` worker processes.
+    """
+    hasher = partial(hash_password, iterations=iterations)
+    pool = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    seen = set()
+    rows = iter(rows)
+    line = 0
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            statuses: List[Tuple[int, AccountRow, str]] = []
+            for row in chunk:
+                line += 1
+                row = AccountRow(*row)
+                if not row.username or not row.password:
+                    statuses.append((line, row, INVALID))
+                elif row.username in seen:
+                    statuses.append((line, row, DUPLICATE))
+                else:
+                    seen.add(row.username)
+                    statuses.append((line, row, CREATED))
+
+            candidates = [row.username for _, row, status in statuses if status == CREATED]
+            existing = _existing_usernames(conn.cursor(), candidates) if candidates else set()
+            new = [(number, row) for number, row, status in statuses
+                   if status == CREATED and row.username not in existing]
+
+            passwords = [row.password for _, row in new]
+            if pool is not None:
+                hashes = list(pool.map(hasher, passwords, chunksize=max(1, len(passwords) // (processes * 4))))
+            else:
+                hashes = [hasher(password) for password in passwords]
+            created = _insert_chunk(conn, [(number, row, hashed) for (number, row), hashed in zip(new, hashes)],
+                                    starter_habits) if new else {}
+
+            for number, row, status in statuses:
+                if status == CREATED and row.username not in created:
+                    status = EXISTS
+                user_id, habits = created.get(row.username, (None, 0)) if status == CREATED else (None, 0)
+                yield ProvisionResult(number, row.username, status, user_id, habits)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def write_report(results: Iterable[ProvisionResult], path) -> Dict[str, int]:
+    """Write one CSV line per result to `path`; returns the number of rows per status."""
+    totals = {CREATED: 0, EXISTS: 0, DUPLICATE: 0, INVALID: 0}
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(ProvisionResult._fields)
+        for result in results:
+            writer.writerow(['' if value is None else value for value in result])
+            totals[result.status] += 1
+    return totals
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Create accounts in bulk from a CSV of username,password,email.")
+    parser.add_argument('accounts', help="CSV file with a header row")
+    parser.add_argument('--report', default='provision_report.csv', help="per-row result file")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="accounts per transaction")
+    parser.add_argument('--processes', type=int, default=4, help="password hashing processes")
+    parser.add_argument('--no-starter-habits', action='store_true', help="don't give new accounts the predefined habits")
+    args = parser.parse_args()
+
+    conn = get_connection(DB_PATH)
+    started = time.perf_counter()
+    try:
+        results = provision_accounts(conn, read_accounts_csv(args.accounts), args.chunk_size, args.processes,
+                                     () if args.no_starter_habits else PREDEFINED_HABITS)
+        totals = write_report(results, args.report)
+    finally:
+        conn.close()
+    print(f"👥 Created {totals[CREATED]} accounts in {time.perf_counter() - started:.1f}s; "
+          f"{totals[EXISTS]} already existed, {totals[DUPLICATE]} duplicates, {totals[INVALID]} invalid. "
+          f"See {args.report}.")
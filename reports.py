@@ -0,0 +1,300 @@
+import argparse
+import csv
+import html
+import io
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import date
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from db import DB_PATH, create_connection as get_connection
+
+# ---------------------------
+# Batch progress reports
+# ---------------------------
+#
+# Every user gets a CSV and/or HTML file with what view_profile and
+# view_analytics show: their habits, completion counts (streaks) and today's
+# totals. User ids are read in keyset-paginated chunks; each chunk is one task
+# for a process pool, which loads the whole id range with a single query and
+# writes one file per user. At most `max_in_flight` chunks are queued at once,
+# so memory stays flat however many users there are.
+#
+# Chunks finish out of order, so the checkpoint records the highest user id
+# below which every chunk is done. An interrupted run started again with the
+# same output directory continues from there; a chunk that was half written
+# is simply rendered again (files are written to a temp name and renamed).
+
+FORMATS = ('csv', 'html')
+CHECKPOINT_FILE = 'checkpoint.json'
+
+# Users per output subdirectory, so no directory holds a million files
+USERS_PER_DIR = 1000
+
+
+class HabitLine(NamedTuple):
+    name: str
+    periodicity: str
+    count: int
+    last_completed: Optional[str]
+
+
+class UserReport(NamedTuple):
+    user_id: int
+    username: str
+    created_at: str
+    habits: Tuple[HabitLine, ...]
+    today_completions: int
+
+    @property
+    def total_completions(self) -> int:
+        return sum(habit.count for habit in self.habits)
+
+
+class ReportRun(NamedTuple):
+    reports: int
+    chunks: int
+    seconds: float
+    resumed_from: int      # last user id already done before this run, 0 for a fresh run
+
+
+# ---------------------------
+# Loading
+# ---------------------------
+
+def iter_user_chunks(cursor, chunk_size: int, after: int = 0) -> Iterator[Tuple[int, int]]:
+    """Yield (first, last) user id ranges of up to `chunk_size` users, after user id `after`."""
+    while True:
+        cursor.execute("""
+            SELECT MIN(user_id), MAX(user_id)
+            FROM (SELECT user_id FROM user_info WHERE user_id > ? ORDER BY user_id LIMIT ?)
+        """, (after, chunk_size))
+        first, last = cursor.fetchone()
+        if first is None:
+            return
+        yield first, last
+        after = last
+
+
+def fetch_user_reports(cursor, first: int, last: int, today: Optional[date] = None) -> List[UserReport]:
+    """Report data for every user with an id between `first` and `last`, in one query."""
+    today = (today or date.today()).isoformat()
+    cursor.execute("""
+        SELECT u.user_id, u.username, u.created_at, h.name, h.periodicity, c.count, c.last_completed
+        FROM user_info u
+        LEFT JOIN habit_detail h ON h.user_id = u.user_id
+        LEFT JOIN completion c ON c.user_id = u.user_id AND c.habit_id = h.habit_id
+        WHERE u.user_id BETWEEN ? AND ?
+        ORDER BY u.user_id, h.habit_id
+    """, (first, last))
+
+    reports = []
+    current = None
+    for user_id, username, created_at, name, periodicity, count, last_completed in cursor.fetchall():
+        if current is None or current[0] != user_id:
+            current = [user_id, username, created_at, [], 0]
+            reports.append(current)
+        if name is not None:
+            current[3].append(HabitLine(name, periodicity, count or 0, last_completed))
+            if last_completed and last_completed[:10] == today:
+                current[4] += 1
+    return [UserReport(user_id, username, created_at, tuple(habits), today_count)
+            for user_id, username, created_at, habits, today_count in reports]
+
+
+# ---------------------------
+# Rendering
+# ---------------------------
+
+def render_csv(report: UserReport) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['habit', 'periodicity', 'completions', 'last_completed'])
+    for habit in report.habits:
+        writer.writerow([habit.name, habit.periodicity, habit.count, habit.last_completed or ''])
+    return out.getvalue()
+
+
+def render_html(report: UserReport) -> str:
+    rows = "\n".join(
+        f"<tr><td>{html.escape(habit.name)}</td><td>{html.escape(habit.periodicity or '')}</td>"
+        f"<td>{habit.count}</td><td>{html.escape(habit.last_completed or '-')}</td></tr>"
+        for habit in report.habits
+    ) or '<tr><td colspan="4">No habits tracked yet.</td></tr>'
+    username = html.escape(report.username)
+    return f"""<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Habit report for {username}</title></head>
+<body>
+<h1>Habit report for {username}</h1>
+<p>Account created on {html.escape(str(report.created_at))}</p>
+<ul>
+<li>Total habits: {len(report.habits)}</li>
+<li>Total completions: {report.total_completions}</li>
+<li>Completions today: {report.today_completions}</li>
+</ul>
+<table>
+<tr><th>Habit</th><th>Periodicity</th><th>Completions</th><th>Last completed</th></tr>
+{rows}
+</table>
+</body>
+</html>
+"""
+
+
+RENDERERS = {'csv': render_csv, 'html': render_html}
+
+
+def report_path(out_dir, user_id: int, fmt: str) -> str:
+    return os.path.join(out_dir, f"{user_id // USERS_PER_DIR:04d}", f"user_{user_id}.{fmt}")
+
+
+def _write_file(path: str, text: str) -> None:
+    partial_path = f"{path}.partial"
+    with open(partial_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    os.replace(partial_path, path)
+
+
+# ---------------------------
+# Workers
+# ---------------------------
+
+_worker_conn = None
+
+
+def _init_worker(db_path) -> None:
+    """Open one connection per worker process, reused for every chunk it renders."""
+    global _worker_conn
+    _worker_conn = get_connection(db_path)
+
+
+def render_chunk(first: int, last: int, out_dir, formats: Sequence[str], today: Optional[date] = None) -> int:
+    """Render reports for user ids `first`..`last`; returns the number of users written."""
+    reports = fetch_user_reports(_worker_conn.cursor(), first, last, today)
+    for report in reports:
+        os.makedirs(os.path.dirname(report_path(out_dir, report.user_id, formats[0])), exist_ok=True)
+        for fmt in formats:
+            _write_file(report_path(out_dir, report.user_id, fmt), RENDERERS[fmt](report))
+    return len(reports)
+
+
+# ---------------------------
+# Checkpoints
+# ---------------------------
+
+def load_checkpoint(out_dir) -> int:
+    """Highest user id whose reports (and all before it) are written, 0 if none."""
+    path = os.path.join(out_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['last_user_id']
+
+
+def save_checkpoint(out_dir, last_user_id: int, reports: int) -> None:
+    _write_file(os.path.join(out_dir, CHECKPOINT_FILE),
+                json.dumps({'last_user_id': last_user_id, 'reports': reports}))
+
+
+# ---------------------------
+# Driver
+# ---------------------------
+
+class _InlineExecutor:
+    """Runs chunks in the calling process; used when processes <= 1."""
+
+    def __init__(self, db_path):
+        _init_worker(db_path)
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        global _worker_conn
+        _worker_conn.close()
+        _worker_conn = None
+
+
+def generate_reports(out_dir, db_path=DB_PATH, formats: Sequence[str] = FORMATS, chunk_size: int = 500,
+                     processes: int = 4, max_in_flight: Optional[int] = None, resume: bool = True,
+                     today: Optional[date] = None, max_chunks: Optional[int] = None) -> ReportRun:
+    """
+    Write a report per user to `out_dir`, checkpointing as chunks complete.
+    With `resume`, users up to the saved checkpoint are skipped. `max_chunks`
+    stops after that many chunks (the checkpoint lets a later run finish).
+    """
+    formats = tuple(formats)
+    unknown = set(formats) - set(FORMATS)
+    if not formats or unknown:
+        raise ValueError(f"Formats must be chosen from {FORMATS}, got {formats}")
+    os.makedirs(out_dir, exist_ok=True)
+    resumed_from = load_checkpoint(out_dir) if resume else 0
+    max_in_flight = max_in_flight or max(2, processes * 2)
+
+    if processes > 1:
+        executor = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(db_path,))
+    else:
+        executor = _InlineExecutor(db_path)
+
+    conn = get_connection(db_path)
+    pending = deque()          # (last user id, future) in submission order
+    reports = chunks = 0
+    done_through = resumed_from
+    started = time.perf_counter()
+
+    def collect(block: bool) -> None:
+        nonlocal reports, chunks, done_through
+        if block:
+            wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+        advanced = False
+        while pending and pending[0][1].done():
+            last, future = pending.popleft()
+            reports += future.result()
+            chunks += 1
+            done_through = last
+            advanced = True
+        if advanced:
+            save_checkpoint(out_dir, done_through, reports)
+
+    try:
+        for number, (first, last) in enumerate(iter_user_chunks(conn.cursor(), chunk_size, resumed_from)):
+            if max_chunks is not None and number >= max_chunks:
+                break
+            while len(pending) >= max_in_flight:
+                collect(block=True)
+            pending.append((last, executor.submit(render_chunk, first, last, out_dir, formats, today)))
+            collect(block=False)
+        while pending:
+            collect(block=True)
+    finally:
+        conn.close()
+        # Chunks not yet started are dropped; shutdown(cancel_futures=) needs Python 3.9
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+    return ReportRun(reports, chunks, time.perf_counter() - started, resumed_from)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a progress report file for every user.")
+    parser.add_argument('--out', default='reports', help="output directory (also holds the checkpoint)")
+    parser.add_argument('--format', default='csv,html', help="comma-separated formats: csv, html")
+    parser.add_argument('--chunk-size', type=int, default=500, help="users per worker task")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-in-flight', type=int, help="chunks queued at once (default 2 per process)")
+    parser.add_argument('--restart', action='store_true', help="ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    run = generate_reports(args.out, formats=args.format.split(','), chunk_size=args.chunk_size,
+                           processes=args.processes, max_in_flight=args.max_in_flight, resume=not args.restart)
+    if run.resumed_from:
+        print(f"⏩ Resumed after user {run.resumed_from}.")
+    print(f"📄 Wrote {run.reports} reports in {run.chunks} chunks in {run.seconds:.2f}s.")
@@ -0,0 +1,140 @@
+import argparse
+import time
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+from db import DB_PATH, create_connection as get_connection
+from timeseries import GRANULARITIES, refresh_rollups
+
+# ---------------------------
+# History retention
+# ---------------------------
+#
+# completion_history gains a row per logged completion forever. Compaction
+# folds every whole month older than the retention age into one
+# completion_monthly row per habit (count, first and last completion) and
+# deletes the detail rows. Nothing the app reports changes:
+#   - completion.count, the streak shown to users, is never touched,
+#   - the completion-rate rollups are brought up to date before any detail is
+#     deleted, so closed buckets keep their values. Backdated completions that
+#     land in a compacted month are kept in detail (and folded in by the next
+#     compaction) but leave that month's rollups as they were.
+#
+# Deleted rows leave free pages behind. With auto_vacuum = INCREMENTAL they
+# are handed back to the OS a few at a time by reclaim_space(), instead of a
+# full VACUUM that rewrites the file and blocks writers.
+
+
+class CompactionResult(NamedTuple):
+    cutoff: str
+    rows_compacted: int
+    months_written: int
+
+
+def retention_cutoff(max_age_days: int, today: Optional[date] = None) -> date:
+    """First day of the oldest month that is kept in detail."""
+    today = today or date.today()
+    return (today - timedelta(days=max_age_days)).replace(day=1)
+
+
+def compact_history(conn, max_age_days: int = 365, today: Optional[date] = None) -> CompactionResult:
+    """Fold completion_history older than `max_age_days` into monthly summaries, in one transaction."""
+    cutoff = retention_cutoff(max_age_days, today).isoformat()
+    with conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        for granularity in GRANULARITIES:
+            refresh_rollups(cursor, granularity, today)
+
+        cursor.execute("""
+            INSERT INTO completion_monthly (habit_id, user_id, month, completions, first_completed, last_completed)
+            SELECT habit_id, user_id, date(completed_at, 'start of month'),
+                   COUNT(*), MIN(completed_at), MAX(completed_at)
+            FROM completion_history
+            WHERE completed_at < ?
+            GROUP BY habit_id, date(completed_at, 'start of month')
+            ON CONFLICT (habit_id, month) DO UPDATE SET
+                completions = completions + excluded.completions,
+                first_completed = MIN(first_completed, excluded.first_completed),
+                last_completed = MAX(last_completed, excluded.last_completed)
+        """, (cutoff,))
+        months_written = cursor.rowcount
+
+        cursor.execute("DELETE FROM completion_history WHERE completed_at < ?", (cutoff,))
+        rows_compacted = cursor.rowcount
+    return CompactionResult(cutoff, rows_compacted, months_written)
+
+
+def completion_totals(cursor, habit_id: int):
+    """(completions, first_completed, last_completed) for a habit across summaries and detail."""
+    cursor.execute("""
+        SELECT SUM(n), MIN(first_completed), MAX(last_completed)
+        FROM (
+            SELECT completions AS n, first_completed, last_completed
+            FROM completion_monthly WHERE habit_id = ?
+            UNION ALL
+            SELECT COUNT(*), MIN(completed_at), MAX(completed_at)
+            FROM completion_history WHERE habit_id = ?
+        )
+    """, (habit_id, habit_id))
+    total, first, last = cursor.fetchone()
+    return total or 0, first, last
+
+
+def enable_incremental_vacuum(conn) -> bool:
+    """
+    Switch a database created before auto_vacuum was enabled to INCREMENTAL.
+    This needs one full VACUUM, so run it in a maintenance window. Returns True if it ran.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def free_pages(conn) -> int:
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def reclaim_space(conn, pages_per_step: int = 256, pause: float = 0.05, max_steps: Optional[int] = None) -> int:
+    """
+    Release free pages `pages_per_step` at a time, pausing `pause` seconds between
+    steps so writers can get in. Returns the number of pages released.
+    Each step is its own transaction, so `conn` must not have one open.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        raise RuntimeError("auto_vacuum is not INCREMENTAL; run enable_incremental_vacuum() first")
+    if conn.in_transaction:
+        # executescript() would commit the caller's transaction before the first step
+        raise RuntimeError("reclaim_space() needs a connection with no open transaction")
+    released = 0
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        before = free_pages(conn)
+        if before == 0:
+            break
+        # sqlite3's execute() stops incremental_vacuum after its first page; executescript runs it to the end
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages_per_step)});")
+        released += before - free_pages(conn)
+        steps += 1
+        if pause:
+            time.sleep(pause)
+    return released
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compact old completion history and reclaim free space.")
+    parser.add_argument('--max-age-days', type=int, default=365, help="keep this many days of detail")
+    parser.add_argument('--pages', type=int, default=256, help="pages released per vacuum step")
+    parser.add_argument('--pause', type=float, default=0.05, help="seconds between vacuum steps")
+    args = parser.parse_args()
+
+    conn = get_connection(DB_PATH)
+    try:
+        result = compact_history(conn, args.max_age_days)
+        print(f"🗜️ Compacted {result.rows_compacted} completions before {result.cutoff} "
+              f"into {result.months_written} monthly rows.")
+        released = reclaim_space(conn, args.pages, args.pause)
+        print(f"♻️ Released {released} free pages.")
+    finally:
+        conn.close()
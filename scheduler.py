@@ -0,0 +1,96 @@
+from datetime import datetime, time, timedelta
+from heapq import merge
+from itertools import islice
+from typing import List, Optional, Tuple
+from db import create_connection as get_connection
+
+# ---------------------------
+# Due-and-at-risk scheduler
+# ---------------------------
+#
+# habit.next_due holds each habit's deadline: the end of the period in which
+# it must next be completed to keep its streak. Triggers in db.py keep it up
+# to date when habits are created and completions are logged.
+#
+# The (periodicity, next_due) index is the priority queue: each query below
+# reads the k smallest deadlines per periodicity straight off the index and
+# k-way merges the two ordered streams, so a batch of k habits costs
+# O(k log n) however many habits exist.
+
+PERIODICITIES = ('daily', 'weekly')
+
+ScheduledHabit = Tuple[str, int, int, str, str]  # (next_due, habit_id, user_id, name, periodicity)
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def period_end(moment: datetime, periodicity: str) -> datetime:
+    """End of the daily or weekly (Monday-based) period containing `moment`."""
+    start = datetime.combine(moment.date(), time())
+    if periodicity == 'weekly':
+        return start + timedelta(days=7 - moment.weekday())
+    return start + timedelta(days=1)
+
+
+def deadline_after(completed_at: datetime, periodicity: str) -> datetime:
+    """Deadline for the next completion after one logged at `completed_at`."""
+    return period_end(completed_at, periodicity) + timedelta(days=7 if periodicity == 'weekly' else 1)
+
+
+def _next_due_between(cursor, bounds: dict, limit: int) -> List[ScheduledHabit]:
+    """
+    Habits with lower <= next_due < upper (per periodicity), earliest deadline first.
+    `bounds` maps periodicity -> (lower, upper); either bound may be None.
+    """
+    streams = []
+    for periodicity, (lower, upper) in bounds.items():
+        cursor.execute("""
+            SELECT next_due, habit_id, user_id, name, periodicity
+            FROM habit_detail
+            WHERE periodicity = ?
+              AND next_due >= COALESCE(?, '')
+              AND next_due < COALESCE(?, '9999-12-31')
+            ORDER BY next_due
+            LIMIT ?
+        """, (periodicity, lower, upper, limit))
+        streams.append(cursor.fetchall())
+    return list(islice(merge(*streams), limit))
+
+
+def due_now(cursor, now: Optional[datetime] = None, limit: int = 100) -> List[ScheduledHabit]:
+    """Habits not yet completed in their current period, soonest deadline first."""
+    now = now or datetime.now()
+    bounds = {
+        periodicity: (_timestamp(now), _timestamp(period_end(now, periodicity) + timedelta(seconds=1)))
+        for periodicity in PERIODICITIES
+    }
+    return _next_due_between(cursor, bounds, limit)
+
+
+def at_risk(cursor, within: timedelta, now: Optional[datetime] = None, limit: int = 100) -> List[ScheduledHabit]:
+    """Habits whose streak breaks within `within` from now, soonest deadline first."""
+    now = now or datetime.now()
+    bounds = {periodicity: (_timestamp(now), _timestamp(now + within)) for periodicity in PERIODICITIES}
+    return _next_due_between(cursor, bounds, limit)
+
+
+def overdue(cursor, now: Optional[datetime] = None, since: Optional[datetime] = None,
+            limit: int = 100) -> List[ScheduledHabit]:
+    """Habits whose deadline passed before `now` (and after `since`), oldest deadline first."""
+    now = now or datetime.now()
+    lower = _timestamp(since) if since else None
+    bounds = {periodicity: (lower, _timestamp(now)) for periodicity in PERIODICITIES}
+    return _next_due_between(cursor, bounds, limit)
+
+
+if __name__ == '__main__':
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        print("⏰ Due now:")
+        for next_due, habit_id, user_id, name, periodicity in due_now(cursor):
+            print(f"   - {name} (ID: {habit_id}, user {user_id}) due by {next_due}")
+        print("⚠️ Breaking within 6 hours:")
+        for next_due, habit_id, user_id, name, periodicity in at_risk(cursor, timedelta(hours=6)):
+            print(f"   - {name} (ID: {habit_id}, user {user_id}) due by {next_due}")
@@ -0,0 +1,88 @@
+import sqlite3
+import time
+from db import DB_PATH, create_connection as get_connection
+
+# ---------------------------
+# Read snapshots for analytics
+# ---------------------------
+#
+# Reports run against a ReadSnapshot instead of the live database:
+#   - 'memory': the database is copied into a private :memory: database with
+#     the backup API, so report queries take no locks on the file at all.
+#   - 'wal':    a read-only connection holds one read transaction open; in WAL
+#     mode that pins a consistent view while writers keep committing.
+#
+# A separate watch connection polls `PRAGMA data_version` to see whether anyone
+# committed since the snapshot was taken. The snapshot is only refreshed when
+# the data changed, and at most once per `refresh_interval` seconds if set.
+
+MODES = ('memory', 'wal')
+
+
+class ReadSnapshot:
+    """
+    A consistent, read-only view of the habit database for analytics.
+
+    Attributes:
+        source_path (str): The database file the snapshot is taken from.
+        mode (str): 'memory' or 'wal' (see above).
+        refresh_interval (float, optional): The minimum number of seconds between refreshes.
+        conn (sqlite3.Connection): The connection that reads the snapshot; it stays
+            the same object across refreshes.
+        refreshes (int): The number of times the snapshot has been taken.
+    """
+
+    def __init__(self, source_path=DB_PATH, mode='memory', refresh_interval=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown snapshot mode: {mode!r}")
+        self.source_path = source_path
+        self.mode = mode
+        self.refresh_interval = refresh_interval
+        self.refreshes = 0
+        self._watch = get_connection(source_path)
+        if mode == 'memory':
+            self.conn = sqlite3.connect(':memory:')
+        else:
+            journal_mode = self._watch.execute("PRAGMA journal_mode").fetchone()[0]
+            if journal_mode != 'wal':
+                self._watch.close()
+                raise ValueError("WAL snapshots need the database in WAL mode (run db.py)")
+            self.conn = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True, isolation_level=None)
+        self._data_version = None
+        self._taken_at = None
+        self.refresh()
+
+    def _current_data_version(self):
+        return self._watch.execute("PRAGMA data_version").fetchone()[0]
+
+    def is_stale(self) -> bool:
+        """True if another connection committed since the snapshot was taken."""
+        return self._current_data_version() != self._data_version
+
+    def refresh(self) -> None:
+        """Take a new snapshot unconditionally."""
+        data_version = self._current_data_version()
+        if self.mode == 'memory':
+            self._watch.backup(self.conn)
+        else:
+            if self.conn.in_transaction:
+                self.conn.execute("COMMIT")
+            self.conn.execute("BEGIN")
+            # The read transaction only pins a snapshot once it reads something
+            self.conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        self._data_version = data_version
+        self._taken_at = time.monotonic()
+        self.refreshes += 1
+
+    def refresh_if_stale(self) -> bool:
+        """Refresh if the data changed and the refresh interval has passed; returns True if refreshed."""
+        if self.refresh_interval is not None and time.monotonic() - self._taken_at < self.refresh_interval:
+            return False
+        if not self.is_stale():
+            return False
+        self.refresh()
+        return True
+
+    def close(self) -> None:
+        self.conn.close()
+        self._watch.close()
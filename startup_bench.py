@@ -0,0 +1,90 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, NamedTuple
+import db
+
+# ---------------------------
+# Startup benchmark
+# ---------------------------
+#
+# Times what a short scripted run pays before doing any work:
+#   - importing each entry module in a fresh interpreter, less the time of a
+#     bare interpreter start, and whether prompt_toolkit got loaded,
+#   - the schema check on an up-to-date database (ensure_schema) against
+#     running every CREATE ... IF NOT EXISTS (create_tables).
+
+MODULES = ('main', 'analyze')
+
+
+class StartupTiming(NamedTuple):
+    name: str
+    median_ms: float
+    best_ms: float
+    note: str = ''
+
+
+def _median_best(samples: List[float]) -> Dict[str, float]:
+    return {'median_ms': statistics.median(samples) * 1000, 'best_ms': min(samples) * 1000}
+
+
+def _run_python(code: str, cwd: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def time_imports(runs: int = 10, modules=MODULES) -> List[StartupTiming]:
+    """Median and best import time of each module in a fresh interpreter, net of interpreter start."""
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    baseline = [_run_python('pass', cwd) for _ in range(runs)]
+    timings = [StartupTiming('python (baseline)', **_median_best(baseline))]
+    for module in modules:
+        samples = [_run_python(f'import {module}', cwd) for _ in range(runs)]
+        loaded = subprocess.run(
+            [sys.executable, '-c', f"import sys, {module}; print('prompt_toolkit' in sys.modules)"],
+            cwd=cwd, check=True, capture_output=True, text=True
+        ).stdout.strip() == 'True'
+        net = [sample - statistics.median(baseline) for sample in samples]
+        timings.append(StartupTiming(f'import {module}', **_median_best(net),
+                                     note='prompt_toolkit loaded' if loaded else 'no UI libraries loaded'))
+    return timings
+
+
+def time_schema_check(runs: int = 10) -> List[StartupTiming]:
+    """ensure_schema on an up-to-date database versus create_tables, in milliseconds."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'habit_tracker.db')
+        db.create_tables(path)
+        full, check = [], []
+        for _ in range(runs):
+            started = time.perf_counter()
+            db.create_tables(path)
+            full.append(time.perf_counter() - started)
+
+            db._checked_paths.discard(os.path.abspath(path))
+            started = time.perf_counter()
+            db.ensure_schema(path)
+            check.append(time.perf_counter() - started)
+    return [StartupTiming('create_tables', **_median_best(full)),
+            StartupTiming('ensure_schema', **_median_best(check))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure startup cost of the entry points.")
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print("⏱️ Startup benchmark")
+    create, check = time_schema_check(args.runs)
+    for timing in time_imports(args.runs) + [create, check]:
+        note = f"  ({timing.note})" if timing.note else ''
+        print(f"   {timing.name:<20} median {timing.median_ms:7.2f}ms  best {timing.best_ms:7.2f}ms{note}")
+    if check.median_ms < create.median_ms:
+        print(f"✅ The schema check is {create.median_ms / max(check.median_ms, 1e-6):.0f}x cheaper than create_tables.")
+    else:
+        print("⚠️ The schema check is not cheaper than create_tables; is the stored schema version current?")
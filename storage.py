@@ -0,0 +1,321 @@
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from itertools import count
+from typing import Dict, List, Optional, Set, Tuple
+
+import analyze
+import main
+from dashboard import fetch_analytics
+from db import create_connection as get_connection
+from passwords import check_password
+from prefetch import fetch_user_habits, fetch_user_profile
+
+# ---------------------------
+# Storage backends
+# ---------------------------
+#
+# Storage is the set of operations the app performs on its data: the user and
+# habit CRUD and completion upsert from main.py, the analyze.py fetches and the
+# view_analytics aggregates. Two backends implement it:
+#   - SQLiteStorage runs the app's own cores and queries (main.py, analyze.py,
+#     dashboard.py) against a sqlite3 connection.
+#   - MemoryStorage keeps plain dicts with hash indexes on user_id,
+#     (user_id, name) and periodicity, for simulations and fast tests.
+
+
+class UsernameTaken(Exception):
+    """Raised by create_user when the username already exists."""
+
+
+class Storage(ABC):
+    # ----- users -----
+
+    @abstractmethod
+    def create_user(self, username: str, password: str, email: Optional[str] = None) -> int:
+        """Create a user and return its id; raises UsernameTaken for duplicate names."""
+
+    @abstractmethod
+    def authenticate(self, username: str, password: str) -> Optional[int]:
+        """Return the user id for matching credentials, else None."""
+
+    @abstractmethod
+    def get_user(self, user_id: int) -> Optional[Tuple[str, str]]:
+        """Return (username, created_at), or None."""
+
+    @abstractmethod
+    def delete_user(self, user_id: int) -> bool:
+        """Delete a user with its habits and completions; False if it didn't exist."""
+
+    # ----- habits -----
+
+    @abstractmethod
+    def add_habit(self, user_id: int, name: str, description: Optional[str], periodicity: str) -> Optional[int]:
+        """Create a habit and return its id; None if the user already has a habit with that name."""
+
+    @abstractmethod
+    def list_habits(self, user_id: int) -> List[Tuple[int, str]]:
+        """Return (habit_id, name) for each of the user's habits."""
+
+    @abstractmethod
+    def get_habit_name(self, user_id: int, habit_id: int) -> Optional[str]:
+        """Return the name of the user's habit, or None."""
+
+    @abstractmethod
+    def delete_habit(self, user_id: int, habit_id: int) -> bool:
+        """Delete the user's habit; False if it didn't exist."""
+
+    # ----- completions -----
+
+    @abstractmethod
+    def log_completion(self, user_id: int, habit_id: int, when: Optional[datetime] = None) -> Optional[int]:
+        """Count one completion and return the new count; None if the habit doesn't exist."""
+
+    @abstractmethod
+    def user_completions(self, user_id: int) -> List[Tuple[str, int]]:
+        """Return (habit name, count) for each of the user's completed habits."""
+
+    # ----- analytics -----
+
+    @abstractmethod
+    def fetch_all_users(self) -> List[Tuple[int, str]]: ...
+
+    @abstractmethod
+    def fetch_all_habits(self) -> List[Tuple[str, str]]: ...
+
+    @abstractmethod
+    def fetch_habits_by_periodicity(self, periodicity: str) -> List[Tuple[str, str]]: ...
+
+    @abstractmethod
+    def fetch_all_completions(self) -> List[Tuple[str, str, int]]: ...
+
+    @abstractmethod
+    def fetch_completions_for_habit(self, habit_name: str) -> List[Tuple[str, int]]: ...
+
+    # ----- aggregates -----
+
+    @abstractmethod
+    def count_habits(self, user_id: int) -> int: ...
+
+    @abstractmethod
+    def total_completions(self, user_id: int) -> int: ...
+
+    @abstractmethod
+    def completions_on(self, user_id: int, day: date) -> int:
+        """Number of the user's habits last completed on `day`."""
+
+
+class SQLiteStorage(Storage):
+    """
+    Storage on a sqlite3 connection created by db.create_connection.
+
+    Writes go through the non-interactive cores in main.py and reads through
+    the fetch helpers the menus and reports use, so the SQL lives in one place.
+    """
+
+    def __init__(self, conn=None):
+        self.conn = conn or get_connection()
+
+    def _one(self, sql, params=()):
+        return self.conn.execute(sql, params).fetchone()
+
+    def create_user(self, username, password, email=None):
+        try:
+            with self.conn:
+                return main.insert_account(self.conn, username, password, email)
+        except sqlite3.IntegrityError:
+            raise UsernameTaken(username) from None
+
+    def authenticate(self, username, password):
+        return main.check_credentials(self.conn, username, password)
+
+    def get_user(self, user_id):
+        return self._one("SELECT username, created_at FROM user_info WHERE user_id = ?", (user_id,))
+
+    def delete_user(self, user_id):
+        with self.conn:
+            return main.remove_account(self.conn, user_id)
+
+    def add_habit(self, user_id, name, description, periodicity):
+        with self.conn:
+            return main.insert_habit(self.conn, user_id, name, description, periodicity)
+
+    def list_habits(self, user_id):
+        return fetch_user_habits(self.conn.cursor(), user_id)
+
+    def get_habit_name(self, user_id, habit_id):
+        return main.habit_name(self.conn, user_id, habit_id)
+
+    def delete_habit(self, user_id, habit_id):
+        with self.conn:
+            return main.remove_habit(self.conn, user_id, habit_id)
+
+    def log_completion(self, user_id, habit_id, when=None):
+        return main.record_completion(self.conn, user_id, habit_id, when or datetime.now())
+
+    def user_completions(self, user_id):
+        profile = fetch_user_profile(self.conn.cursor(), user_id)
+        return list(profile.completions) if profile else []
+
+    def fetch_all_users(self):
+        return analyze.fetch_all_users(self.conn.cursor())
+
+    def fetch_all_habits(self):
+        return analyze.fetch_all_habits(self.conn.cursor())
+
+    def fetch_habits_by_periodicity(self, periodicity):
+        return analyze.fetch_habits_by_periodicity(self.conn.cursor(), periodicity)
+
+    def fetch_all_completions(self):
+        return analyze.fetch_all_completions(self.conn.cursor())
+
+    def fetch_completions_for_habit(self, habit_name):
+        return analyze.fetch_completions_for_habit(self.conn.cursor(), habit_name)
+
+    def _analytics(self, user_id, day=None):
+        return fetch_analytics(self.conn.cursor(), [user_id], day)[user_id]
+
+    def count_habits(self, user_id):
+        return self._analytics(user_id).total_habits
+
+    def total_completions(self, user_id):
+        return self._analytics(user_id).total_completions
+
+    def completions_on(self, user_id, day):
+        return self._analytics(user_id, day).today_completions
+
+
+class MemoryStorage(Storage):
+    """
+    Storage held entirely in Python dicts; nothing is persisted.
+
+    Rows are kept in insertion order, so list results come back in the same
+    order SQLite returns them for a freshly built database.
+    """
+
+    def __init__(self):
+        self._user_ids = count(1)
+        self._habit_ids = count(1)
+        self.users: Dict[int, dict] = {}
+        self.habits: Dict[int, dict] = {}
+        self.completions: Dict[int, dict] = {}            # habit_id -> completion row
+        self._by_username: Dict[str, int] = {}
+        self._habits_by_user: Dict[int, Dict[int, None]] = {}
+        self._habit_by_user_name: Dict[Tuple[int, str], int] = {}
+        self._habits_by_periodicity: Dict[str, Dict[int, None]] = {'daily': {}, 'weekly': {}}
+        self._habits_by_name: Dict[str, Set[int]] = {}
+
+    def create_user(self, username, password, email=None):
+        if username in self._by_username:
+            raise UsernameTaken(username)
+        user_id = next(self._user_ids)
+        self.users[user_id] = {'username': username, 'password': password, 'email': email,
+                               'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        self._by_username[username] = user_id
+        self._habits_by_user[user_id] = {}
+        return user_id
+
+    def authenticate(self, username, password):
+        user_id = self._by_username.get(username)
+        if user_id is not None and check_password(password, self.users[user_id]['password']):
+            return user_id
+        return None
+
+    def get_user(self, user_id):
+        user = self.users.get(user_id)
+        return (user['username'], user['created_at']) if user else None
+
+    def delete_user(self, user_id):
+        user = self.users.pop(user_id, None)
+        if user is None:
+            return False
+        for habit_id in list(self._habits_by_user.pop(user_id, {})):
+            self._remove_habit(habit_id)
+        del self._by_username[user['username']]
+        return True
+
+    def add_habit(self, user_id, name, description, periodicity):
+        if periodicity not in self._habits_by_periodicity:
+            raise ValueError(f"Unknown periodicity: {periodicity!r}")
+        if user_id not in self.users:
+            raise KeyError(user_id)
+        if (user_id, name) in self._habit_by_user_name:
+            return None
+        habit_id = next(self._habit_ids)
+        self.habits[habit_id] = {'user_id': user_id, 'name': name, 'description': description,
+                                 'periodicity': periodicity, 'created_at': datetime.now()}
+        self._habits_by_user[user_id][habit_id] = None
+        self._habit_by_user_name[(user_id, name)] = habit_id
+        self._habits_by_periodicity[periodicity][habit_id] = None
+        self._habits_by_name.setdefault(name, set()).add(habit_id)
+        return habit_id
+
+    def _remove_habit(self, habit_id):
+        habit = self.habits.pop(habit_id)
+        self._habits_by_user.get(habit['user_id'], {}).pop(habit_id, None)
+        del self._habit_by_user_name[(habit['user_id'], habit['name'])]
+        del self._habits_by_periodicity[habit['periodicity']][habit_id]
+        self._habits_by_name[habit['name']].discard(habit_id)
+        self.completions.pop(habit_id, None)
+
+    def _owned(self, user_id, habit_id):
+        habit = self.habits.get(habit_id)
+        return habit is not None and habit['user_id'] == user_id
+
+    def list_habits(self, user_id):
+        return [(habit_id, self.habits[habit_id]['name']) for habit_id in self._habits_by_user.get(user_id, {})]
+
+    def get_habit_name(self, user_id, habit_id):
+        return self.habits[habit_id]['name'] if self._owned(user_id, habit_id) else None
+
+    def delete_habit(self, user_id, habit_id):
+        if not self._owned(user_id, habit_id):
+            return False
+        self._remove_habit(habit_id)
+        return True
+
+    def log_completion(self, user_id, habit_id, when=None):
+        if not self._owned(user_id, habit_id):
+            return None
+        completion = self.completions.setdefault(habit_id, {'user_id': user_id, 'count': 0})
+        completion['count'] += 1
+        completion['last_completed'] = when or datetime.now()
+        return completion['count']
+
+    def _completed(self, habit_ids):
+        return [(habit_id, self.completions[habit_id]) for habit_id in habit_ids if habit_id in self.completions]
+
+    def user_completions(self, user_id):
+        return [(self.habits[habit_id]['name'], completion['count'])
+                for habit_id, completion in self._completed(self._habits_by_user.get(user_id, {}))]
+
+    def _username(self, habit_id):
+        return self.users[self.habits[habit_id]['user_id']]['username']
+
+    def fetch_all_users(self):
+        return [(user_id, user['username']) for user_id, user in self.users.items()]
+
+    def fetch_all_habits(self):
+        return [(self._username(habit_id), habit['name']) for habit_id, habit in self.habits.items()]
+
+    def fetch_habits_by_periodicity(self, periodicity):
+        return [(self._username(habit_id), self.habits[habit_id]['name'])
+                for habit_id in self._habits_by_periodicity.get(periodicity, {})]
+
+    def fetch_all_completions(self):
+        return [(self._username(habit_id), self.habits[habit_id]['name'], completion['count'])
+                for habit_id, completion in self._completed(self.habits)]
+
+    def fetch_completions_for_habit(self, habit_name):
+        habit_ids = sorted(self._habits_by_name.get(habit_name, ()))
+        return [(self._username(habit_id), completion['count']) for habit_id, completion in self._completed(habit_ids)]
+
+    def count_habits(self, user_id):
+        return len(self._habits_by_user.get(user_id, {}))
+
+    def total_completions(self, user_id):
+        return sum(completion['count'] for _habit_id, completion in self._completed(self._habits_by_user.get(user_id, {})))
+
+    def completions_on(self, user_id, day):
+        return sum(1 for _habit_id, completion in self._completed(self._habits_by_user.get(user_id, {}))
+                   if completion['last_completed'].date() == day)
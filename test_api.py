@@ -0,0 +1,356 @@
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import api
+import db
+from api import ApiServer, Database
+from main import insert_account
+
+
+class Client:
+    """A keep-alive HTTP/1.1 connection to a local ApiServer."""
+
+    def __init__(self, reader, writer):
+        self.reader, self.writer = reader, writer
+        self.token = None
+
+    @classmethod
+    async def connect(cls, server):
+        return cls(*await asyncio.open_connection(server.host, server.port))
+
+    async def send(self, raw: bytes):
+        self.writer.write(raw)
+        await self.writer.drain()
+        return await self.response()
+
+    async def request(self, method, path, body=None, headers=None, version='HTTP/1.1'):
+        data = b'' if body is None else json.dumps(body).encode()
+        lines = [f"{method} {path} {version}", "Host: localhost", f"Content-Length: {len(data)}"]
+        if self.token:
+            lines.append(f"Authorization: Bearer {self.token}")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        return await self.send(('\r\n'.join(lines) + '\r\n\r\n').encode() + data)
+
+    async def response(self):
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode().strip().split('\r\n')
+        headers = {name.lower(): value.strip() for name, _, value in (l.partition(':') for l in header_lines)}
+        length = int(headers.get('content-length', 0))
+        body = await self.reader.readexactly(length) if length else b''
+        return int(status_line.split()[1]), json.loads(body) if body else None, headers
+
+    async def closed(self):
+        return await self.reader.read() == b''
+
+    async def log_in(self, username, password='pw'):
+        status, payload, _ = await self.request('POST', '/sessions', {'username': username, 'password': password})
+        assert status == 201
+        self.token = payload['token']
+        return payload['user_id']
+
+    def close(self):
+        self.writer.close()
+
+
+def run(db_path, scenario, **options):
+    """Run `scenario(server)` against a local server on a free port."""
+    async def main():
+        async with ApiServer(db_path, port=0, password_iterations=1000, **options) as server:
+            return await scenario(server)
+    return asyncio.run(main())
+
+
+def test_habit_workflow(db_path):
+    async def scenario(server):
+        client = await Client.connect(server)
+        status, payload, _ = await client.request('POST', '/accounts', {'username': 'alice', 'password': 'pw'})
+        assert status == 201
+        user_id = await client.log_in('alice')
+        assert user_id == payload['user_id']
+
+        status, water, _ = await client.request('POST', '/habits', {'name': 'Drink Water', 'periodicity': 'daily'})
+        assert status == 201
+        await client.request('POST', '/habits', {'name': 'Read a Book', 'description': 'Ten pages',
+                                                 'periodicity': 'weekly'})
+        assert (await client.request('POST', '/habits', {'name': 'Drink Water', 'periodicity': 'daily'}))[0] == 409
+
+        status, habits, _ = await client.request('GET', '/habits')
+        assert [habit['name'] for habit in habits['habits']] == ['Drink Water', 'Read a Book']
+
+        for expected in (1, 2):
+            status, payload, _ = await client.request('POST', f"/habits/{water['habit_id']}/completions")
+            assert (status, payload['count']) == (201, expected)
+
+        _, profile, _ = await client.request('GET', '/profile')
+        assert profile['username'] == 'alice'
+        assert profile['completions'] == [{'habit': 'Drink Water', 'count': 2}]
+        _, analytics, _ = await client.request('GET', '/analytics')
+        assert analytics == {'total_habits': 2, 'total_completions': 2, 'today_completions': 1}
+
+        _, report, _ = await client.request('GET', '/reports/habits?periodicity=weekly')
+        assert report == {'habits': [{'user': 'alice', 'habit': 'Read a Book'}]}
+        _, longest, _ = await client.request('GET', '/reports/streaks/longest')
+        assert longest == {'user': 'alice', 'habit': 'Drink Water', 'count': 2}
+        _, streaks, _ = await client.request('GET', '/reports/streaks?habit=Drink%20Water')
+        assert streaks['streaks'] == [{'user': 'alice', 'count': 2}]
+        _, search, _ = await client.request('GET', '/reports/search?q=wat')
+        assert [result['name'] for result in search['results']] == ['Drink Water']
+
+        assert (await client.request('DELETE', f"/habits/{water['habit_id']}"))[0] == 204
+        assert (await client.request('DELETE', f"/habits/{water['habit_id']}"))[0] == 404
+        assert (await client.request('DELETE', '/account'))[0] == 204
+        assert (await client.request('GET', '/habits'))[0] == 401
+        client.close()
+
+    run(db_path, scenario)
+
+    conn = db.create_connection(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM user_info").fetchone()[0] == 0
+    conn.close()
+
+
+def test_passwords_are_hashed_and_legacy_accounts_log_in(db_path):
+    conn = db.create_connection(db_path)
+    insert_account(conn, 'bob', 'plain')
+    conn.close()
+
+    async def scenario(server):
+        client = await Client.connect(server)
+        await client.request('POST', '/accounts', {'username': 'alice', 'password': 'secret'})
+        assert (await client.request('POST', '/accounts', {'username': 'alice', 'password': 'x'}))[0] == 409
+        assert (await client.request('POST', '/sessions', {'username': 'alice', 'password': 'wrong'}))[0] == 401
+        await client.log_in('alice', 'secret')
+        await client.log_in('bob', 'plain')
+        assert (await client.request('DELETE', '/sessions'))[0] == 204
+        assert (await client.request('GET', '/profile'))[0] == 401
+        client.close()
+
+    run(db_path, scenario)
+
+    conn = db.create_connection(db_path)
+    stored = conn.execute("SELECT password FROM user_info WHERE username = 'alice'").fetchone()[0]
+    conn.close()
+    assert stored.startswith('pbkdf2_sha256$') and 'secret' not in stored
+
+
+def test_unknown_usernames_are_verified_too(db_path):
+    checked = []
+    check = api.check_password
+
+    def recording(password, stored):
+        checked.append(stored)
+        return check(password, stored)
+
+    async def scenario(server):
+        client = await Client.connect(server)
+        await client.request('POST', '/accounts', {'username': 'alice', 'password': 'pw'})
+        assert (await client.request('POST', '/sessions', {'username': 'nobody', 'password': 'pw'}))[0] == 401
+        assert (await client.request('POST', '/sessions', {'username': 'alice', 'password': 'no'}))[0] == 401
+        client.close()
+        return server.dummy_password
+
+    with patch.object(api, 'check_password', recording):
+        dummy = run(db_path, scenario)
+
+    # Both failures cost a PBKDF2 verification, so their timing doesn't tell them apart
+    assert checked[0] == dummy and checked[1].startswith('pbkdf2_sha256$') and checked[1] != dummy
+
+
+def test_reports_only_show_your_own_habits(db_path):
+    async def scenario(server):
+        client = await Client.connect(server)
+        for username in ('alice', 'bob'):
+            await client.request('POST', '/accounts', {'username': username, 'password': 'pw'})
+        await client.log_in('bob')
+        _, jog, _ = await client.request('POST', '/habits', {'name': 'Morning Jog', 'periodicity': 'daily'})
+        await client.request('POST', f"/habits/{jog['habit_id']}/completions")
+
+        await client.log_in('alice')
+        _, water, _ = await client.request('POST', '/habits', {'name': 'Drink Water', 'periodicity': 'daily'})
+        await client.request('POST', f"/habits/{water['habit_id']}/completions")
+
+        _, report, _ = await client.request('GET', '/reports/habits')
+        assert report == {'habits': [{'user': 'alice', 'habit': 'Drink Water'}]}
+        _, report, _ = await client.request('GET', '/reports/habits?periodicity=daily')
+        assert report == {'habits': [{'user': 'alice', 'habit': 'Drink Water'}]}
+        _, longest, _ = await client.request('GET', '/reports/streaks/longest')
+        assert longest == {'user': 'alice', 'habit': 'Drink Water', 'count': 1}
+        _, streaks, _ = await client.request('GET', '/reports/streaks?habit=Morning%20Jog')
+        assert streaks['streaks'] == []
+        client.close()
+
+    run(db_path, scenario)
+
+
+def test_sessions_expire(db_path):
+    async def scenario(server):
+        client = await Client.connect(server)
+        await client.request('POST', '/accounts', {'username': 'alice', 'password': 'pw'})
+        user_id = await client.log_in('alice')
+        # Using a session keeps it alive
+        server.sessions[client.token] = (user_id, time.monotonic() + 1)
+        assert (await client.request('GET', '/habits'))[0] == 200
+        assert server.sessions[client.token][1] > time.monotonic() + 30
+
+        server.sessions[client.token] = (user_id, time.monotonic() - 1)
+        assert (await client.request('GET', '/habits'))[0] == 401
+        assert server.sessions == {}
+
+        # Expired sessions nobody comes back for are dropped at the next login
+        await client.log_in('alice')
+        server.sessions[client.token] = (user_id, time.monotonic() - 1)
+        await client.log_in('alice')
+        assert list(server.sessions) == [client.token]
+        client.close()
+
+    run(db_path, scenario, session_ttl=60)
+
+
+def test_errors(db_path):
+    async def scenario(server):
+        client = await Client.connect(server)
+        assert (await client.request('GET', '/habits'))[0] == 401
+        assert (await client.request('GET', '/nowhere'))[0] == 404
+        assert (await client.request('PUT', '/habits'))[0] == 405
+        assert (await client.request('POST', '/accounts', {'username': 'alice'}))[0] == 400
+
+        await client.request('POST', '/accounts', {'username': 'alice', 'password': 'pw'})
+        await client.request('POST', '/accounts', {'username': 'bob', 'password': 'pw'})
+        await client.log_in('bob')
+        _, jog, _ = await client.request('POST', '/habits', {'name': 'Morning Jog', 'periodicity': 'daily'})
+        await client.log_in('alice')
+        assert (await client.request('POST', '/habits', {'name': 'Nap', 'periodicity': 'hourly'}))[0] == 400
+        # bob's habit is invisible to alice
+        assert (await client.request('POST', f"/habits/{jog['habit_id']}/completions"))[0] == 404
+        assert (await client.request('GET', '/reports/habits?periodicity=hourly'))[0] == 400
+
+        status, payload, headers = await client.send(
+            b"POST /habits HTTP/1.1\r\nContent-Length: 5\r\nAuthorization: Bearer " + client.token.encode()
+            + b"\r\n\r\n{nope")
+        assert (status, headers['connection']) == (400, 'keep-alive')
+        assert payload == {'error': "body is not valid JSON"}
+
+        # A broken request line ends the connection
+        status, _, headers = await client.send(b"NONSENSE\r\n\r\n")
+        assert (status, headers['connection']) == (400, 'close')
+        assert await client.closed()
+        client.close()
+
+    run(db_path, scenario)
+
+
+def test_connection_handling(db_path):
+    async def scenario(server):
+        client = await Client.connect(server)
+        for _ in range(20):
+            assert (await client.request('GET', '/health'))[0] == 200
+
+        status, _, headers = await client.request('GET', '/health', headers={'Connection': 'close'})
+        assert (status, headers['connection']) == (200, 'close')
+        assert await client.closed()
+
+        old = await Client.connect(server)
+        status, _, headers = await old.request('GET', '/health', version='HTTP/1.0')
+        assert headers['connection'] == 'close' and await old.closed()
+
+        idle = await Client.connect(server)
+        assert await asyncio.wait_for(idle.closed(), 2)
+        for c in (client, old, idle):
+            c.close()
+
+    run(db_path, scenario, idle_timeout=0.2)
+
+
+def test_many_concurrent_keep_alive_clients(db_path):
+    writer_threads = set()
+    record = api.record_completion
+
+    def recording(conn, *args):
+        writer_threads.add(threading.current_thread().name)
+        return record(conn, *args)
+
+    async def scenario(server):
+        owner = await Client.connect(server)
+        await owner.request('POST', '/accounts', {'username': 'alice', 'password': 'pw'})
+        await owner.log_in('alice')
+        _, water, _ = await owner.request('POST', '/habits', {'name': 'Drink Water', 'periodicity': 'daily'})
+
+        clients = [await Client.connect(server) for _ in range(1000)]
+        for client in clients:
+            client.token = owner.token
+
+        async def work(client):
+            results = [await client.request('POST', f"/habits/{water['habit_id']}/completions"),
+                       await client.request('GET', '/analytics')]
+            return [status for status, _, _ in results]
+
+        statuses = await asyncio.gather(*(work(client) for client in clients))
+        assert all(result == [201, 200] for result in statuses)
+        _, analytics, _ = await owner.request('GET', '/analytics')
+        for client in clients + [owner]:
+            client.close()
+        return analytics
+
+    with patch.object(api, 'record_completion', recording):
+        analytics = run(db_path, scenario, max_pending=32)
+
+    # No lost updates, and every write went through the single writer connection
+    assert analytics['total_completions'] == 1000
+    assert len(writer_threads) == 1 and writer_threads.pop().startswith('api-writer')
+
+
+def test_database_bounds_pending_calls(db_path):
+    running = peak = 0
+    lock = threading.Lock()
+
+    def slow(_conn):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    async def scenario():
+        database = Database(db_path, readers=8, max_pending=3)
+        try:
+            await asyncio.gather(*(database.read(slow) for _ in range(12)))
+        finally:
+            database.close()
+
+    asyncio.run(scenario())
+    assert peak == 3
+
+
+def test_logins_do_not_hold_up_reads(db_path):
+    check = api.check_password
+
+    def slow_check(password, stored):
+        time.sleep(0.2)
+        return check(password, stored)
+
+    async def scenario(server):
+        client = await Client.connect(server)
+        await client.request('POST', '/accounts', {'username': 'alice', 'password': 'pw'})
+        await client.log_in('alice')
+
+        logins = [await Client.connect(server) for _ in range(4)]
+        burst = asyncio.gather(*(other.log_in('alice') for other in logins))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        assert (await client.request('GET', '/habits'))[0] == 200
+        read_seconds = time.perf_counter() - started
+        await burst
+        for c in logins + [client]:
+            c.close()
+        return read_seconds
+
+    with patch.object(api, 'check_password', slow_check):
+        read_seconds = run(db_path, scenario, readers=1, hashers=1)
+
+    # Four 0.2 s verifications are queued on the single hashing thread meanwhile
+    assert read_seconds < 0.2
@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+from backup import backup_database, list_snapshots, rotate_snapshots, take_snapshot, verify_snapshot
+
+
+@pytest.fixture
+def source(db_path, conn):
+    """Fixture to add the predefined habits and enough users to span many pages."""
+    db.insert_predefined_habits(db_path)
+    conn.executemany(
+        "INSERT INTO user_info (username, password) VALUES (?, ?)",
+        [(f"user{i}", "x" * 200) for i in range(2000)]
+    )
+    conn.commit()
+    return db_path
+
+
+def test_backup_copies_in_steps_and_reports_progress(source, tmp_path):
+    steps = []
+
+    result = backup_database(tmp_path / "copy.db", source, pages=8, sleep=0,
+                             progress=lambda copied, total: steps.append((copied, total)))
+
+    assert len(steps) > 1
+    assert steps[-1][0] == steps[-1][1] == result.pages
+    assert result.size_bytes > 0 and result.throughput > 0
+    copy = sqlite3.connect(result.path)
+    assert copy.execute("SELECT COUNT(*) FROM user_info").fetchone()[0] == 2001
+    copy.close()
+
+
+def test_backup_is_consistent_with_concurrent_writer(source, tmp_path):
+    def write():
+        conn = db.create_connection(source)
+        for i in range(50):
+            conn.execute("INSERT INTO user_info (username, password) VALUES (?, 'pw')", (f"late{i}",))
+            conn.commit()
+        conn.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    result = backup_database(tmp_path / "copy.db", source, pages=4, sleep=0.001)
+    writer.join()
+
+    assert verify_snapshot(result.path) == []
+
+
+def test_verify_snapshot_detects_corruption(source, tmp_path):
+    result = backup_database(tmp_path / "copy.db", source, pages=-1, sleep=0)
+    with open(result.path, "r+b") as f:
+        f.seek(result.size_bytes // 2)
+        f.write(b"\xff" * 4096)
+
+    assert verify_snapshot(result.path) != []
+
+
+def test_take_snapshot_rotates(source, tmp_path):
+    backup_dir = tmp_path / "backups"
+
+    for _ in range(3):
+        take_snapshot(backup_dir, source, keep=2, pages=-1, sleep=0)
+
+    # No partial copies or -wal/-shm files are left behind
+    assert sorted(str(path) for path in backup_dir.iterdir()) == list_snapshots(backup_dir)
+    assert len(list_snapshots(backup_dir)) == 2
+
+
+def test_rotate_keep_zero_removes_everything(source, tmp_path):
+    backup_dir = tmp_path / "backups"
+    take_snapshot(backup_dir, source, keep=5, pages=-1, sleep=0)
+
+    assert len(rotate_snapshots(backup_dir, 0)) == 1
+    assert list_snapshots(backup_dir) == []
+
+
+def test_backup_sleeps_between_steps(source, tmp_path):
+    steps = []
+
+    result = backup_database(tmp_path / "copy.db", source, pages=16, sleep=0.02,
+                             progress=lambda copied, total: steps.append(copied))
+
+    assert len(steps) > 3
+    assert result.seconds >= (len(steps) - 1) * 0.02
+    assert not result.vacuumed
+
+
+def test_backup_falls_back_to_vacuum_under_steady_writes(source, tmp_path):
+    done = threading.Event()
+    written = []
+
+    def write():
+        conn = db.create_connection(source)
+        while not done.is_set():
+            conn.execute("INSERT INTO user_info (username, password) VALUES (?, 'pw')", (f"late{len(written)}",))
+            conn.commit()
+            written.append(1)
+        conn.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        result = backup_database(tmp_path / "copy.db", source, pages=8, sleep=0.01, max_restarts=2)
+    finally:
+        done.set()
+        writer.join()
+
+    assert result.vacuumed and result.restarts == 3
+    assert verify_snapshot(result.path) == []
+    copy = sqlite3.connect(result.path)
+    assert copy.execute("SELECT COUNT(*) FROM user_info").fetchone()[0] >= 2001
+    copy.close()
@@ -0,0 +1,110 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import db
+from bitsets import (count_between, count_last, current_streak, last_completed_period, last_periods,
+                     load_bitset, load_user_bitsets, longest_streak)
+from main import insert_account, insert_habit, record_completion
+
+TODAY = date(2024, 3, 15)  # a Friday
+
+
+@pytest.fixture
+def conn(conn):
+    """Fixture to add one user to the fresh database."""
+    insert_account(conn, 'alice', 'pw')
+    return conn
+
+
+def _log(conn, hid, days):
+    for day in days:
+        record_completion(conn, 1, hid, datetime.combine(day, datetime.min.time()) + timedelta(hours=9))
+
+
+def test_daily_bits_follow_completions(conn):
+    hid = insert_habit(conn, 1, 'Drink Water', None, 'daily')
+    days = [TODAY - timedelta(days=n) for n in (0, 1, 2, 4, 5, 30)]
+    _log(conn, hid, sorted(days))
+    _log(conn, hid, [TODAY])  # twice on one day sets the same bit
+
+    bitset = load_bitset(conn.cursor(), hid)
+
+    assert bitset.unit == 1 and bitset.origin == TODAY - timedelta(days=30)
+    assert current_streak(bitset, TODAY) == 3
+    assert current_streak(bitset, TODAY + timedelta(days=1)) == 3
+    assert current_streak(bitset, TODAY + timedelta(days=2)) == 0
+    assert longest_streak(bitset) == 3
+    assert count_last(bitset, 7, TODAY) == 5
+    assert count_last(bitset, 365, TODAY) == 6
+    assert count_between(bitset, TODAY - timedelta(days=5), TODAY - timedelta(days=3)) == 2
+    assert last_periods(bitset, 4, TODAY) == [False, True, True, True]
+    assert last_completed_period(bitset) == TODAY
+
+
+def test_weekly_habits_use_one_bit_per_week(conn):
+    hid = insert_habit(conn, 1, 'Clean House', None, 'weekly')
+    monday = TODAY - timedelta(days=TODAY.weekday())
+    _log(conn, hid, [monday - timedelta(weeks=2), monday - timedelta(weeks=1, days=-3), TODAY, TODAY])
+
+    bitset = load_bitset(conn.cursor(), hid)
+
+    assert bitset.unit == 7 and bitset.origin == monday - timedelta(weeks=2)
+    assert bitset.bits == 0b111
+    assert current_streak(bitset, TODAY) == 3
+    assert count_last(bitset, 52, TODAY) == 3
+
+
+def test_out_of_order_completion_extends_backwards(conn):
+    hid = insert_habit(conn, 1, 'Drink Water', None, 'daily')
+    _log(conn, hid, [TODAY, TODAY - timedelta(days=20)])
+
+    bitset = load_bitset(conn.cursor(), hid)
+
+    assert bitset.origin <= TODAY - timedelta(days=20)
+    assert bitset.completed(TODAY) and bitset.completed(TODAY - timedelta(days=20))
+    assert count_last(bitset, 365, TODAY) == 2
+
+
+def test_bitsets_agree_with_history(conn):
+    rng = random.Random(7)
+    hid = insert_habit(conn, 1, 'Read a Book', None, 'daily')
+    days = sorted({TODAY - timedelta(days=rng.randrange(400)) for _ in range(150)})
+    _log(conn, hid, days)
+
+    bitset = load_bitset(conn.cursor(), hid)
+
+    expected = {d for d in days if d > TODAY - timedelta(days=365)}
+    assert count_last(bitset, 365, TODAY) == len(expected)
+    assert all(bitset.completed(d) for d in days)
+    assert sum(bitset.completed(TODAY - timedelta(days=n)) for n in range(400)) == len(days)
+
+
+def test_existing_history_is_backfilled(db_path):
+    path = db_path
+    conn = db.create_connection(path)
+    insert_account(conn, 'alice', 'pw')
+    hid = insert_habit(conn, 1, 'Drink Water', None, 'daily')
+    _log(conn, hid, [TODAY - timedelta(days=1), TODAY])
+    conn.executescript("DROP TRIGGER completion_bitset_history; DROP TABLE completion_bitset;")
+    conn.close()
+
+    db.create_tables(path)
+    conn = db.create_connection(path)
+
+    assert current_streak(load_bitset(conn.cursor(), hid), TODAY) == 2
+    conn.close()
+
+
+def test_user_bitsets_and_cascade(conn):
+    water = insert_habit(conn, 1, 'Drink Water', None, 'daily')
+    jog = insert_habit(conn, 1, 'Morning Jog', None, 'daily')
+    _log(conn, water, [TODAY])
+    _log(conn, jog, [TODAY])
+
+    assert set(load_user_bitsets(conn.cursor(), 1)) == {water, jog}
+
+    conn.execute("DELETE FROM habit WHERE habit_id = ?", (jog,))
+    conn.commit()
+    assert set(load_user_bitsets(conn.cursor(), 1)) == {water}
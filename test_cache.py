@@ -0,0 +1,86 @@
+import pytest
+
+import db
+from analyze import fetch_all_habits, fetch_all_users, fetch_habits_by_periodicity
+from cache import QueryCache
+
+
+@pytest.fixture
+def path(db_path):
+    """Fixture to add the predefined habits to the fresh database."""
+    db.insert_predefined_habits(db_path)
+    return db_path
+
+
+@pytest.fixture
+def conn(path, conn):
+    return conn
+
+
+def test_repeated_fetch_is_served_from_cache(conn):
+    cache = QueryCache(conn)
+
+    first = cache.fetch(fetch_habits_by_periodicity, 'daily')
+    second = cache.fetch(fetch_habits_by_periodicity, 'daily')
+
+    assert first is second
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_parameters_are_part_of_the_key(conn):
+    cache = QueryCache(conn)
+
+    daily = cache.fetch(fetch_habits_by_periodicity, 'daily')
+    weekly = cache.fetch(fetch_habits_by_periodicity, 'weekly')
+
+    assert len(daily) == 2 and len(weekly) == 3
+    assert cache.misses == 2
+
+
+def test_own_writes_invalidate_dependent_entries_only(conn):
+    cache = QueryCache(conn)
+    cache.fetch(fetch_all_habits)
+    cache.fetch(fetch_all_users)
+
+    conn.execute("DELETE FROM habit_detail WHERE name = 'Drink Water'")
+    conn.commit()
+
+    assert len(cache.fetch(fetch_all_habits)) == 4
+    cache.fetch(fetch_all_users)
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+def test_other_connections_invalidate(conn, path):
+    cache = QueryCache(conn)
+    cache.fetch(fetch_all_habits)
+
+    other = db.create_connection(path)
+    other.execute("INSERT INTO habit_detail (user_id, name, periodicity) VALUES (1, 'Stretch', 'daily')")
+    other.commit()
+    other.close()
+
+    assert len(cache.fetch(fetch_all_habits)) == 6
+
+
+def test_lru_eviction_by_entry_count(conn):
+    cache = QueryCache(conn, max_entries=1)
+
+    cache.fetch(fetch_habits_by_periodicity, 'daily')
+    cache.fetch(fetch_habits_by_periodicity, 'weekly')
+    cache.fetch(fetch_habits_by_periodicity, 'daily')
+
+    assert cache.misses == 3
+
+
+def test_results_over_memory_cap_are_not_cached(conn):
+    cache = QueryCache(conn, max_bytes=10)
+
+    cache.fetch(fetch_all_habits)
+    cache.fetch(fetch_all_habits)
+
+    assert cache.misses == 2
+
+
+def test_rejects_unknown_functions(conn):
+    with pytest.raises(ValueError):
+        QueryCache(conn).fetch(len)
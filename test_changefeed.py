@@ -0,0 +1,100 @@
+from datetime import datetime
+
+import pytest
+
+from changefeed import (acknowledge, consume, consumer_position, prune, read_changes, register_consumer,
+                        unregister_consumer)
+from main import insert_account, insert_habit, record_completion, remove_habit
+
+
+def test_writes_are_captured_in_order(conn):
+    user_id = insert_account(conn, 'alice', 'secret')
+    hid = insert_habit(conn, user_id, 'Drink Water', None, 'daily')
+    record_completion(conn, user_id, hid, datetime(2024, 1, 1, 9))
+    record_completion(conn, user_id, hid, datetime(2024, 1, 2, 9))
+    remove_habit(conn, user_id, hid)
+
+    register_consumer(conn, 'export', from_start=True)
+    changes = read_changes(conn.cursor(), 'export')
+
+    assert [(c.table, c.operation) for c in changes] == [
+        ('user_info', 'insert'),
+        ('habit', 'insert'),
+        ('completion', 'insert'),
+        ('completion', 'update'),
+        ('completion', 'delete'),
+        ('habit', 'delete'),
+    ]
+    assert [c.seq for c in changes] == sorted(c.seq for c in changes)
+    assert changes[3].data['count'] == 2
+    assert changes[5].data['template_id'] == changes[1].data['template_id']
+    assert 'password' not in changes[0].data
+
+
+def test_trigger_maintained_columns_are_not_changes(conn):
+    user_id = insert_account(conn, 'alice', 'pw')
+    hid = insert_habit(conn, user_id, 'Drink Water', None, 'daily')
+    register_consumer(conn, 'export')
+
+    conn.execute("UPDATE habit SET next_due = '2030-01-01' WHERE habit_id = ?", (hid,))
+    conn.commit()
+
+    assert read_changes(conn.cursor(), 'export') == []
+
+
+def test_new_consumer_starts_at_end_of_log(conn):
+    insert_account(conn, 'alice', 'pw')
+
+    register_consumer(conn, 'cache')
+    insert_account(conn, 'bob', 'pw')
+
+    assert [c.data['username'] for c in read_changes(conn.cursor(), 'cache')] == ['bob']
+
+
+def test_consume_in_batches_and_resume(conn):
+    for i in range(7):
+        insert_account(conn, f'user{i}', 'pw')
+    register_consumer(conn, 'index', from_start=True)
+    seen = []
+
+    assert consume(conn, 'index', seen.append, batch_size=3, max_batches=1) == 3
+    assert consume(conn, 'index', seen.append, batch_size=3) == 4
+    assert [len(batch) for batch in seen] == [3, 3, 1]
+    assert read_changes(conn.cursor(), 'index') == []
+
+
+def test_failed_handler_replays_batch(conn):
+    insert_account(conn, 'alice', 'pw')
+    register_consumer(conn, 'flaky', from_start=True)
+
+    def fail(_batch):
+        raise RuntimeError("downstream unavailable")
+
+    with pytest.raises(RuntimeError):
+        consume(conn, 'flaky', fail)
+    assert len(read_changes(conn.cursor(), 'flaky')) == 1
+
+
+def test_prune_keeps_changes_a_consumer_still_needs(conn):
+    for i in range(4):
+        insert_account(conn, f'user{i}', 'pw')
+    register_consumer(conn, 'fast', from_start=True)
+    register_consumer(conn, 'slow', from_start=True)
+    changes = read_changes(conn.cursor(), 'fast')
+    acknowledge(conn, 'fast', changes[-1].seq)
+    acknowledge(conn, 'slow', changes[1].seq)
+
+    assert prune(conn) == 2
+    assert len(read_changes(conn.cursor(), 'slow')) == 2
+
+    unregister_consumer(conn, 'slow')
+    assert prune(conn) == 2
+    insert_account(conn, 'late', 'pw')
+    assert changes[-1].seq < read_changes(conn.cursor(), 'fast')[0].seq
+
+
+def test_unknown_consumer_raises(conn):
+    with pytest.raises(KeyError):
+        consumer_position(conn.cursor(), 'nobody')
+    with pytest.raises(KeyError):
+        acknowledge(conn, 'nobody', 1)
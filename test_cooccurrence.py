@@ -0,0 +1,106 @@
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import pytest
+
+from cooccurrence import compute_related, correlation, load_chunk, related_habits
+from db import intern_habit_template
+
+NOW = datetime(2024, 3, 15, 12)
+HABITS = ['Drink Water', 'Morning Jog', 'Read a Book', 'Clean House', 'Plan Weekly Goals']
+
+
+@pytest.fixture
+def conn(conn):
+    """Fixture to add 40 users with random habits, created 10 days ago, and random completion counts."""
+    rng = random.Random(3)
+    for u in range(40):
+        cursor = conn.execute("INSERT INTO user_info (username, password) VALUES (?, 'pw')", (f"user{u}",))
+        user_id = cursor.lastrowid
+        # Water and Jog usually come together
+        names = [name for name in HABITS if rng.random() < 0.5]
+        if 'Drink Water' in names and 'Morning Jog' not in names and rng.random() < 0.8:
+            names.append('Morning Jog')
+        for name in names:
+            cursor = conn.execute(
+                "INSERT INTO habit (user_id, template_id, periodicity, created_at) VALUES (?, ?, 'daily', ?)",
+                (user_id, intern_habit_template(conn.cursor(), name, None), NOW - timedelta(days=10)))
+            count = rng.randrange(0, 12)
+            if count:
+                conn.execute("INSERT INTO completion (user_id, habit_id, count, last_completed) VALUES (?, ?, ?, ?)",
+                             (user_id, cursor.lastrowid, count, NOW))
+    conn.commit()
+    return conn
+
+
+def _adherence_matrix(conn):
+    """Dense user x habit-name adherence, computed directly for comparison."""
+    matrix = {}
+    for user_id, name, count in conn.execute("""
+        SELECT h.user_id, h.name, COALESCE(c.count, 0)
+        FROM habit_detail h LEFT JOIN completion c ON c.habit_id = h.habit_id
+    """):
+        matrix.setdefault(user_id, {})[name] = min(1.0, count / 10)
+    users = [row[0] for row in conn.execute("SELECT user_id FROM user_info")]
+    return [[matrix.get(u, {}).get(name, 0.0) for name in HABITS] for u in users]
+
+
+def test_chunk_is_csr(conn):
+    columns = {tid: i for i, (tid,) in enumerate(conn.execute("SELECT template_id FROM habit_template"))}
+
+    chunk = load_chunk(conn.cursor(), columns, 1, 5, NOW)
+
+    assert chunk.indptr[0] == 0 and chunk.indptr[-1] == len(chunk.indices) == len(chunk.data)
+    assert all(0.0 <= value <= 1.0 for value in chunk.data)
+    direct = conn.execute("SELECT COUNT(*) FROM habit WHERE user_id BETWEEN 1 AND 5").fetchone()[0]
+    assert len(chunk.indices) == direct
+
+
+def test_related_habits_match_direct_computation(conn):
+    assert compute_related(conn, top_k=4, min_together=1, chunk_size=7, now=NOW, use_scipy=False) > 0
+
+    related = related_habits(conn.cursor(), 'Drink Water', limit=4)
+
+    assert related[0].name == 'Morning Jog'
+    dense = _adherence_matrix(conn)
+    water, jog = [row[0] for row in dense], [row[1] for row in dense]
+    both = conn.execute("""
+        SELECT COUNT(*) FROM habit_detail a JOIN habit_detail b ON a.user_id = b.user_id
+        WHERE a.name = 'Drink Water' AND b.name = 'Morning Jog'
+    """).fetchone()[0]
+    assert related[0].together == both
+    assert related[0].correlation == pytest.approx(statistics.correlation(water, jog))
+
+
+def test_results_do_not_depend_on_chunk_size(conn):
+    compute_related(conn, top_k=3, chunk_size=1, now=NOW, use_scipy=False)
+    small = conn.execute("SELECT * FROM habit_related ORDER BY template_id, rank").fetchall()
+
+    compute_related(conn, top_k=3, chunk_size=1000, now=NOW, use_scipy=False)
+    large = conn.execute("SELECT * FROM habit_related ORDER BY template_id, rank").fetchall()
+
+    assert [row[:4] for row in small] == [row[:4] for row in large]
+    assert all(rank <= 3 for _, rank, *_ in large)
+
+
+def test_min_together_filters_rare_pairs(conn):
+    compute_related(conn, top_k=10, min_together=1000, now=NOW, use_scipy=False)
+
+    assert conn.execute("SELECT COUNT(*) FROM habit_related").fetchone()[0] == 0
+
+
+def test_correlation_of_constant_column_is_zero():
+    assert correlation(3, 3.0, 3.0, 1.0, 1.0, 1.0) == 0.0
+
+
+def test_scipy_backend_matches_array_backend(conn):
+    pytest.importorskip('scipy')
+    compute_related(conn, top_k=3, min_together=1, now=NOW, use_scipy=False)
+    plain = conn.execute("SELECT * FROM habit_related ORDER BY template_id, rank").fetchall()
+
+    compute_related(conn, top_k=3, min_together=1, chunk_size=6, now=NOW, use_scipy=True)
+    fast = conn.execute("SELECT * FROM habit_related ORDER BY template_id, rank").fetchall()
+
+    assert [row[:4] for row in fast] == [row[:4] for row in plain]
+    assert [row[4] for row in fast] == pytest.approx([row[4] for row in plain])
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+import db
+import dashboard
+from dashboard import AnalyticsSummary, ProfileSummary, fetch_analytics, fetch_dashboard, fetch_profiles
+
+
+@pytest.fixture
+def conn(conn):
+    """Fixture to add two users; only alice has completions."""
+    conn.executescript("""
+        INSERT INTO user_info (user_id, username, password, created_at)
+        VALUES (1, 'alice', 'pw', '2024-01-01'), (2, 'bob', 'pw', '2024-02-01');
+        INSERT INTO habit_detail (habit_id, user_id, name, periodicity)
+        VALUES (1, 1, 'Exercise', 'daily'), (2, 1, 'Reading', 'weekly'), (3, 2, 'Yoga', 'daily');
+        INSERT INTO completion (user_id, habit_id, count, last_completed)
+        VALUES (1, 1, 10, '2024-03-05 08:00:00'), (1, 2, 5, '2024-03-01 08:00:00');
+    """)
+    return conn
+
+
+def test_fetch_profiles(conn):
+    profiles = fetch_profiles(conn.cursor(), [1, 2, 99])
+
+    assert profiles == {
+        1: ProfileSummary(1, 'alice', '2024-01-01', (('Exercise', 10), ('Reading', 5))),
+        2: ProfileSummary(2, 'bob', '2024-02-01', ()),
+    }
+
+
+def test_fetch_analytics(conn):
+    analytics = fetch_analytics(conn.cursor(), [1, 2], today=date(2024, 3, 5))
+
+    assert analytics == {
+        1: AnalyticsSummary(1, 2, 15, 1),
+        2: AnalyticsSummary(2, 1, 0, 0),
+    }
+
+
+def test_large_lists_are_passed_as_json(conn, monkeypatch):
+    monkeypatch.setattr(dashboard, "JSON_LIST_THRESHOLD", 1)
+
+    rows = fetch_dashboard(conn.cursor(), [2, 1, 2], today=date(2024, 3, 5))
+
+    assert [(profile.username, stats.total_completions) for profile, stats in rows] == [('bob', 0), ('alice', 15)]
+
+
+def test_large_lists_see_commits_from_other_connections(conn, db_path):
+    conn.commit()
+    ids = list(range(1, 1002))
+    assert len(fetch_dashboard(conn.cursor(), ids)) == 2
+    assert not conn.in_transaction
+
+    other = db.create_connection(db_path)
+    other.execute("INSERT INTO user_info (user_id, username, password) VALUES (1001, 'carol', 'pw')")
+    other.commit()
+    other.close()
+
+    assert [profile.username for profile, _ in fetch_dashboard(conn.cursor(), ids)] == ['alice', 'bob', 'carol']
+
+
+def test_empty_list(conn):
+    assert fetch_dashboard(conn.cursor(), []) == []
@@ -0,0 +1,61 @@
+import pytest
+
+import db
+from analyze import search_habit_names, fetch_completions_for_habit
+
+
+@pytest.fixture
+def conn(db_path, conn):
+    """Fixture to add the predefined habits to the fresh database."""
+    db.insert_predefined_habits(db_path)
+    return conn
+
+
+def test_search_is_case_insensitive(conn):
+    results = search_habit_names(conn.cursor(), "drink water")
+
+    assert results[0][0] == "Drink Water"
+
+
+def test_search_matches_prefixes(conn):
+    results = search_habit_names(conn.cursor(), "plan week")
+
+    assert [name for name, _ in results] == ["Plan Weekly Goals"]
+
+
+def test_search_corrects_typos(conn):
+    results = search_habit_names(conn.cursor(), "drnk")
+
+    assert results[0][0] == "Drink Water"
+
+
+def test_search_uses_descriptions(conn):
+    results = search_habit_names(conn.cursor(), "pages")
+
+    assert [name for name, _ in results] == ["Read a Book"]
+
+
+def test_search_tracks_habit_changes(conn):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE habit_detail SET name = 'Evening Jog' WHERE name = 'Morning Jog'")
+    cursor.execute("DELETE FROM habit_detail WHERE name = 'Clean House'")
+    conn.commit()
+
+    assert search_habit_names(cursor, "evening")[0][0] == "Evening Jog"
+    assert "Morning Jog" not in [name for name, _ in search_habit_names(cursor, "morning")]
+    assert search_habit_names(cursor, "clean") == []
+
+
+def test_search_ignores_fts_operators(conn):
+    assert search_habit_names(conn.cursor(), 'NOT "') == []
+
+
+def test_selected_candidate_feeds_completions(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id, habit_id FROM habit_detail WHERE name = 'Drink Water'")
+    user_id, habit_id = cursor.fetchone()
+    cursor.execute("INSERT INTO completion (user_id, habit_id, count) VALUES (?, ?, 7)", (user_id, habit_id))
+
+    name = search_habit_names(cursor, "water")[0][0]
+
+    assert fetch_completions_for_habit(cursor, name) == [("default_user", 7)]
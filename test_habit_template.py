@@ -0,0 +1,150 @@
+import sqlite3
+
+import pytest
+
+import db
+from analyze import fetch_completions_by_template, fetch_completions_for_habit, search_habit_names
+
+
+@pytest.fixture
+def conn(conn):
+    """Fixture to add two users and a few habits."""
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO user_info (username, password) VALUES ('alice', 'pw'), ('bob', 'pw')")
+    cursor.executemany(
+        "INSERT INTO habit_detail (user_id, name, description, periodicity) VALUES (?, ?, ?, ?)",
+        [(1, 'Drink Water', 'Drink 8 glasses of water', 'daily'),
+         (2, 'Drink Water', 'Drink 8 glasses of water', 'daily'),
+         (2, 'Morning Jog', None, 'daily')]
+    )
+    conn.commit()
+    return conn
+
+
+def _template_ids(cursor):
+    cursor.execute("SELECT name, template_id FROM habit_detail ORDER BY habit_id")
+    return cursor.fetchall()
+
+
+def test_identical_habits_share_a_template(conn):
+    cursor = conn.cursor()
+    (_, first), (_, second), (_, jog) = _template_ids(cursor)
+
+    assert first == second
+    assert jog != first
+    assert cursor.execute("SELECT COUNT(*) FROM habit_template").fetchone()[0] == 2
+
+
+def test_renamed_habit_moves_to_new_template(conn):
+    cursor = conn.cursor()
+    cursor.execute("UPDATE habit_detail SET name = 'Evening Jog' WHERE name = 'Morning Jog'")
+    conn.commit()
+
+    cursor.execute("""
+        SELECT t.name FROM habit h JOIN habit_template t ON t.template_id = h.template_id
+        WHERE h.user_id = 2 AND h.habit_id = 3
+    """)
+    assert cursor.fetchone() == ('Evening Jog',)
+    # The old template had no other habits, so it is gone
+    assert cursor.execute("SELECT COUNT(*) FROM habit_template WHERE name = 'Morning Jog'").fetchone()[0] == 0
+    assert "Morning Jog" not in [name for name, _ in search_habit_names(cursor, "morning")]
+
+
+def test_templates_are_deleted_with_their_last_habit(conn):
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM habit WHERE habit_id = 1")
+    assert [name for name, _ in search_habit_names(cursor, "water")] == ['Drink Water']
+
+    cursor.execute("DELETE FROM habit WHERE habit_id = 2")
+    conn.commit()
+    assert cursor.execute("SELECT name FROM habit_template").fetchall() == [('Morning Jog',)]
+    assert search_habit_names(cursor, "water") == []
+
+
+def test_habit_rows_keep_no_text(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(habit)")]
+
+    assert 'template_id' in columns
+    assert 'name' not in columns and 'description' not in columns
+
+
+def test_completions_join_through_template(conn):
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO completion (user_id, habit_id, last_completed, count) VALUES (?, ?, '2024-01-01', ?)",
+        [(1, 1, 3), (2, 2, 5), (2, 3, 1)]
+    )
+    conn.commit()
+    template_id = _template_ids(cursor)[0][1]
+
+    assert sorted(fetch_completions_for_habit(cursor, 'Drink Water')) == [('alice', 3), ('bob', 5)]
+    assert sorted(fetch_completions_by_template(cursor, template_id)) == [('alice', 3), ('bob', 5)]
+
+
+def test_existing_database_is_migrated(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE habit (
+            habit_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, name TEXT NOT NULL,
+            description TEXT, periodicity TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        INSERT INTO habit (user_id, name, periodicity) VALUES (1, 'Read a Book', 'daily'), (2, 'Read a Book', 'daily');
+        CREATE VIRTUAL TABLE habit_fts USING fts5(name, description, content='habit', content_rowid='habit_id');
+        INSERT INTO habit_fts (habit_fts) VALUES ('rebuild');
+    """)
+    conn.close()
+
+    db.create_tables(path)
+    conn = db.create_connection(path)
+    cursor = conn.cursor()
+
+    assert {template_id for _, template_id in _template_ids(cursor)} == {1}
+    assert [name for name, _ in search_habit_names(cursor, "book")] == ['Read a Book']
+    conn.close()
+
+
+def test_version_4_database_is_rebuilt(tmp_path):
+    path = tmp_path / "old.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE user_info (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL UNIQUE, password TEXT NOT NULL,
+            email TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        CREATE TABLE habit (
+            habit_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, name TEXT NOT NULL,
+            description TEXT, periodicity TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, next_due TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES user_info(user_id) ON DELETE CASCADE
+        );
+        CREATE TABLE completion (
+            completion_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, habit_id INTEGER NOT NULL,
+            last_completed TIMESTAMP DEFAULT CURRENT_TIMESTAMP, count INTEGER DEFAULT 0,
+            FOREIGN KEY (habit_id) REFERENCES habit(habit_id) ON DELETE CASCADE
+        );
+        CREATE INDEX idx_habit_name ON habit(name);
+        INSERT INTO user_info (username, password) VALUES ('alice', 'pw');
+        INSERT INTO habit (user_id, name, description, periodicity, next_due)
+        VALUES (1, 'Drink Water', NULL, 'daily', '2024-01-03 00:00:00'),
+               (1, 'Morning Jog', 'Around the park', 'daily', '2024-01-03 00:00:00'),
+               (1, 'Nap', NULL, 'daily', NULL);
+        DELETE FROM habit WHERE name = 'Nap';
+        INSERT INTO completion (user_id, habit_id, last_completed, count) VALUES (1, 2, '2024-01-01 08:00:00', 4);
+        PRAGMA user_version = 4;
+    """)
+    conn.close()
+
+    assert db.ensure_schema(path)
+    conn = db.create_connection(path)
+
+    assert [row[1] for row in conn.execute("PRAGMA table_info(habit)")] == [
+        'habit_id', 'user_id', 'template_id', 'periodicity', 'created_at', 'next_due']
+    assert conn.execute("SELECT habit_id, name, description, next_due FROM habit_detail").fetchall() == [
+        (1, 'Drink Water', None, '2024-01-03 00:00:00'), (2, 'Morning Jog', 'Around the park', '2024-01-03 00:00:00')]
+    # Completions survive the rebuild and deleted ids are not handed out again
+    assert conn.execute("SELECT habit_id, count FROM completion").fetchall() == [(2, 4)]
+    conn.execute("INSERT INTO habit (user_id, template_id, periodicity) VALUES (1, 1, 'daily')")
+    assert conn.execute("SELECT MAX(habit_id) FROM habit").fetchone()[0] == 4
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_habit_name'").fetchone() is None
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+    conn.close()
@@ -0,0 +1,159 @@
+import sqlite3
+import time
+from datetime import datetime
+
+import pytest
+
+from journal import HEADER_SIZE, IngestError, Ingester, Journal, JournalFull, SEQ, ACK_SEQ_OFFSET, ingest_batch
+from main import insert_account, insert_habit, record_completion
+
+
+@pytest.fixture
+def setup(tmp_path, db_path, conn):
+    """Fixture to add two users with a habit each, and to create an empty journal."""
+    alice = insert_account(conn, 'alice', 'pw')
+    bob = insert_account(conn, 'bob', 'pw')
+    water = insert_habit(conn, alice, 'Drink Water', None, 'daily')
+    jog = insert_habit(conn, bob, 'Morning Jog', None, 'daily')
+    journal = Journal(tmp_path / "completions.journal", capacity=8)
+    yield conn, journal, db_path, (alice, water), (bob, jog)
+    journal.close()
+
+
+def _count(conn, habit_id):
+    row = conn.execute("SELECT count FROM completion WHERE habit_id = ?", (habit_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def test_append_and_read_back(setup, tmp_path):
+    _conn, journal, _path, (alice, water), _ = setup
+    when = datetime(2024, 3, 15, 9, 30).timestamp()
+
+    assert [journal.append(alice, water, when) for _ in range(3)] == [0, 1, 2]
+
+    with Journal(tmp_path / "completions.journal") as reopened:
+        records = reopened.read(0, 10)
+        assert reopened.capacity == 8 and reopened.pending == 3
+    assert [(r.seq, r.user_id, r.habit_id) for r in records] == [(0, alice, water), (1, alice, water), (2, alice, water)]
+    assert records[0].completed_at == datetime(2024, 3, 15, 9, 30)
+
+
+def test_torn_record_stops_reading(setup):
+    _conn, journal, _path, (alice, water), _ = setup
+    journal.append(alice, water)
+    journal.append(alice, water)
+    journal._map[HEADER_SIZE + 32 + 3] ^= 0xFF  # damage the second record
+
+    assert len(journal.read(0, 10)) == 1
+
+
+def test_ingest_matches_record_completion(setup):
+    conn, journal, _path, (alice, water), (bob, jog) = setup
+    record_completion(conn, bob, jog, datetime.now())
+    for _ in range(3):
+        journal.append(alice, water)
+    journal.append(bob, jog)
+    journal.append(bob, water)  # not bob's habit
+
+    result = ingest_batch(conn, journal)
+
+    assert (result.applied, result.rejected, result.next_seq) == (4, 1, 5)
+    assert _count(conn, water) == 3 and _count(conn, jog) == 2
+    history = conn.execute("SELECT COUNT(*) FROM completion_history WHERE habit_id = ?", (water,)).fetchone()[0]
+    assert history == 3
+    assert journal.pending == 0
+    assert ingest_batch(conn, journal).applied == 0
+
+
+def test_replay_after_crash_applies_each_record_once(setup):
+    conn, journal, _path, (alice, water), _ = setup
+    for _ in range(4):
+        journal.append(alice, water)
+
+    # A failure in the middle of a batch applies nothing from it
+    conn.execute("""
+        CREATE TEMP TRIGGER fail_third AFTER UPDATE ON completion WHEN new.count = 3 BEGIN
+            SELECT RAISE(ABORT, 'disk on fire');
+        END
+    """)
+    with pytest.raises(sqlite3.IntegrityError):
+        ingest_batch(conn, journal)
+    assert _count(conn, water) == 0
+    conn.execute("DROP TRIGGER temp.fail_third")
+
+    assert ingest_batch(conn, journal, batch_size=2).applied == 2
+
+    # Committed, but the header's acknowledgement was lost
+    SEQ.pack_into(journal._map, ACK_SEQ_OFFSET, 0)
+    assert ingest_batch(conn, journal).applied == 2
+    assert _count(conn, water) == 4
+    assert ingest_batch(conn, journal).applied == 0
+
+
+def test_full_journal_raises_until_ingested(setup):
+    conn, journal, _path, (alice, water), _ = setup
+    for _ in range(8):
+        journal.append(alice, water)
+
+    with pytest.raises(JournalFull):
+        journal.append(alice, water)
+
+    ingest_batch(conn, journal)
+    for _ in range(8):  # wraps around the ring
+        journal.append(alice, water)
+    ingest_batch(conn, journal)
+    assert _count(conn, water) == 16
+
+
+def test_background_ingester_drains_on_stop(setup):
+    conn, journal, path, (alice, water), _ = setup
+    ingester = Ingester(journal, path, batch_size=3, interval=0.01).start()
+    for _ in range(20):
+        while True:
+            try:
+                journal.append(alice, water)
+                break
+            except JournalFull:
+                time.sleep(0.001)
+    ingester.stop()
+
+    assert ingester.applied == 20
+    assert _count(conn, water) == 20
+
+
+def test_ingester_failure_is_raised_to_writers(setup):
+    conn, journal, path, (alice, water), _ = setup
+    conn.execute("""
+        CREATE TRIGGER broken AFTER INSERT ON completion BEGIN
+            SELECT RAISE(ABORT, 'disk on fire');
+        END
+    """)
+    conn.commit()
+    journal.append(alice, water)
+
+    ingester = Ingester(journal, path, interval=0.01).start()
+    deadline = time.monotonic() + 5
+    while ingester.error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert isinstance(ingester.error, sqlite3.IntegrityError)
+    with pytest.raises(IngestError, match='disk on fire'):
+        journal.append(alice, water)
+    with pytest.raises(IngestError, match='1 completions pending'):
+        ingester.stop()
+
+    # Nothing was lost: once the cause is gone the record is replayed
+    conn.execute("DROP TRIGGER broken")
+    conn.commit()
+    assert ingest_batch(conn, journal).applied == 1
+
+
+def test_append_is_fast(tmp_path):
+    with Journal(tmp_path / "big.journal", capacity=20_000) as journal:
+        started = time.perf_counter()
+        for i in range(10_000):
+            journal.append(1, i)
+        per_append = (time.perf_counter() - started) / 10_000
+
+    # A few microseconds in practice; the bound only guards against a regression to disk I/O
+    assert per_append < 0.0005
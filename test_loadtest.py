@@ -0,0 +1,39 @@
+import db
+from loadtest import percentile, run_load
+
+
+def test_threads_keep_counts_exact(tmp_path):
+    report = run_load(tmp_path / "load.db", users=8, processes=1, threads=4, ops_per_user=15,
+                      shared_habits=2, shared_ratio=0.5, seed=1)
+
+    assert report.failures == []
+    assert report.operations >= 8 * 15
+    assert report.latencies["log_completion"]
+    assert report.ops_per_second > 0
+
+
+def test_processes_keep_counts_exact(tmp_path):
+    report = run_load(tmp_path / "load.db", users=6, processes=2, threads=2, ops_per_user=10,
+                      mix={"log_completion": 1.0}, shared_ratio=1.0, seed=2)
+
+    assert report.failures == []
+    conn = db.create_connection(tmp_path / "load.db")
+    total = conn.execute("SELECT SUM(count) FROM completion").fetchone()[0]
+    conn.close()
+    # Every successful log landed on a shared habit
+    assert total == len(report.latencies["log_completion"]) - report.lock_errors
+
+
+def test_duplicate_accounts_are_rejected(tmp_path):
+    report = run_load(tmp_path / "load.db", users=2, threads=1, ops_per_user=5,
+                      mix={"create_account": 1.0}, shared_habits=0)
+
+    assert report.failures == []
+
+
+def test_percentile():
+    values = [0.1, 0.2, 0.3, 0.4]
+
+    assert percentile(values, 50) == 0.2
+    assert percentile(values, 99) == 0.4
+    assert percentile([], 99) == 0.0
@@ -24,7 +24,7 @@ def test_add_habit_success(mock_db):
     Verifies that a habit is successfully added to the database and the commit are made.
     """
     conn, cursor = mock_db
-    cursor.fetchone.return_value = None  # No existing habit with the same name
+    cursor.fetchone.side_effect = [None, (7,)]  # No existing habit with the same name, then the template id
 
     with patch('main.questionary.text') as mock_text, \
             patch('main.questionary.select') as mock_select, \
@@ -39,18 +39,21 @@ def test_add_habit_success(mock_db):
         main.add_habit(123, "testuser")
 
         cursor.execute.assert_any_call(
-            "SELECT 1 FROM habit WHERE user_id = ? AND name = ?",
+            "SELECT 1 FROM habit_detail WHERE user_id = ? AND name = ?",
             (123, "Exercise")
         )
         # Capture the INSERT query call
-        insert_calls = [call for call in cursor.execute.call_args_list if "INSERT INTO habit" in call[0][0]]
+        cursor.execute.assert_any_call(
+            'INSERT OR IGNORE INTO habit_template (name, description) VALUES (?, ?)',
+            ("Exercise", "Daily jogging")
+        )
+        insert_calls = [call for call in cursor.execute.call_args_list if "INSERT INTO habit (" in call[0][0]]
         assert len(insert_calls) == 1
         args = insert_calls[0][0][1]
         assert args[0] == 123
-        assert args[1] == "Exercise"
-        assert args[2] == "Daily jogging"
-        assert args[3] == "daily"
-        assert isinstance(args[4], datetime)
+        assert args[1] == 7
+        assert args[2] == "daily"
+        assert isinstance(args[3], datetime)
         conn.commit.assert_called_once()
         mock_print.assert_called_once_with("✅ 'Exercise' added!")
 
@@ -75,7 +78,7 @@ def test_add_habit_duplicate(mock_db):
         main.add_habit(123, "testuser")
 
         cursor.execute.assert_any_call(
-            "SELECT 1 FROM habit WHERE user_id = ? AND name = ?",
+            "SELECT 1 FROM habit_detail WHERE user_id = ? AND name = ?",
             (123, "Exercise")
         )
         conn.commit.assert_not_called()
@@ -341,7 +344,7 @@ def test_log_in_success():
          patch("main.questionary.print") as mock_print:
 
         mock_cursor = MagicMock()
-        mock_cursor.fetchone.return_value = (1,)  # user_id
+        mock_cursor.fetchone.return_value = (1, "testpass")  # user_id, stored password
         mock_conn = MagicMock()
         mock_conn.cursor.return_value = mock_cursor
         mock_conn_fn.return_value.__enter__.return_value = mock_conn
@@ -370,8 +373,19 @@ def test_log_in_invalid_credentials():
     assert username is None
     mock_print.assert_called_with("❌ Invalid credentials.")
 
+def test_check_credentials_plain_and_hashed(conn):
+    alice = main.insert_account(conn, "alice", "plain")
+    bob = main.insert_account(conn, "bob", hash_password("secret", iterations=1000))
+
+    assert main.check_credentials(conn, "alice", "plain") == alice
+    assert main.check_credentials(conn, "bob", "secret") == bob
+    assert main.check_credentials(conn, "bob", hash_password("secret", iterations=1000)) is None
+    assert main.check_credentials(conn, "alice", "wrong") is None
+    assert main.check_credentials(conn, "nobody", "plain") is None
+
 from unittest.mock import patch, MagicMock
 import main
+from passwords import hash_password
 
 
 def test_view_analytics():
@@ -0,0 +1,88 @@
+import threading
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import db
+import main
+import prefetch
+from main import insert_account, insert_habit, record_completion
+from prefetch import UserData
+
+
+@pytest.fixture
+def db_path(db_path, conn):
+    """Fixture to add one user, two habits and one completion."""
+    user_id = insert_account(conn, 'alice', 'pw')
+    water = insert_habit(conn, user_id, 'Drink Water', None, 'daily')
+    insert_habit(conn, user_id, 'Morning Jog', None, 'daily')
+    record_completion(conn, user_id, water, datetime.now())
+    return db_path
+
+
+def test_prefetches_all_kinds_off_thread(db_path):
+    threads = set()
+    load = UserData._load
+
+    def recording_load(self, kind):
+        threads.add(threading.current_thread().name)
+        return load(self, kind)
+
+    with patch.object(UserData, '_load', recording_load), UserData(1, db_path) as data:
+        assert [name for _, name in data.habits()] == ['Drink Water', 'Morning Jog']
+        assert data.profile().completions == (('Drink Water', 1),)
+        assert data.analytics()[1:] == (2, 1, 1)
+
+    assert threads and all(name.startswith('prefetch-1') for name in threads)
+
+
+def test_invalidate_reloads_after_write(db_path):
+    with UserData(1, db_path) as data:
+        assert len(data.habits()) == 2
+        conn = db.create_connection(db_path)
+        insert_habit(conn, 1, 'Read a Book', None, 'weekly')
+        conn.close()
+
+        assert len(data.habits()) == 2
+        data.invalidate('habits')
+        assert len(data.habits()) == 3
+
+
+def test_lazy_load_without_prefetch(db_path):
+    with patch.dict(prefetch.LOADERS, {'habits': MagicMock(return_value=[(9, 'x')])}) as loaders:
+        with UserData(1, db_path, prefetch=False) as data:
+            loaders['habits'].assert_not_called()
+            assert data.habits() == [(9, 'x')]
+
+
+def test_menu_actions_read_prefetched_data(db_path):
+    with UserData(1, db_path) as data:
+        main._prefetched[1] = data
+        try:
+            with patch("main.get_connection", side_effect=AssertionError("queried the database")), \
+                 patch("main.questionary.print") as mock_print:
+                main.view_habits(1)
+                main.view_profile(1)
+                main.view_analytics(1)
+        finally:
+            del main._prefetched[1]
+
+    printed = [call.args[0] for call in mock_print.call_args_list]
+    assert "- Morning Jog (ID: 2)" in printed
+    assert "   - Habit: Drink Water | Streak: 1 completions" in printed
+    assert "• Total habits: 2" in printed
+
+
+def test_user_menu_registers_and_releases_session(db_path):
+    seen = {}
+
+    def fake_menu(user_id, _username):
+        seen['data'] = main._prefetched[user_id]
+
+    with patch("main._run_user_menu", side_effect=fake_menu), \
+         patch("prefetch.UserData", lambda user_id: UserData(user_id, db_path)):
+        main.user_menu(1, 'alice')
+
+    assert isinstance(seen['data'], UserData)
+    assert 1 not in main._prefetched
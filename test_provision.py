@@ -0,0 +1,114 @@
+import csv
+import sqlite3
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import db
+import main
+from passwords import hash_password, is_hashed, verify_password
+from provision import (CREATED, DUPLICATE, EXISTS, INVALID, AccountRow, provision_accounts, read_accounts_csv,
+                       write_report)
+
+FAST = 1000  # PBKDF2 iterations for tests
+
+
+@pytest.fixture
+def db_path(db_path, conn):
+    """Fixture to add one existing account."""
+    conn.execute("INSERT INTO user_info (username, password) VALUES ('taken', 'pw')")
+    conn.commit()
+    return db_path
+
+
+def test_password_hash_round_trip():
+    stored = hash_password("s3cret", iterations=FAST)
+
+    assert is_hashed(stored)
+    assert verify_password("s3cret", stored)
+    assert not verify_password("wrong", stored)
+    assert not verify_password("s3cret", "s3cret")
+
+
+def test_provision_reports_every_row(db_path):
+    conn = db.create_connection(db_path)
+    rows = [AccountRow('ann', 'pw1'), AccountRow('taken', 'pw2'), AccountRow('', 'pw3'),
+            AccountRow('bob', 'pw4', 'bob@example.com'), AccountRow('ann', 'pw5'), AccountRow('cy', '')]
+
+    results = list(provision_accounts(conn, rows, chunk_size=2, processes=1, iterations=FAST))
+
+    assert [(r.line, r.username, r.status) for r in results] == [
+        (1, 'ann', CREATED), (2, 'taken', EXISTS), (3, '', INVALID),
+        (4, 'bob', CREATED), (5, 'ann', DUPLICATE), (6, 'cy', INVALID),
+    ]
+    cursor = conn.cursor()
+    cursor.execute("SELECT user_id, password, email FROM user_info WHERE username = 'bob'")
+    user_id, password, email = cursor.fetchone()
+    assert results[3].user_id == user_id and email == 'bob@example.com'
+    assert verify_password('pw4', password)
+    cursor.execute("SELECT name FROM habit_detail WHERE user_id = ? ORDER BY habit_id", (user_id,))
+    assert [row[0] for row in cursor.fetchall()] == [name for name, _, _ in db.PREDEFINED_HABITS]
+    assert results[3].habits == len(db.PREDEFINED_HABITS)
+    conn.close()
+
+
+def test_provision_with_process_pool_and_no_habits(db_path):
+    conn = db.create_connection(db_path)
+    rows = [(f"user{i}", f"pw{i}") for i in range(20)]
+
+    results = list(provision_accounts(conn, rows, chunk_size=8, processes=2, starter_habits=(), iterations=FAST))
+
+    assert [r.status for r in results] == [CREATED] * 20
+    assert conn.execute("SELECT COUNT(*) FROM habit").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM user_info").fetchone()[0] == 21
+    conn.close()
+
+
+def test_account_created_during_hashing_is_reported(db_path):
+    conn = db.create_connection(db_path)
+    other = db.create_connection(db_path)
+
+    def hash_and_race(password, iterations):
+        if password == 'pw-race':
+            other.execute("INSERT OR IGNORE INTO user_info (username, password) VALUES ('racer', 'x')")
+            other.commit()
+        return hash_password(password, iterations)
+
+    with patch("provision.hash_password", side_effect=hash_and_race):
+        results = list(provision_accounts(conn, [('racer', 'pw-race'), ('calm', 'pw')], processes=1, iterations=FAST))
+
+    assert [r.status for r in results] == [EXISTS, CREATED]
+    other.close()
+    conn.close()
+
+
+def test_csv_in_and_report_out(db_path, tmp_path):
+    source = tmp_path / "accounts.csv"
+    source.write_text("username,password,email\nann,pw,ann@example.com\ntaken,pw,\n", encoding='utf-8')
+    conn = db.create_connection(db_path)
+
+    totals = write_report(provision_accounts(conn, read_accounts_csv(source), processes=1, iterations=FAST),
+                          tmp_path / "report.csv")
+
+    assert totals == {CREATED: 1, EXISTS: 1, DUPLICATE: 0, INVALID: 0}
+    with open(tmp_path / "report.csv", newline='') as f:
+        report = list(csv.DictReader(f))
+    assert [(r['username'], r['status']) for r in report] == [('ann', CREATED), ('taken', EXISTS)]
+    conn.close()
+
+
+def test_provisioned_account_can_log_in(db_path):
+    conn = db.create_connection(db_path)
+    list(provision_accounts(conn, [('ann', 'pw')], processes=1, iterations=FAST))
+    conn.close()
+
+    def connect():
+        return sqlite3.connect(db_path)
+
+    with patch("main.questionary.text", return_value=MagicMock(ask=lambda: "ann")), \
+         patch("main.questionary.password", return_value=MagicMock(ask=lambda: "pw")), \
+         patch("main.get_connection", side_effect=connect), \
+         patch("main.questionary.print"):
+        user_id, username = main.log_in()
+
+    assert user_id is not None and username == "ann"
@@ -0,0 +1,93 @@
+import csv
+import os
+from datetime import date
+
+import pytest
+
+import db
+from reports import (fetch_user_reports, generate_reports, iter_user_chunks, load_checkpoint, render_html,
+                     report_path)
+
+TODAY = date(2024, 3, 15)
+
+
+@pytest.fixture
+def source(db_path, conn):
+    """Fixture to add 25 users, each with a logged and an unlogged habit."""
+    cursor = conn.cursor()
+    water = db.intern_habit_template(cursor, 'Drink Water', None)
+    plan = db.intern_habit_template(cursor, 'Plan <Week>', None)
+    for i in range(1, 26):
+        cursor.execute("INSERT INTO user_info (username, password) VALUES (?, 'pw')", (f"user{i}",))
+        user_id = cursor.lastrowid
+        cursor.execute("INSERT INTO habit (user_id, template_id, periodicity) VALUES (?, ?, 'daily')",
+                       (user_id, water))
+        cursor.execute("INSERT INTO completion (user_id, habit_id, last_completed, count) VALUES (?, ?, ?, ?)",
+                       (user_id, cursor.lastrowid, '2024-03-15 08:00:00', i))
+        cursor.execute("INSERT INTO habit (user_id, template_id, periodicity) VALUES (?, ?, 'weekly')",
+                       (user_id, plan))
+    conn.commit()
+    return db_path
+
+
+def test_chunks_cover_every_user_once(source):
+    conn = db.create_connection(source)
+
+    chunks = list(iter_user_chunks(conn.cursor(), 10))
+
+    assert chunks == [(1, 10), (11, 20), (21, 25)]
+    assert list(iter_user_chunks(conn.cursor(), 10, after=20)) == [(21, 25)]
+    conn.close()
+
+
+def test_user_report_matches_profile_and_analytics(source):
+    conn = db.create_connection(source)
+
+    report, = fetch_user_reports(conn.cursor(), 3, 3, TODAY)
+
+    assert report.username == 'user3'
+    assert [(habit.name, habit.count) for habit in report.habits] == [('Drink Water', 3), ('Plan <Week>', 0)]
+    assert report.total_completions == 3
+    assert report.today_completions == 1
+    assert '&lt;Week&gt;' in render_html(report)
+    conn.close()
+
+
+def test_generates_a_file_per_user_and_format(source, tmp_path):
+    out = tmp_path / "reports"
+
+    run = generate_reports(out, source, chunk_size=4, processes=1, today=TODAY)
+
+    assert (run.reports, run.chunks, run.resumed_from) == (25, 7, 0)
+    with open(report_path(out, 7, 'csv'), newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[1][:3] == ['Drink Water', 'daily', '7']
+    assert os.path.exists(report_path(out, 25, 'html'))
+    assert load_checkpoint(out) == 25
+
+
+def test_interrupted_run_resumes_from_checkpoint(source, tmp_path):
+    out = tmp_path / "reports"
+
+    first = generate_reports(out, source, formats=['csv'], chunk_size=10, processes=1, max_chunks=2)
+    assert (first.reports, load_checkpoint(out)) == (20, 20)
+    assert not os.path.exists(report_path(out, 21, 'csv'))
+
+    second = generate_reports(out, source, formats=['csv'], chunk_size=10, processes=1)
+    assert (second.reports, second.resumed_from) == (5, 20)
+    assert os.path.exists(report_path(out, 25, 'csv'))
+
+
+def test_process_pool_matches_inline_run(source, tmp_path):
+    run = generate_reports(tmp_path / "pool", source, chunk_size=3, processes=2, max_in_flight=2, today=TODAY)
+
+    assert run.reports == 25
+    assert load_checkpoint(tmp_path / "pool") == 25
+    for user_id in (1, 13, 25):
+        with open(report_path(tmp_path / "pool", user_id, 'html'), encoding='utf-8') as f:
+            assert f"user{user_id}" in f.read()
+
+
+def test_rejects_unknown_formats(source, tmp_path):
+    with pytest.raises(ValueError):
+        generate_reports(tmp_path / "reports", source, formats=['pdf'])
@@ -0,0 +1,106 @@
+from datetime import date, datetime
+
+import pytest
+
+import db
+from retention import (compact_history, completion_totals, enable_incremental_vacuum, free_pages,
+                       reclaim_space, retention_cutoff)
+from main import record_completion
+from timeseries import completion_rate_series, refresh_rollups
+
+TODAY = date(2024, 6, 15)
+
+
+@pytest.fixture
+def conn(conn):
+    """Fixture to add one habit completed daily through the first half of 2024."""
+    conn.execute("INSERT INTO user_info (user_id, username, password) VALUES (1, 'alice', 'pw')")
+    conn.execute("INSERT INTO habit_detail (habit_id, user_id, name, periodicity, created_at) "
+                 "VALUES (1, 1, 'Drink Water', 'daily', '2024-01-01')")
+    conn.execute("INSERT INTO completion (user_id, habit_id, count, last_completed) "
+                 "VALUES (1, 1, 1, '2024-01-01 08:00:00')")
+    for day in range(1, 166):
+        conn.execute("UPDATE completion SET count = count + 1, "
+                     "last_completed = datetime('2024-01-01 08:00:00', ? || ' days') WHERE habit_id = 1", (day,))
+    conn.commit()
+    return conn
+
+
+def test_retention_cutoff():
+    assert retention_cutoff(90, TODAY) == date(2024, 3, 1)
+
+
+def test_compaction_keeps_counts_and_rates(conn):
+    cursor = conn.cursor()
+    rates_before = completion_rate_series(cursor, date(2024, 1, 1), TODAY, 'month', habit_id=1, today=TODAY)
+    totals_before = completion_totals(cursor, 1)
+    conn.commit()
+
+    result = compact_history(conn, max_age_days=90, today=TODAY)
+
+    assert result.cutoff == '2024-03-01'
+    assert result.rows_compacted == 60     # January and February
+    assert result.months_written == 2
+    assert conn.execute("SELECT MIN(completed_at) FROM completion_history").fetchone()[0] >= '2024-03-01'
+    assert conn.execute("SELECT count FROM completion").fetchone()[0] == 166
+    assert completion_totals(cursor, 1) == totals_before
+    assert completion_rate_series(cursor, date(2024, 1, 1), TODAY, 'month', habit_id=1, today=TODAY) == rates_before
+
+
+def test_backdated_completion_in_compacted_month_keeps_rollup(conn):
+    cursor = conn.cursor()
+    compact_history(conn, max_age_days=90, today=TODAY)
+    january = completion_rate_series(cursor, date(2024, 1, 1), date(2024, 1, 31), 'month', habit_id=1, today=TODAY)
+    assert january[0][1:3] == (31, 31)
+    conn.commit()
+
+    record_completion(conn, 1, 1, datetime(2024, 1, 20, 9))
+
+    for granularity in ('day', 'week', 'month'):
+        refresh_rollups(cursor, granularity, TODAY)
+    assert completion_rate_series(cursor, date(2024, 1, 1), date(2024, 1, 31), 'month',
+                                  habit_id=1, today=TODAY) == january
+    assert completion_totals(cursor, 1)[0] == 167
+
+
+def test_compaction_is_repeatable(conn):
+    compact_history(conn, max_age_days=90, today=TODAY)
+    again = compact_history(conn, max_age_days=90, today=TODAY)
+
+    assert again.rows_compacted == 0
+    assert completion_totals(conn.cursor(), 1)[0] == 166
+
+
+def test_reclaim_space_in_steps(conn):
+    conn.execute("CREATE TABLE filler (data BLOB)")
+    conn.executemany("INSERT INTO filler VALUES (zeroblob(4000))", [()] * 200)
+    conn.commit()
+    conn.execute("DROP TABLE filler")
+    conn.commit()
+    assert free_pages(conn) > 100
+
+    released = reclaim_space(conn, pages_per_step=50, pause=0, max_steps=1)
+    assert released == 50
+
+    reclaim_space(conn, pages_per_step=50, pause=0)
+    assert free_pages(conn) == 0
+
+
+def test_reclaim_space_refuses_open_transaction(conn):
+    conn.execute("DELETE FROM completion")
+
+    with pytest.raises(RuntimeError):
+        reclaim_space(conn, pause=0)
+    # The caller's delete was not committed behind its back
+    conn.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM completion").fetchone()[0] > 0
+
+
+def test_enable_incremental_vacuum_on_old_database(tmp_path):
+    conn = db.create_connection(tmp_path / "old.db")
+    conn.execute("CREATE TABLE t (x)")
+    conn.commit()
+
+    assert enable_incremental_vacuum(conn)
+    assert not enable_incremental_vacuum(conn)
+    conn.close()
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import db
+from scheduler import at_risk, deadline_after, due_now, overdue
+
+NOW = datetime(2024, 1, 10, 12, 0)  # a Wednesday
+
+
+@pytest.fixture
+def conn(conn):
+    """Fixture to add a user with no habits."""
+    conn.execute("INSERT INTO user_info (user_id, username, password) VALUES (1, 'alice', 'pw')")
+    return conn
+
+
+def add_habit(conn, habit_id, name, periodicity, created_at):
+    conn.execute(
+        "INSERT INTO habit_detail (habit_id, user_id, name, periodicity, created_at) VALUES (?, 1, ?, ?, ?)",
+        (habit_id, name, periodicity, created_at)
+    )
+
+
+def log(conn, habit_id, completed_at):
+    conn.execute(
+        "INSERT INTO completion (user_id, habit_id, count, last_completed) VALUES (1, ?, 1, ?)",
+        (habit_id, completed_at)
+    )
+
+
+def names(rows):
+    return [row[3] for row in rows]
+
+
+def test_new_habit_is_due_in_its_first_period(conn):
+    add_habit(conn, 1, 'Drink Water', 'daily', '2024-01-10 09:00:00')
+    add_habit(conn, 2, 'Clean House', 'weekly', '2024-01-08 09:00:00')
+
+    rows = due_now(conn.cursor(), now=NOW)
+
+    assert [(row[0], row[3]) for row in rows] == [
+        ('2024-01-11 00:00:00', 'Drink Water'),
+        ('2024-01-15 00:00:00', 'Clean House'),
+    ]
+
+
+def test_completion_moves_deadline(conn):
+    add_habit(conn, 1, 'Drink Water', 'daily', '2024-01-01 09:00:00')
+    log(conn, 1, '2024-01-10 08:00:00')
+
+    assert due_now(conn.cursor(), now=NOW) == []
+    next_due = conn.execute("SELECT next_due FROM habit WHERE habit_id = 1").fetchone()[0]
+    assert next_due == str(deadline_after(datetime(2024, 1, 10, 8), 'daily')) == '2024-01-12 00:00:00'
+
+
+def test_at_risk_and_overdue(conn):
+    add_habit(conn, 1, 'Drink Water', 'daily', '2024-01-01 09:00:00')
+    add_habit(conn, 2, 'Morning Jog', 'daily', '2024-01-01 09:00:00')
+    add_habit(conn, 3, 'Clean House', 'weekly', '2024-01-01 09:00:00')
+    log(conn, 1, '2024-01-09 08:00:00')   # due by end of today
+    log(conn, 2, '2024-01-07 08:00:00')   # broke at midnight on the 9th
+    log(conn, 3, '2024-01-02 08:00:00')   # due by end of Sunday the 14th
+    cursor = conn.cursor()
+
+    assert names(at_risk(cursor, timedelta(hours=13), now=NOW)) == ['Drink Water']
+    assert names(at_risk(cursor, timedelta(days=5), now=NOW)) == ['Drink Water', 'Clean House']
+    assert names(overdue(cursor, now=NOW)) == ['Morning Jog']
+    assert overdue(cursor, now=NOW, since=NOW - timedelta(hours=1)) == []
+
+
+def test_limit_merges_periodicities_in_deadline_order(conn):
+    for habit_id in range(1, 6):
+        add_habit(conn, habit_id, f'Daily {habit_id}', 'daily', f'2024-01-0{habit_id} 09:00:00')
+    add_habit(conn, 6, 'Weekly', 'weekly', '2024-01-01 09:00:00')
+
+    rows = overdue(conn.cursor(), now=NOW, limit=3)
+
+    assert names(rows) == ['Daily 1', 'Daily 2', 'Daily 3']
+
+
+def test_existing_habits_are_backfilled(db_path):
+    path = db_path
+    conn = db.create_connection(path)
+    conn.execute("INSERT INTO user_info (user_id, username, password) VALUES (1, 'alice', 'pw')")
+    add_habit(conn, 1, 'Drink Water', 'daily', '2024-01-01 09:00:00')
+    log(conn, 1, '2024-01-09 08:00:00')
+    conn.execute("UPDATE habit SET next_due = NULL")
+    conn.commit()
+    conn.close()
+
+    db.create_tables(path)
+
+    conn = db.create_connection(path)
+    assert conn.execute("SELECT next_due FROM habit").fetchone()[0] == '2024-01-11 00:00:00'
+    conn.close()
@@ -0,0 +1,76 @@
+import pytest
+
+import db
+from analyze import fetch_all_habits
+from cache import QueryCache
+from snapshot import ReadSnapshot
+
+
+@pytest.fixture
+def path(db_path):
+    """Fixture to add the predefined habits to the fresh database."""
+    db.insert_predefined_habits(db_path)
+    return db_path
+
+
+def add_habit(path, name):
+    conn = db.create_connection(path)
+    conn.execute("INSERT INTO habit_detail (user_id, name, periodicity) VALUES (1, ?, 'daily')", (name,))
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize("mode", ["memory", "wal"])
+def test_snapshot_is_stable_until_refreshed(path, mode):
+    snapshot = ReadSnapshot(path, mode)
+    try:
+        add_habit(path, "Stretch")
+
+        assert len(fetch_all_habits(snapshot.conn.cursor())) == 5
+        assert snapshot.is_stale()
+
+        assert snapshot.refresh_if_stale()
+        assert len(fetch_all_habits(snapshot.conn.cursor())) == 6
+        assert not snapshot.refresh_if_stale()
+    finally:
+        snapshot.close()
+
+
+def test_wal_snapshot_does_not_block_writers(path):
+    snapshot = ReadSnapshot(path, "wal")
+    try:
+        fetch_all_habits(snapshot.conn.cursor())
+        add_habit(path, "Stretch")   # would raise "database is locked" if the reader blocked it
+    finally:
+        snapshot.close()
+
+
+def test_refresh_interval_limits_refreshes(path):
+    snapshot = ReadSnapshot(path, "memory", refresh_interval=3600)
+    try:
+        add_habit(path, "Stretch")
+
+        assert not snapshot.refresh_if_stale()
+        assert snapshot.refreshes == 1
+    finally:
+        snapshot.close()
+
+
+def test_cache_revalidates_after_refresh(path):
+    snapshot = ReadSnapshot(path, "memory")
+    try:
+        cache = QueryCache(snapshot.conn)
+        assert len(cache.fetch(fetch_all_habits)) == 5
+
+        add_habit(path, "Stretch")
+        snapshot.refresh_if_stale()
+        cache.revalidate()
+
+        assert len(cache.fetch(fetch_all_habits)) == 6
+    finally:
+        snapshot.close()
+
+
+def test_unknown_mode_is_rejected(path):
+    with pytest.raises(ValueError):
+        ReadSnapshot(path, "disk")
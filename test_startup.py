@@ -0,0 +1,71 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import db
+from startup_bench import time_schema_check
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_ensure_schema_creates_new_database(tmp_path):
+    path = tmp_path / "habit_tracker.db"
+
+    assert db.ensure_schema(path) is True
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'habit'").fetchone()[0] == 1
+    conn.close()
+
+
+def test_ensure_schema_skips_up_to_date_database(db_path):
+    with patch("db.create_tables") as create_tables:
+        assert db.ensure_schema(db_path) is False
+    create_tables.assert_not_called()
+
+
+def test_ensure_schema_upgrades_old_version(db_path):
+    path = db_path
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE completion_monthly")
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+
+    assert db.ensure_schema(path) is True
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'completion_monthly'").fetchone()[0] == 1
+    conn.close()
+
+
+def test_ensure_schema_refuses_newer_version(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA user_version = {db.SCHEMA_VERSION + 1}")
+    conn.close()
+
+    with patch("db.create_tables") as create_tables, pytest.raises(RuntimeError):
+        db.ensure_schema(db_path)
+    create_tables.assert_not_called()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION + 1
+    conn.close()
+
+
+def test_entry_points_do_not_load_ui_libraries():
+    for module in ('main', 'analyze'):
+        result = subprocess.run(
+            [sys.executable, '-c', f"import sys, {module}; print('prompt_toolkit' in sys.modules)"],
+            cwd=HERE, check=True, capture_output=True, text=True
+        )
+        assert result.stdout.strip() == 'False', module
+
+
+def test_time_schema_check_reports_both_paths():
+    # Which one is faster is left to `python startup_bench.py`; timings depend on machine load
+    create, check = time_schema_check(runs=1)
+
+    assert (create.name, check.name) == ('create_tables', 'ensure_schema')
+    assert create.median_ms > 0 and check.median_ms > 0
@@ -0,0 +1,88 @@
+from datetime import date, datetime
+
+import pytest
+
+from passwords import hash_password
+from storage import MemoryStorage, SQLiteStorage, UsernameTaken
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage(request):
+    """Fixture returning each storage backend, starting empty."""
+    if request.param == "memory":
+        return MemoryStorage()
+    return SQLiteStorage(request.getfixturevalue("conn"))
+
+
+def test_users(storage):
+    alice = storage.create_user("alice", "pw")
+
+    assert storage.authenticate("alice", "pw") == alice
+    assert storage.authenticate("alice", "wrong") is None
+    assert storage.get_user(alice)[0] == "alice"
+    with pytest.raises(UsernameTaken):
+        storage.create_user("alice", "other")
+
+
+def test_authenticate_hashed_password(storage):
+    stored = hash_password("pw", iterations=1000)
+    alice = storage.create_user("alice", stored)
+
+    assert storage.authenticate("alice", "pw") == alice
+    assert storage.authenticate("alice", "wrong") is None
+    # The stored hash itself is not a password
+    assert storage.authenticate("alice", stored) is None
+
+
+def test_habits(storage):
+    alice = storage.create_user("alice", "pw")
+    bob = storage.create_user("bob", "pw")
+    run = storage.add_habit(alice, "Running", "5k", "daily")
+    storage.add_habit(bob, "Running", None, "daily")
+    read = storage.add_habit(alice, "Reading", None, "weekly")
+
+    assert storage.add_habit(alice, "Running", None, "weekly") is None
+    assert storage.list_habits(alice) == [(run, "Running"), (read, "Reading")]
+    assert storage.get_habit_name(alice, run) == "Running"
+    assert storage.get_habit_name(bob, run) is None
+    assert storage.fetch_habits_by_periodicity("weekly") == [("alice", "Reading")]
+    assert storage.fetch_all_habits() == [("alice", "Running"), ("bob", "Running"), ("alice", "Reading")]
+
+    assert not storage.delete_habit(bob, run)
+    assert storage.delete_habit(alice, run)
+    assert storage.list_habits(alice) == [(read, "Reading")]
+
+
+def test_completions_and_aggregates(storage):
+    alice = storage.create_user("alice", "pw")
+    bob = storage.create_user("bob", "pw")
+    run = storage.add_habit(alice, "Running", None, "daily")
+    read = storage.add_habit(alice, "Reading", None, "weekly")
+    bob_run = storage.add_habit(bob, "Running", None, "daily")
+
+    assert storage.log_completion(alice, run, datetime(2024, 1, 1, 8)) == 1
+    assert storage.log_completion(alice, run, datetime(2024, 1, 2, 8)) == 2
+    assert storage.log_completion(alice, read, datetime(2024, 1, 1, 8)) == 1
+    assert storage.log_completion(bob, bob_run, datetime(2024, 1, 2, 8)) == 1
+    assert storage.log_completion(bob, run) is None
+
+    assert storage.user_completions(alice) == [("Running", 2), ("Reading", 1)]
+    assert storage.fetch_all_completions() == [("alice", "Running", 2), ("alice", "Reading", 1), ("bob", "Running", 1)]
+    assert storage.fetch_completions_for_habit("Running") == [("alice", 2), ("bob", 1)]
+    assert storage.count_habits(alice) == 2
+    assert storage.total_completions(alice) == 3
+    assert storage.total_completions(storage.create_user("carol", "pw")) == 0
+    assert storage.completions_on(alice, date(2024, 1, 2)) == 1
+
+
+def test_delete_user_cascades(storage):
+    alice = storage.create_user("alice", "pw")
+    run = storage.add_habit(alice, "Running", None, "daily")
+    storage.log_completion(alice, run)
+
+    assert storage.delete_user(alice)
+    assert not storage.delete_user(alice)
+    assert storage.fetch_all_users() == []
+    assert storage.fetch_all_habits() == []
+    assert storage.fetch_all_completions() == []
+    storage.create_user("alice", "pw")   # the name is free again
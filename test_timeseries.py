@@ -0,0 +1,114 @@
+from datetime import date
+
+import pytest
+
+import db
+from timeseries import completion_rate_series, count_periods, refresh_rollups
+
+
+@pytest.fixture
+def conn(conn):
+    """Fixture to add one daily and one weekly habit."""
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO user_info (user_id, username, password) VALUES (1, 'alice', 'pw')")
+    cursor.execute("""
+        INSERT INTO habit_detail (habit_id, user_id, name, periodicity, created_at)
+        VALUES (1, 1, 'Drink Water', 'daily', '2024-01-01 08:00:00'),
+               (2, 1, 'Clean House', 'weekly', '2024-01-01 08:00:00')
+    """)
+    conn.commit()
+    return conn
+
+
+def complete(cursor, habit_id, *timestamps):
+    cursor.executemany(
+        "INSERT INTO completion_history (user_id, habit_id, completed_at) VALUES (1, ?, ?)",
+        [(habit_id, ts) for ts in timestamps]
+    )
+
+
+def test_count_periods():
+    assert count_periods('daily', date(2024, 1, 1), date(2024, 1, 8)) == 7
+    assert count_periods('weekly', date(2024, 1, 1), date(2024, 2, 1)) == 5   # Mondays 1, 8, 15, 22, 29
+    assert count_periods('weekly', date(2024, 1, 2), date(2024, 1, 8)) == 0
+
+
+def test_daily_habit_weekly_buckets(conn):
+    cursor = conn.cursor()
+    # Two completions on the same day only count once
+    complete(cursor, 1, '2024-01-01 08:00:00', '2024-01-01 20:00:00', '2024-01-03 08:00:00',
+             '2024-01-09 08:00:00')
+
+    series = completion_rate_series(cursor, date(2024, 1, 1), date(2024, 1, 14), 'week',
+                                    habit_id=1, today=date(2024, 1, 20))
+
+    assert series == [('2024-01-01', 2, 7, 2 / 7), ('2024-01-08', 1, 7, 1 / 7)]
+
+
+def test_open_bucket_is_clipped_to_today(conn):
+    cursor = conn.cursor()
+    complete(cursor, 1, '2024-01-15 08:00:00')
+
+    series = completion_rate_series(cursor, date(2024, 1, 15), date(2024, 1, 31), 'week',
+                                    habit_id=1, today=date(2024, 1, 16))
+
+    assert series == [('2024-01-15', 1, 2, 0.5)]
+
+
+def test_weekly_habits_by_periodicity(conn):
+    cursor = conn.cursor()
+    # Sunday 2024-02-04 belongs to the week starting Monday 2024-01-29, i.e. January
+    complete(cursor, 2, '2024-01-02 08:00:00', '2024-01-05 08:00:00', '2024-02-04 08:00:00')
+
+    series = completion_rate_series(cursor, date(2024, 1, 1), date(2024, 2, 29), 'month',
+                                    periodicity='weekly', today=date(2024, 3, 10))
+
+    assert series == [('2024-01-01', 2, 5, 2 / 5), ('2024-02-01', 0, 4, 0.0)]
+
+
+def test_refresh_only_recomputes_changed_buckets(conn):
+    cursor = conn.cursor()
+    complete(cursor, 1, '2024-01-01 08:00:00', '2024-01-08 08:00:00')
+
+    assert refresh_rollups(cursor, 'week', today=date(2024, 1, 20)) == 2
+    assert refresh_rollups(cursor, 'week', today=date(2024, 1, 20)) == 0
+
+    # A late completion only rewrites its own bucket
+    complete(cursor, 1, '2024-01-02 08:00:00')
+    assert refresh_rollups(cursor, 'week', today=date(2024, 1, 20)) == 1
+
+    series = completion_rate_series(cursor, date(2024, 1, 1), date(2024, 1, 7), 'week',
+                                    habit_id=1, today=date(2024, 1, 20))
+    assert series[0][1] == 2
+
+
+def test_completion_table_feeds_history(conn):
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO completion (user_id, habit_id, count, last_completed) "
+                   "VALUES (1, 1, 1, '2024-01-01 08:00:00')")
+    cursor.execute("UPDATE completion SET count = 2, last_completed = '2024-01-02 08:00:00' WHERE habit_id = 1")
+
+    series = completion_rate_series(cursor, date(2024, 1, 1), date(2024, 1, 7), 'week',
+                                    habit_id=1, today=date(2024, 1, 7))
+
+    assert series == [('2024-01-01', 2, 7, 2 / 7)]
+
+
+def test_history_is_seeded_from_existing_completions(db_path, conn):
+    conn.execute("INSERT INTO completion (user_id, habit_id, count, last_completed) "
+                 "VALUES (1, 1, 3, '2024-01-03 08:00:00'), (1, 2, 0, '2024-01-01 08:00:00')")
+    conn.execute("DROP TABLE completion_history")
+    conn.commit()
+
+    db.create_tables(db_path)
+
+    assert conn.execute("SELECT user_id, habit_id, completed_at FROM completion_history").fetchall() == [
+        (1, 1, '2024-01-03 08:00:00')]
+    series = completion_rate_series(conn.cursor(), date(2024, 1, 1), date(2024, 1, 7), 'week',
+                                    habit_id=1, today=date(2024, 1, 7))
+    assert series == [('2024-01-01', 1, 7, 1 / 7)]
+
+
+def test_weekly_habit_per_day_is_rejected(conn):
+    with pytest.raises(ValueError):
+        completion_rate_series(conn.cursor(), date(2024, 1, 1), date(2024, 1, 7), 'day', habit_id=2)
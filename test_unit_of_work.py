@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import pytest
+
+import db
+from habit import UserInfo, Habit
+from unit_of_work import Session
+
+
+@pytest.fixture
+def conn(db_path, conn):
+    """Fixture to add the predefined habits to the fresh database."""
+    db.insert_predefined_habits(db_path)
+    return conn
+
+
+def test_identity_map_returns_one_object_per_row(conn):
+    session = Session(conn)
+
+    habits = session.habits_for_user(1)
+
+    assert session.get(Habit, habits[0].habit_id) is habits[0]
+    assert session.habits_for_user(1)[0] is habits[0]
+
+
+def test_nothing_is_written_before_commit(conn):
+    session = Session(conn)
+    session.add(UserInfo("alice", "pw"))
+    for habit in session.habits_for_user(1):
+        habit.description = "changed"
+
+    assert conn.execute("SELECT COUNT(*) FROM user_info").fetchone()[0] == 1
+    assert session.statements == 0
+
+
+def test_flush_batches_inserts_across_related_objects(conn):
+    session = Session(conn)
+    users = [UserInfo(f"user{i}", "pw") for i in range(3)]
+    for user in users:
+        session.add(user)
+        session.add(Habit(user, "Stretch", None, "daily"))
+
+    session.commit()
+
+    assert session.statements == 2   # one INSERT per table
+    assert [user.user_id for user in users] == [2, 3, 4]
+    rows = conn.execute("SELECT user_id FROM habit_detail WHERE name = 'Stretch' ORDER BY user_id").fetchall()
+    assert rows == [(2,), (3,), (4,)]
+
+
+def test_updates_are_grouped_by_changed_columns(conn):
+    session = Session(conn)
+    habits = session.habits_for_user(1)
+    for habit in habits[:3]:
+        habit.description = "changed"
+    habits[3].periodicity = "daily"
+
+    assert len(session.dirty()) == 4
+    session.commit()
+
+    assert session.statements == 2
+    assert session.dirty() == []
+    assert conn.execute("SELECT COUNT(*) FROM habit_detail WHERE description = 'changed'").fetchone()[0] == 3
+
+
+def test_record_completion_matches_log_completion(conn):
+    session = Session(conn)
+    habit = session.habits_for_user(1)[0]
+
+    session.record_completion(habit, datetime(2024, 1, 1, 8))
+    completion = session.record_completion(habit, datetime(2024, 1, 2, 8))
+    session.commit()
+
+    assert completion.count == 2
+    row = conn.execute("SELECT count, last_completed FROM completion WHERE habit_id = ?", (habit.habit_id,)).fetchone()
+    assert row == (2, "2024-01-02 08:00:00")
+    history = conn.execute("SELECT completed_at FROM completion_history WHERE habit_id = ? ORDER BY history_id",
+                           (habit.habit_id,)).fetchall()
+    assert history == [("2024-01-01 08:00:00",), ("2024-01-02 08:00:00",)]
+
+    # A new session picks up the stored record instead of inserting another
+    other = Session(conn)
+    assert other.record_completion(other.get(Habit, habit.habit_id)).count == 3
+
+
+def test_every_completion_in_a_flush_is_kept_in_history(conn):
+    habit_id = Session(conn).habits_for_user(1)[0].habit_id
+    first = Session(conn)
+    first.record_completion(first.get(Habit, habit_id), datetime(2024, 1, 1, 8))
+    first.commit()
+
+    session = Session(conn)
+    habit = session.get(Habit, habit_id)
+    for day in (3, 4, 5):
+        session.record_completion(habit, datetime(2024, 1, day, 8))
+    session.commit()
+
+    assert session.statements == 1   # the three increments go out in one executemany
+    row = conn.execute("SELECT count, last_completed FROM completion WHERE habit_id = ?", (habit_id,)).fetchone()
+    assert row == (4, "2024-01-05 08:00:00")
+    history = conn.execute("SELECT completed_at FROM completion_history WHERE habit_id = ? ORDER BY history_id",
+                           (habit_id,)).fetchall()
+    assert [completed_at for completed_at, in history] == [f"2024-01-0{day} 08:00:00" for day in (1, 3, 4, 5)]
+    assert session.dirty() == []
+
+
+def test_delete_and_rollback(conn):
+    session = Session(conn)
+    habit = session.habits_for_user(1)[0]
+    session.delete(habit)
+    session.commit()
+    assert session.get(Habit, habit.habit_id) is None
+
+    session.add(UserInfo("bob", "pw"))
+    session.flush()
+    session.rollback()
+    assert conn.execute("SELECT COUNT(*) FROM user_info WHERE username = 'bob'").fetchone()[0] == 0
+
+
+def test_add_rejects_unmapped_objects(conn):
+    with pytest.raises(TypeError):
+        Session(conn).add(object())
@@ -0,0 +1,293 @@
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+from db import create_connection as get_connection
+
+# ---------------------------
+# Completion-rate time series
+# ---------------------------
+#
+# A habit's completion rate for a bucket is the number of its periods (days for
+# daily habits, Monday-based weeks for weekly habits) with at least one
+# completion, divided by the number of its periods that have elapsed in the
+# bucket since the habit was created.
+#
+# Completed-period counts for closed buckets are cached in completion_rollup.
+# rollup_state remembers, per granularity, the last completion_history row that
+# was rolled up and the bucket that was still open at the time, so a refresh
+# only recomputes buckets that have closed since then plus the closed buckets
+# that received late completions. Buckets that start before the end of a month
+# retention.py has compacted for the habit are never recomputed: their detail
+# rows are gone, and recomputing from what is left would undercount them.
+
+GRANULARITIES = ('day', 'week', 'month')
+
+# Chunk size for `habit_id IN (...)` lists (stays under SQLite's variable limit)
+_CHUNK = 500
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == 'day':
+        return day
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity!r}")
+
+
+def next_bucket(start: date, granularity: str) -> date:
+    if granularity == 'day':
+        return start + timedelta(days=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity!r}")
+
+
+def iter_buckets(start: date, end: date, granularity: str) -> Iterator[date]:
+    """Yield the start of every bucket overlapping [start, end]."""
+    current = bucket_start(start, granularity)
+    while current <= end:
+        yield current
+        current = next_bucket(current, granularity)
+
+
+def count_periods(periodicity: str, start: date, end: date) -> int:
+    """Number of habit periods beginning in [start, end)."""
+    if end <= start:
+        return 0
+    if periodicity == 'daily':
+        return (end - start).days
+    first_monday = start + timedelta(days=(7 - start.weekday()) % 7)
+    if first_monday >= end:
+        return 0
+    return (end - first_monday - timedelta(days=1)).days // 7 + 1
+
+
+def _bucket_sql(granularity: str, column: str) -> str:
+    if granularity == 'day':
+        return column
+    if granularity == 'week':
+        return f"date({column}, 'weekday 0', '-6 days')"
+    if granularity == 'month':
+        return f"date({column}, 'start of month')"
+    raise ValueError(f"Unknown granularity: {granularity!r}")
+
+
+def _completed_periods(cursor, granularity: str, start: date, end: date,
+                       habit_ids: Optional[List[int]] = None,
+                       periodicity: Optional[str] = None) -> List[Tuple[int, str, int]]:
+    """
+    Count completed periods per (habit_id, bucket_start) for buckets in [start, end),
+    reading completion_history directly.
+    """
+    filters, params = [], []
+    if habit_ids is not None:
+        filters.append(f"AND ch.habit_id IN ({', '.join('?' * len(habit_ids))})")
+        params.extend(habit_ids)
+    if periodicity is not None:
+        filters.append("AND h.periodicity = ?")
+        params.append(periodicity)
+
+    # A weekly habit's period starts up to 6 days before the completion, so read
+    # one extra week of history past the end of the range.
+    cursor.execute(f"""
+        SELECT habit_id, bucket_start, COUNT(*)
+        FROM (
+            SELECT habit_id,
+                   {_bucket_sql(granularity, 'period')} AS bucket_start,
+                   ROW_NUMBER() OVER (PARTITION BY habit_id, period ORDER BY completed_at) AS rn
+            FROM (
+                SELECT ch.habit_id, ch.completed_at,
+                       CASE h.periodicity
+                           WHEN 'weekly' THEN date(ch.completed_at, 'weekday 0', '-6 days')
+                           ELSE date(ch.completed_at)
+                       END AS period
+                FROM completion_history ch
+                JOIN habit h ON h.habit_id = ch.habit_id
+                WHERE ch.completed_at >= ? AND ch.completed_at < ?
+                {' '.join(filters)}
+            )
+        )
+        WHERE rn = 1 AND bucket_start >= ? AND bucket_start < ?
+        GROUP BY habit_id, bucket_start
+    """, (start.isoformat(), (end + timedelta(days=7)).isoformat(), *params,
+          start.isoformat(), end.isoformat()))
+    return cursor.fetchall()
+
+
+def _store_rollups(cursor, granularity: str, rows: List[Tuple[int, str, int]]) -> None:
+    cursor.executemany("""
+        INSERT INTO completion_rollup (habit_id, granularity, bucket_start, completed)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (granularity, bucket_start, habit_id) DO UPDATE SET completed = excluded.completed
+    """, [(habit_id, granularity, bucket, completed) for habit_id, bucket, completed in rows])
+
+
+def refresh_rollups(cursor, granularity: str, today: Optional[date] = None) -> int:
+    """
+    Bring completion_rollup up to date for `granularity`.
+    Returns the number of (habit, bucket) rows written.
+    """
+    today = today or date.today()
+    current = bucket_start(today, granularity)
+
+    cursor.execute("SELECT last_history_id, closed_through FROM rollup_state WHERE granularity = ?",
+                   (granularity,))
+    state = cursor.fetchone()
+    last_history_id, closed_through = state if state else (0, None)
+
+    cursor.execute("SELECT MAX(history_id), MIN(completed_at) FROM completion_history")
+    max_history_id, earliest = cursor.fetchone()
+    if max_history_id is None:
+        return 0
+
+    if closed_through is not None:
+        rolled_until = date.fromisoformat(closed_through)
+    else:
+        rolled_until = bucket_start(date.fromisoformat(earliest[:10]), granularity)
+
+    written = 0
+
+    # 1) Buckets that have closed since the last refresh are computed in one pass
+    if rolled_until < current:
+        cursor.execute("""
+            DELETE FROM completion_rollup
+            WHERE granularity = ? AND bucket_start >= ? AND bucket_start < ?
+        """, (granularity, rolled_until.isoformat(), current.isoformat()))
+        rows = _completed_periods(cursor, granularity, rolled_until, current)
+        _store_rollups(cursor, granularity, rows)
+        written += len(rows)
+
+    # 2) Late completions landing in buckets that were already rolled up
+    cursor.execute(f"""
+        SELECT habit_id, bucket_start
+        FROM (
+            SELECT DISTINCT ch.habit_id,
+                   {_bucket_sql(granularity, "CASE h.periodicity WHEN 'weekly' "
+                                             "THEN date(ch.completed_at, 'weekday 0', '-6 days') "
+                                             "ELSE date(ch.completed_at) END")} AS bucket_start
+            FROM completion_history ch
+            JOIN habit h ON h.habit_id = ch.habit_id
+            WHERE ch.history_id > ? AND ch.history_id <= ?
+        ) late
+        WHERE NOT EXISTS (
+            SELECT 1 FROM completion_monthly m
+            WHERE m.habit_id = late.habit_id AND date(m.month, '+1 month') > late.bucket_start
+        )
+    """, (last_history_id, max_history_id))
+    dirty: Dict[str, List[int]] = {}
+    for habit_id, bucket in cursor.fetchall():
+        if bucket < min(rolled_until, current).isoformat():
+            dirty.setdefault(bucket, []).append(habit_id)
+
+    for bucket, habit_ids in dirty.items():
+        start = date.fromisoformat(bucket)
+        for i in range(0, len(habit_ids), _CHUNK):
+            rows = _completed_periods(cursor, granularity, start, next_bucket(start, granularity),
+                                      habit_ids=habit_ids[i:i + _CHUNK])
+            _store_rollups(cursor, granularity, rows)
+            written += len(rows)
+
+    cursor.execute("""
+        INSERT INTO rollup_state (granularity, last_history_id, closed_through)
+        VALUES (?, ?, ?)
+        ON CONFLICT (granularity) DO UPDATE SET
+            last_history_id = excluded.last_history_id,
+            closed_through = excluded.closed_through
+    """, (granularity, max_history_id, max(current, rolled_until).isoformat()))
+    return written
+
+
+def completion_rate_series(cursor, start: date, end: date, granularity: str = 'week',
+                           habit_id: Optional[int] = None, periodicity: Optional[str] = None,
+                           today: Optional[date] = None) -> List[Tuple[str, int, int, float]]:
+    """
+    Completion rate per bucket between `start` and `end` (inclusive), for one habit
+    (`habit_id`) or for every habit with the given `periodicity`.
+    Returns (bucket_start, completed_periods, expected_periods, rate) tuples.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity!r}")
+    if (habit_id is None) == (periodicity is None):
+        raise ValueError("Pass exactly one of habit_id or periodicity")
+
+    today = today or date.today()
+    end = min(end, today)
+
+    # Habit creation dates drive the expected number of periods per bucket
+    if habit_id is not None:
+        cursor.execute("SELECT periodicity, date(created_at) FROM habit WHERE habit_id = ?", (habit_id,))
+        row = cursor.fetchone()
+        if not row:
+            return []
+        periodicity, created = row
+        created_counts = [(created, 1)]
+        scope_sql, scope_params = "r.habit_id = ?", (habit_id,)
+    else:
+        cursor.execute("""
+            SELECT date(created_at), COUNT(*)
+            FROM habit
+            WHERE periodicity = ?
+            GROUP BY date(created_at)
+        """, (periodicity,))
+        created_counts = cursor.fetchall()
+        scope_sql, scope_params = "h.periodicity = ?", (periodicity,)
+
+    if periodicity == 'weekly' and granularity == 'day':
+        raise ValueError("Weekly habits can't be reported per day")
+
+    refresh_rollups(cursor, granularity, today)
+    buckets = list(iter_buckets(start, end, granularity))
+    if not buckets:
+        return []
+
+    # Closed buckets come from the rollup table
+    cursor.execute(f"""
+        SELECT r.bucket_start, SUM(r.completed)
+        FROM completion_rollup r
+        JOIN habit h ON h.habit_id = r.habit_id
+        WHERE {scope_sql} AND r.granularity = ? AND r.bucket_start >= ? AND r.bucket_start <= ?
+        GROUP BY r.bucket_start
+    """, (*scope_params, granularity, buckets[0].isoformat(), buckets[-1].isoformat()))
+    completed = dict(cursor.fetchall())
+
+    # The open bucket is always computed live
+    current = bucket_start(today, granularity)
+    if buckets[0] <= current <= buckets[-1]:
+        rows = _completed_periods(cursor, granularity, current, next_bucket(current, granularity),
+                                  habit_ids=[habit_id] if habit_id is not None else None,
+                                  periodicity=periodicity if habit_id is None else None)
+        completed[current.isoformat()] = sum(count for _habit, _bucket, count in rows)
+
+    series = []
+    tomorrow = today + timedelta(days=1)
+    for bucket in buckets:
+        bucket_end = min(next_bucket(bucket, granularity), tomorrow)
+        expected = 0
+        for created, count in created_counts:
+            first_period = date.fromisoformat(created)
+            if periodicity == 'weekly':
+                first_period = bucket_start(first_period, 'week')
+            expected += count * count_periods(periodicity, max(bucket, first_period), bucket_end)
+        done = completed.get(bucket.isoformat(), 0)
+        series.append((bucket.isoformat(), done, expected, done / expected if expected else 0.0))
+    return series
+
+
+if __name__ == '__main__':
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        for granularity in GRANULARITIES:
+            refresh_rollups(cursor, granularity)
+        conn.commit()
+        year_ago = date.today() - timedelta(days=365)
+        for period in ('daily', 'weekly'):
+            print(f"📈 {period.capitalize()} habits, completion rate per month:")
+            for bucket, done, expected, rate in completion_rate_series(cursor, year_ago, date.today(),
+                                                                       'month', periodicity=period):
+                print(f"   {bucket}: {done}/{expected} ({rate:.0%})")
+    finally:
+        conn.close()
@@ -0,0 +1,305 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from db import create_connection as get_connection
+from habit import UserInfo, Habit, Completion
+
+# ---------------------------
+# Unit of work
+# ---------------------------
+#
+# A Session loads UserInfo, Habit and Completion objects through an identity
+# map (one object per row per session), remembers the column values each object
+# was loaded with, and writes nothing until flush()/commit(). A flush then
+# issues one executemany per table and statement shape:
+#   - inserts, with ids allocated up front so every new object gets its id,
+#   - updates, grouped by the set of columns that changed,
+#   - deletes.
+#
+# New objects may reference each other before they have ids, e.g.
+# Habit(user, ...) with `user` a pending UserInfo; the reference is replaced
+# by the id when the session is flushed.
+#
+# Completions logged with record_completion keep one timestamp per event. The
+# completion_history triggers record one row per INSERT or count increase, so
+# a flush replays every event after the first as its own count + 1 UPDATE
+# (still a single executemany) instead of writing the final count once.
+
+# model class -> (table, primary key column, mapped columns)
+MAPPINGS = {
+    UserInfo: ('user_info', 'user_id', ('username', 'password', 'email')),
+    Habit: ('habit_detail', 'habit_id', ('user_id', 'name', 'description', 'periodicity')),
+    Completion: ('completion', 'completion_id', ('user_id', 'habit_id', 'last_completed', 'count')),
+}
+
+# Habits are mapped onto the habit_detail view, which keeps their name and
+# description in habit_template; ids are allocated from the table behind it
+BASE_TABLES = {'habit_detail': 'habit'}
+
+# Parents are inserted before children and deleted after them
+FLUSH_ORDER = (UserInfo, Habit, Completion)
+
+
+def _build(cls, row):
+    """Create a model object from a (primary key, *columns) row."""
+    pk, *values = row
+    if cls is UserInfo:
+        obj = UserInfo(*values)
+    elif cls is Habit:
+        obj = Habit(*values)
+    else:
+        obj = Completion(*values)
+    setattr(obj, MAPPINGS[cls][1], pk)
+    return obj
+
+
+class Session:
+    """
+    A unit of work over one database connection.
+
+    Attributes:
+        conn (sqlite3.Connection): The connection used to load and flush objects.
+        statements (int): The number of SQL statements issued by flushes so far.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = 0
+        self._identity: Dict[Tuple[type, int], object] = {}
+        self._loaded: Dict[object, tuple] = {}
+        self._new: List[object] = []
+        self._deleted: List[object] = []
+        self._events: Dict[Completion, List[datetime]] = {}   # completion -> times logged, in call order
+
+    # ----- loading -----
+
+    def _select(self, cls, where: str, params: tuple) -> list:
+        table, pk, columns = MAPPINGS[cls]
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT {pk}, {', '.join(columns)} FROM {table} WHERE {where}", params)
+        objects = []
+        for row in cursor.fetchall():
+            key = (cls, row[0])
+            obj = self._identity.get(key)
+            if obj is None:
+                obj = _build(cls, row)
+                self._identity[key] = obj
+                self._loaded[obj] = tuple(row[1:])
+            objects.append(obj)
+        return objects
+
+    def get(self, cls, pk: int):
+        """Return the object with primary key `pk`, loading it only if this session hasn't yet."""
+        obj = self._identity.get((cls, pk))
+        if obj is not None:
+            return obj
+        found = self._select(cls, f"{MAPPINGS[cls][1]} = ?", (pk,))
+        return found[0] if found else None
+
+    def user_by_name(self, username: str) -> Optional[UserInfo]:
+        found = self._select(UserInfo, "username = ?", (username,))
+        return found[0] if found else None
+
+    def habits_for_user(self, user_id: int) -> List[Habit]:
+        return self._select(Habit, "user_id = ? ORDER BY habit_id", (user_id,))
+
+    def completion_for(self, habit: Habit) -> Optional[Completion]:
+        """The completion record of `habit`, including one added in this session."""
+        for obj in self._new:
+            if isinstance(obj, Completion) and (
+                    obj.habit_id is habit or (habit.habit_id is not None and obj.habit_id == habit.habit_id)):
+                return obj
+        if habit.habit_id is None:
+            return None
+        found = self._select(Completion, "habit_id = ? AND user_id = ?", (habit.habit_id, habit.user_id))
+        return found[0] if found else None
+
+    # ----- changes -----
+
+    def add(self, obj) -> None:
+        """Schedule a new object for insertion."""
+        if type(obj) not in MAPPINGS:
+            raise TypeError(f"Cannot add {type(obj).__name__} to a session")
+        if obj not in self._new and obj not in self._loaded:
+            self._new.append(obj)
+
+    def delete(self, obj) -> None:
+        """Schedule an object for deletion (or drop it if it was never flushed)."""
+        if obj in self._new:
+            self._new.remove(obj)
+        elif obj not in self._deleted:
+            self._deleted.append(obj)
+
+    def record_completion(self, habit: Habit, when: Optional[datetime] = None) -> Completion:
+        """Count one completion of `habit`, like main.log_completion; returns its record."""
+        when = when or datetime.now()
+        completion = self.completion_for(habit)
+        if completion is None:
+            completion = Completion(habit.user_id, habit if habit.habit_id is None else habit.habit_id,
+                                    when, count=0)
+            self.add(completion)
+        completion.count += 1
+        completion.last_completed = when
+        self._events.setdefault(completion, []).append(when)
+        return completion
+
+    def dirty(self) -> list:
+        """Loaded objects whose mapped attributes changed since they were loaded or flushed."""
+        return [
+            obj for obj, values in self._loaded.items()
+            if obj not in self._deleted and self._values(obj) != values
+        ]
+
+    @staticmethod
+    def _values(obj) -> tuple:
+        values = []
+        for column in MAPPINGS[type(obj)][2]:
+            value = getattr(obj, column)
+            # Pending parent objects stand in for their (future) ids
+            if type(value) in MAPPINGS:
+                value = getattr(value, MAPPINGS[type(value)][1])
+            values.append(value)
+        return tuple(values)
+
+    # ----- flushing -----
+
+    @staticmethod
+    def _with(obj, values: tuple, **replacements) -> tuple:
+        """`values` of `obj` with some columns replaced."""
+        columns = MAPPINGS[type(obj)][2]
+        return tuple(replacements.get(column, value) for column, value in zip(columns, values))
+
+    def _allocate_ids(self, cls, count: int) -> range:
+        table, pk, _columns = MAPPINGS[cls]
+        table = BASE_TABLES.get(table, table)
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT MAX(COALESCE((SELECT MAX({pk}) FROM {table}), 0),
+                       COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0))
+        """, (table,))
+        start = cursor.fetchone()[0] + 1
+        return range(start, start + count)
+
+    def flush(self) -> None:
+        """Write all pending inserts, updates and deletes in one transaction (not committed)."""
+        if not (self._new or self._deleted or self.dirty()):
+            return
+        # Completion events still to write as count + 1 updates, after the inserts
+        replay: List[Tuple[datetime, object]] = []
+        for obj, events in self._events.items():
+            if obj in self._loaded and obj not in self._deleted:
+                replay.extend((when, obj) for when in events)
+        cursor = self.conn.cursor()
+        if not self.conn.in_transaction:
+            # Take the write lock before allocating ids
+            cursor.execute("BEGIN IMMEDIATE")
+
+        for cls in FLUSH_ORDER:
+            new = [obj for obj in self._new if type(obj) is cls]
+            if not new:
+                continue
+            table, pk, columns = MAPPINGS[cls]
+            for obj, new_id in zip(new, self._allocate_ids(cls, len(new))):
+                setattr(obj, pk, new_id)
+            for obj in new:
+                for column in columns:
+                    value = getattr(obj, column)
+                    if type(value) in MAPPINGS:
+                        setattr(obj, column, getattr(value, MAPPINGS[type(value)][1]))
+            rows = []
+            for obj in new:
+                values = self._values(obj)
+                events = self._events.get(obj)
+                if events:
+                    # The insert records the first event; the others are replayed below
+                    values = self._with(obj, values, count=obj.count - len(events) + 1, last_completed=events[0])
+                    replay.extend((when, obj) for when in events[1:])
+                rows.append((getattr(obj, pk), *values))
+            cursor.executemany(
+                f"INSERT INTO {table} ({pk}, {', '.join(columns)}) VALUES ({', '.join('?' * (len(columns) + 1))})",
+                rows
+            )
+            self.statements += 1
+
+        if replay:
+            cursor.executemany("UPDATE completion SET count = count + 1, last_completed = ? WHERE completion_id = ?",
+                               [(when, obj.completion_id) for when, obj in replay])
+            self.statements += 1
+
+        updates: Dict[Tuple[type, Tuple[str, ...]], list] = {}
+        for obj in self.dirty():
+            if obj in self._new:
+                continue
+            cls = type(obj)
+            columns = MAPPINGS[cls][2]
+            old, current = self._loaded[obj], self._values(obj)
+            events = self._events.get(obj)
+            if events:
+                # Compare with the row as the replayed events left it
+                loaded_count = old[columns.index('count')]
+                old = self._with(obj, old, count=loaded_count + len(events), last_completed=events[-1])
+            changed = tuple(c for c, before, after in zip(columns, old, current) if before != after)
+            if not changed:
+                continue
+            params = tuple(after for before, after in zip(old, current) if before != after)
+            params += (getattr(obj, MAPPINGS[cls][1]),)
+            updates.setdefault((cls, changed), []).append(params)
+        for (cls, changed), rows in updates.items():
+            table, pk, _columns = MAPPINGS[cls]
+            assignments = ', '.join(f"{column} = ?" for column in changed)
+            cursor.executemany(f"UPDATE {table} SET {assignments} WHERE {pk} = ?", rows)
+            self.statements += 1
+
+        for cls in reversed(FLUSH_ORDER):
+            doomed = [obj for obj in self._deleted if type(obj) is cls]
+            if not doomed:
+                continue
+            table, pk, _columns = MAPPINGS[cls]
+            cursor.executemany(f"DELETE FROM {table} WHERE {pk} = ?", [(getattr(obj, pk),) for obj in doomed])
+            self.statements += 1
+
+        for obj in self._deleted:
+            self._identity.pop((type(obj), getattr(obj, MAPPINGS[type(obj)][1])), None)
+            self._loaded.pop(obj, None)
+        for obj in self._new:
+            self._identity[(type(obj), getattr(obj, MAPPINGS[type(obj)][1]))] = obj
+        for obj in list(self._loaded) + self._new:
+            self._loaded[obj] = self._values(obj)
+        self._new.clear()
+        self._deleted.clear()
+        self._events.clear()
+
+    def commit(self) -> None:
+        self.flush()
+        self.conn.commit()
+
+    def rollback(self) -> None:
+        """Discard unflushed changes and forget everything loaded."""
+        self.conn.rollback()
+        self._identity.clear()
+        self._loaded.clear()
+        self._new.clear()
+        self._deleted.clear()
+        self._events.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+if __name__ == '__main__':
+    # Example scripted job: log today's "Drink Water" for every user who tracks it
+    conn = get_connection()
+    with Session(conn) as session:
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT user_id FROM habit_detail WHERE name = 'Drink Water'")
+        for (user_id,) in cursor.fetchall():
+            for habit in session.habits_for_user(user_id):
+                if habit.name == 'Drink Water':
+                    session.record_completion(habit)
+    print(f"✅ Logged completions with {session.statements} write statements.")
+    conn.close()